@@ -1,12 +1,16 @@
 # CompressorClass.py
 import customtkinter as ctk
 from tkinter import filedialog
-from pathlib import Path
-import ffmpeg
-import threading
 import os
-import datetime
-import random
+
+from chunked_encode import run_chunked_job
+from output_cache import OutputCache
+from compressor_engine import (
+    DEFAULT_VALUES, RESOLUTION_MAP, CompressionEngine, CompressionJob,
+    build_output_path, default_output_folder, default_worker_count, format_duration, parse_timestamp,
+)
+from governor import PRIORITY_LOW, PRIORITY_NORMAL, ResourceGovernor
+from supervisor import TkBridge
 
 
 class CompressorApp(ctk.CTk):
@@ -21,22 +25,36 @@ class CompressorApp(ctk.CTk):
 
         # --- Configurações da Janela ---
         # Aumentei a altura para caber o seletor de linguagem
-        self.geometry("500x650") 
+        self.geometry("500x890") 
         self.grid_columnconfigure(0, weight=1)
 
-        self.video_path = None
+        self.video_paths = []
         self.output_folder_path = None
-        self.save_path = None 
+        self.pending_jobs = 0
+        self.job_fractions = {} # id(job) -> fração concluída (0.0 a 1.0)
 
         # --- Mapa de Resolução (sem tradução, são valores técnicos) ---
-        self.resolution_map = {
-            0: {"label": "480p", "height": 480},
-            1: {"label": "720p", "height": 720},
-            2: {"label": "1080p", "height": 1080}
-        }
-        
+        self.resolution_map = RESOLUTION_MAP
+
+        # --- Motor de compressão (fila compartilhada por todos os trabalhos) ---
+        # (trabalhos idênticos já feitos voltam do cache de saídas, sem encode)
+        # (os dois motores dividem o mesmo governor: limite de encodes somado,
+        #  e pausar/cancelar alcança todos os trabalhos)
+        self.output_cache = OutputCache()
+        self.governor = ResourceGovernor(max_concurrent=default_worker_count())
+        self.engine = CompressionEngine(output_cache=self.output_cache, governor=self.governor)
+        # Pedaços paralelos já ocupam todos os núcleos: um trabalho por vez
+        self.chunked_engine = CompressionEngine(max_workers=1, runner=run_chunked_job,
+                                                output_cache=self.output_cache,
+                                                governor=self.governor)
+        # Resultados e progresso das threads de trabalho chegam à UI por esta fila
+        self.bridge = TkBridge(self)
+
         # --- Variáveis de Estado da UI ---
         self.compression_mode = ctk.StringVar(value="CRF") 
+        self.chunked_mode = ctk.BooleanVar(value=False)
+        self.low_priority = ctk.BooleanVar(value=False)
+        self.content_aware = ctk.BooleanVar(value=False)
 
         # --- Lógica de Inicialização ---
         self.set_default_output_folder() 
@@ -51,7 +69,8 @@ class CompressorApp(ctk.CTk):
                 "title": "Video Compressor",
                 "select_video_btn": "Select Video",
                 "no_video_selected": "No video selected",
-                "select_video_title": "Select a video file",
+                "videos_selected": "{count} videos selected",
+                "select_video_title": "Select video files",
                 "video_files": "Video Files",
                 "all_files": "All Files",
                 "output_folder_btn": "Output Folder",
@@ -60,14 +79,29 @@ class CompressorApp(ctk.CTk):
                 "crf_radio": "CRF (Quality)",
                 "bitrate_radio": "Bitrate (Size)",
                 "res_radio": "Resolution (Dimensions)",
+                "size_radio": "Target Size (MB)",
+                "chunked_check": "Parallel, resumable chunks (long videos)",
+                "low_priority_check": "Low priority (keep the computer responsive)",
+                "content_aware_check": "Detect screen recordings (skip repeated frames)",
+                "trim_label": "Trim (optional):",
+                "trim_start_placeholder": "Start (H:MM:SS)",
+                "trim_end_placeholder": "End (H:MM:SS)",
                 "level_label": "Level:",
                 "crf_slider_label": "CRF: {val} (Lower = Better Quality)",
                 "bitrate_slider_label": "Bitrate: {val} kbits/s",
                 "res_slider_label": "Height: {label}",
+                "size_slider_label": "Target: {val} MB",
                 "compress_btn": "Compress Video",
+                "pause_btn": "Pause",
+                "resume_btn": "Resume",
+                "cancel_btn": "Cancel All",
                 "invalid_folder_error": "Error: Invalid output folder.",
                 "compressing_status": "Compressing... Please wait.",
+                "queue_status": "Compressing... {count} job(s) in queue.",
+                "progress_status": "{file}: {percent} | ETA {eta} | {fps} fps | ~{size} MB",
+                "paused_status": "Paused. {count} job(s) in queue.",
                 "success_message": "Saved as {file}",
+                "cancelled_message": "Cancelled: {file}",
                 "ffmpeg_error": "Compression error. (Check console)",
                 "generic_error": "Error: {err}"
             },
@@ -75,7 +109,8 @@ class CompressorApp(ctk.CTk):
                 "title": "Compactador de Vídeo",
                 "select_video_btn": "Selecionar Vídeo",
                 "no_video_selected": "Nenhum vídeo selecionado",
-                "select_video_title": "Selecione um arquivo de vídeo",
+                "videos_selected": "{count} vídeos selecionados",
+                "select_video_title": "Selecione os arquivos de vídeo",
                 "video_files": "Arquivos de Vídeo",
                 "all_files": "Todos os Arquivos",
                 "output_folder_btn": "Pasta de Saída",
@@ -84,14 +119,29 @@ class CompressorApp(ctk.CTk):
                 "crf_radio": "CRF (Qualidade)",
                 "bitrate_radio": "Bitrate (Tamanho)",
                 "res_radio": "Resolução (Dimensões)",
+                "size_radio": "Tamanho Alvo (MB)",
+                "chunked_check": "Pedaços em paralelo e retomáveis (vídeos longos)",
+                "low_priority_check": "Prioridade baixa (computador continua responsivo)",
+                "content_aware_check": "Detectar gravações de tela (pula quadros repetidos)",
+                "trim_label": "Cortar (opcional):",
+                "trim_start_placeholder": "Início (H:MM:SS)",
+                "trim_end_placeholder": "Fim (H:MM:SS)",
                 "level_label": "Nível:",
                 "crf_slider_label": "CRF: {val} (Menor = Melhor Qualidade)",
                 "bitrate_slider_label": "Bitrate: {val} kbits/s",
                 "res_slider_label": "Altura: {label}",
+                "size_slider_label": "Alvo: {val} MB",
                 "compress_btn": "Compactar Vídeo",
+                "pause_btn": "Pausar",
+                "resume_btn": "Continuar",
+                "cancel_btn": "Cancelar Tudo",
                 "invalid_folder_error": "Erro: Pasta de saída inválida.",
                 "compressing_status": "Compactando... Por favor, aguarde.",
+                "queue_status": "Compactando... {count} trabalho(s) na fila.",
+                "progress_status": "{file}: {percent} | Restante {eta} | {fps} fps | ~{size} MB",
+                "paused_status": "Pausado. {count} trabalho(s) na fila.",
                 "success_message": "Salvo como {file}",
+                "cancelled_message": "Cancelado: {file}",
                 "ffmpeg_error": "Erro na compressão. (Ver console)",
                 "generic_error": "Erro: {err}"
             }
@@ -156,27 +206,61 @@ class CompressorApp(ctk.CTk):
                                               value="Resolução", command=self.update_slider_config)
         self.radio_res.grid(row=3, column=0, padx=20, pady=5, sticky="w")
 
+        self.radio_size = ctk.CTkRadioButton(self.frame_options, text=t['size_radio'], variable=self.compression_mode,
+                                               value="Tamanho", command=self.update_slider_config)
+        self.radio_size.grid(row=4, column=0, padx=20, pady=5, sticky="w")
+
         # --- 4. Slider de Nível ---
         self.lbl_level = ctk.CTkLabel(self.frame_options, text=t['level_label'], font=ctk.CTkFont(weight="bold"))
-        self.lbl_level.grid(row=4, column=0, padx=10, pady=(15, 0), sticky="w")
+        self.lbl_level.grid(row=5, column=0, padx=10, pady=(15, 0), sticky="w")
 
         self.lbl_slider_value = ctk.CTkLabel(self.frame_options, text="", font=ctk.CTkFont(size=14)) # Texto definido por update_slider_label
-        self.lbl_slider_value.grid(row=4, column=1, padx=10, pady=(15, 0), sticky="e")
+        self.lbl_slider_value.grid(row=5, column=1, padx=10, pady=(15, 0), sticky="e")
 
         self.slider = ctk.CTkSlider(self.frame_options, from_=18, to=30, number_of_steps=12,
                                      command=self.update_slider_label)
         self.slider.set(23)
-        self.slider.grid(row=5, column=0, columnspan=2, padx=10, pady=(5, 20), sticky="ew")
+        self.slider.grid(row=6, column=0, columnspan=2, padx=10, pady=(5, 10), sticky="ew")
+
+        self.check_chunked = ctk.CTkCheckBox(self.frame_options, text=t['chunked_check'], variable=self.chunked_mode)
+        self.check_chunked.grid(row=7, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="w")
+
+        self.check_low_priority = ctk.CTkCheckBox(self.frame_options, text=t['low_priority_check'], variable=self.low_priority)
+        self.check_low_priority.grid(row=8, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="w")
+
+        self.check_content_aware = ctk.CTkCheckBox(self.frame_options, text=t['content_aware_check'], variable=self.content_aware)
+        self.check_content_aware.grid(row=9, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="w")
+
+        # Corte: vazio = do começo / até o fim (só as pontas são recodificadas)
+        self.frame_trim = ctk.CTkFrame(self.frame_options, fg_color="transparent")
+        self.frame_trim.grid(row=10, column=0, columnspan=2, padx=10, pady=(0, 15), sticky="ew")
+        self.lbl_trim = ctk.CTkLabel(self.frame_trim, text=t['trim_label'])
+        self.lbl_trim.pack(side="left")
+        self.entry_trim_end = ctk.CTkEntry(self.frame_trim, width=120, placeholder_text=t['trim_end_placeholder'])
+        self.entry_trim_end.pack(side="right")
+        self.entry_trim_start = ctk.CTkEntry(self.frame_trim, width=120, placeholder_text=t['trim_start_placeholder'])
+        self.entry_trim_start.pack(side="right", padx=(0, 10))
 
         # --- 5. Ação e Progresso ---
-        self.btn_compress = ctk.CTkButton(self, text=t['compress_btn'], command=self.start_compression_thread, height=40)
+        self.btn_compress = ctk.CTkButton(self, text=t['compress_btn'], command=self.start_compression, height=40)
         self.btn_compress.grid(row=4, column=0, padx=15, pady=10, sticky="ew") # row=4
 
-        self.progress_bar = ctk.CTkProgressBar(self, mode="indeterminate")
+        self.progress_bar = ctk.CTkProgressBar(self, mode="determinate")
         # (será mostrado/oculto na row=5)
 
         self.lbl_status = ctk.CTkLabel(self, text="", font=ctk.CTkFont(size=12))
         self.lbl_status.grid(row=6, column=0, padx=15, pady=(5, 10), sticky="w") # row=6
+
+        # Pausar/cancelar a fila (será mostrado/oculto na row=7, junto com a barra)
+        self.frame_queue = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame_queue.grid_columnconfigure((0, 1), weight=1)
+
+        self.btn_pause = ctk.CTkButton(self.frame_queue, text=t['pause_btn'], command=self.toggle_pause)
+        self.btn_pause.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+
+        self.btn_cancel = ctk.CTkButton(self.frame_queue, text=t['cancel_btn'], command=self.cancel_all,
+                                        fg_color="#a83232", hover_color="#7a2424")
+        self.btn_cancel.grid(row=0, column=1, padx=(5, 0), sticky="ew")
     
     # --- Funções de Lógica da UI ---
 
@@ -196,6 +280,8 @@ class CompressorApp(ctk.CTk):
         self.btn_select.configure(text=t['select_video_btn'])
         self.btn_select_output.configure(text=t['output_folder_btn'])
         self.btn_compress.configure(text=t['compress_btn'])
+        self.btn_pause.configure(text=t['resume_btn'] if self.governor.paused else t['pause_btn'])
+        self.btn_cancel.configure(text=t['cancel_btn'])
 
         # Atualiza os labels estáticos
         self.lbl_mode.configure(text=t['compression_method'])
@@ -205,10 +291,19 @@ class CompressorApp(ctk.CTk):
         self.radio_crf.configure(text=t['crf_radio'])
         self.radio_bitrate.configure(text=t['bitrate_radio'])
         self.radio_res.configure(text=t['res_radio'])
+        self.radio_size.configure(text=t['size_radio'])
+        self.check_chunked.configure(text=t['chunked_check'])
+        self.check_low_priority.configure(text=t['low_priority_check'])
+        self.check_content_aware.configure(text=t['content_aware_check'])
+        self.lbl_trim.configure(text=t['trim_label'])
+        self.entry_trim_start.configure(placeholder_text=t['trim_start_placeholder'])
+        self.entry_trim_end.configure(placeholder_text=t['trim_end_placeholder'])
         
         # Atualiza os labels dinâmicos (com base no estado)
-        if not self.video_path:
+        if not self.video_paths:
             self.lbl_file.configure(text=t['no_video_selected'])
+        elif len(self.video_paths) > 1:
+            self.lbl_file.configure(text=t['videos_selected'].format(count=len(self.video_paths)))
         
         # Atualiza o texto do slider
         self.update_slider_label(self.slider.get())
@@ -218,55 +313,40 @@ class CompressorApp(ctk.CTk):
 
     def set_default_output_folder(self):
         """Encontra a pasta 'Vídeos' do usuário e a define como padrão."""
-        try:
-            home = Path.home()
-            videos_dir_pt = home / "Vídeos" # Português
-            videos_dir_en = home / "Videos" # Inglês
-            
-            if videos_dir_pt.is_dir():
-                self.output_folder_path = str(videos_dir_pt)
-            elif videos_dir_en.is_dir():
-                self.output_folder_path = str(videos_dir_en)
-            else:
-                self.output_folder_path = str(home)
-        except Exception as e:
-            print(f"Erro ao encontrar pasta de vídeos: {e}")
-            self.output_folder_path = os.getcwd() 
+        self.output_folder_path = default_output_folder()
 
     def set_video_selected_state(self, is_selected):
         state = "normal" if is_selected else "disabled"
         self.radio_crf.configure(state=state)
         self.radio_bitrate.configure(state=state)
         self.radio_res.configure(state=state)
+        self.radio_size.configure(state=state)
         self.slider.configure(state=state)
+        self.check_chunked.configure(state=state)
+        self.check_low_priority.configure(state=state)
+        self.check_content_aware.configure(state=state)
+        self.entry_trim_start.configure(state=state)
+        self.entry_trim_end.configure(state=state)
         self.btn_compress.configure(state=state)
 
-    def set_processing_state(self, is_processing):
-        state = "disabled" if is_processing else "normal"
-        
-        self.btn_select.configure(state=state)
-        self.btn_select_output.configure(state=state)
-        self.lang_selector.configure(state=state) # Desabilita o seletor de idioma
-        
-        if not is_processing:
-            self.set_video_selected_state(bool(self.video_path))
-        else:
-            self.set_video_selected_state(False)
-
     def select_video(self):
-        """Abre a janela de diálogo (traduzida) para selecionar um vídeo."""
+        """Abre a janela de diálogo (traduzida) para selecionar um ou mais vídeos."""
         t = self.translations[self.current_lang.get()]
-        
-        path = filedialog.askopenfilename(
+
+        paths = filedialog.askopenfilenames(
             title=t['select_video_title'],
             filetypes=[
-                (t['video_files'], "*.mp4 *.mkv *.mov *.avi"), 
+                (t['video_files'], "*.mp4 *.mkv *.mov *.avi"),
                 (t['all_files'], "*.*")
             ]
         )
-        if path:
-            self.video_path = path
-            self.lbl_file.configure(text=os.path.basename(path), text_color="white")
+        if paths:
+            self.video_paths = list(paths)
+            if len(paths) == 1:
+                label = os.path.basename(paths[0])
+            else:
+                label = t['videos_selected'].format(count=len(paths))
+            self.lbl_file.configure(text=label, text_color="white")
             self.set_video_selected_state(True)
             self.update_slider_config()
 
@@ -285,13 +365,13 @@ class CompressorApp(ctk.CTk):
         
         if mode == "CRF":
             self.slider.configure(from_=18, to=30, number_of_steps=12)
-            self.slider.set(23)
         elif mode == "Bitrate":
             self.slider.configure(from_=500, to=5000, number_of_steps=45)
-            self.slider.set(1500)
         elif mode == "Resolução":
             self.slider.configure(from_=0, to=2, number_of_steps=2)
-            self.slider.set(1)
+        elif mode == "Tamanho":
+            self.slider.configure(from_=10, to=2000, number_of_steps=199)
+        self.slider.set(DEFAULT_VALUES[mode])
             
         self.update_slider_label(self.slider.get())
 
@@ -309,99 +389,153 @@ class CompressorApp(ctk.CTk):
         elif mode == "Resolução":
             label_key = self.resolution_map[val_int]['label']
             label_text = t['res_slider_label'].format(label=label_key)
+        elif mode == "Tamanho":
+            label_text = t['size_slider_label'].format(val=val_int)
             
         self.lbl_slider_value.configure(text=label_text)
 
-    # --- Funções de Compressão (Threading) ---
+    # --- Funções de Compressão (Fila do Motor) ---
 
-    def start_compression_thread(self):
-        """Inicia a compressão (com mensagens traduzidas)."""
+    def start_compression(self):
+        """Enfileira um trabalho por vídeo selecionado no motor de compressão."""
         t = self.translations[self.current_lang.get()]
-        
-        if not self.video_path:
-            return
 
-        # 1. Gerar nome de arquivo
-        base_name_full = os.path.basename(self.video_path)
-        original_name, _ = os.path.splitext(base_name_full)
-        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
-        unique_code = f"{random.randint(100000, 999999)}"
-        file_name = f"{original_name}_{timestamp}_{unique_code}.mp4"
+        if not self.video_paths:
+            return
 
-        # 2. Verificar pasta
+        # 1. Verificar pasta
         if not self.output_folder_path or not os.path.isdir(self.output_folder_path):
             self.lbl_status.configure(text=t['invalid_folder_error'], text_color="red")
             return
 
-        self.save_path = os.path.join(self.output_folder_path, file_name)
-
-        # 3. Desabilitar UI e mostrar progresso
-        self.set_processing_state(True) 
-        self.lbl_status.configure(text=t['compressing_status'], text_color="white")
-        self.progress_bar.grid(row=5, column=0, padx=15, pady=10, sticky="ew") # row=5
-        self.progress_bar.start()
-
-        # 4. Iniciar thread
-        compress_thread = threading.Thread(target=self.run_compression)
-        compress_thread.daemon = True
-        compress_thread.start()
-
-    def run_compression(self):
-        """Executa o comando FFmpeg. (NÃO CHAME DIRETAMENTE DA UI)"""
+        # 2. Capturar as configurações agora (o worker não lê os widgets)
         mode = self.compression_mode.get()
         slider_value = int(self.slider.get())
-        
+        priority = PRIORITY_LOW if self.low_priority.get() else PRIORITY_NORMAL
+        content_aware = self.content_aware.get()
+
         try:
-            in_file = ffmpeg.input(self.video_path)
-            in_audio = in_file.audio
-            in_video = in_file.video
-
-            output_params = {"c:a": "copy", "preset": "fast"}
-
-            if mode == "CRF":
-                output_params["crf"] = slider_value
-            elif mode == "Bitrate":
-                output_params["b:v"] = f"{slider_value}k"
-            elif mode == "Resolução":
-                height = self.resolution_map[slider_value]["height"]
-                in_video = in_video.filter('scale', -2, height)
-
-            out = ffmpeg.output(in_video, in_audio, self.save_path, **output_params)
-            ffmpeg.run(out, overwrite_output=True)
-            
-            final_file_name = os.path.basename(self.save_path) 
-            
-            # Sucesso: Passa a chave 'success' e o nome do arquivo
-            self.after(0, self.on_compression_finished, 'success', 'green', final_file_name)
+            trim_start = parse_timestamp(self.entry_trim_start.get())
+            trim_end = parse_timestamp(self.entry_trim_end.get())
+            jobs = [CompressionJob(path, build_output_path(path, self.output_folder_path), mode, slider_value,
+                                   priority=priority, content_aware=content_aware,
+                                   trim_start=trim_start, trim_end=trim_end)
+                    for path in self.video_paths]
+        except ValueError as e:
+            self.lbl_status.configure(text=t['generic_error'].format(err=e), text_color="red")
+            return
+
+        # 3. Mostrar progresso (a UI continua livre para enfileirar mais vídeos)
+        if self.pending_jobs == 0:
+            self.progress_bar.set(0)
+            self.progress_bar.grid(row=5, column=0, padx=15, pady=10, sticky="ew") # row=5
+            self.frame_queue.grid(row=7, column=0, padx=15, pady=(0, 15), sticky="ew") # row=7
+        self.pending_jobs += len(jobs)
+        for job in jobs:
+            self.job_fractions[id(job)] = 0.0
+        self.update_overall_progress()
+        self.lbl_status.configure(text=self.queue_status_text(), text_color="white")
+
+        # 4. Enfileirar no motor (os callbacks voltam para a thread da UI pelo TkBridge;
+        #    do progresso de cada trabalho só vale o mais recente)
+        engine = self.chunked_engine if self.chunked_mode.get() else self.engine
+        for job in jobs:
+            engine.submit(
+                job,
+                callback=lambda result: self.bridge.post(self.on_job_finished, result),
+                on_progress=lambda progress: self.bridge.post_latest(id(progress.job), self.on_job_progress, progress),
+            )
+
+    def toggle_pause(self):
+        """Suspende (ou retoma) todos os ffmpeg em andamento e a fila."""
+        t = self.translations[self.current_lang.get()]
+        if self.governor.paused:
+            self.governor.resume_all()
+            self.btn_pause.configure(text=t['pause_btn'])
+        else:
+            self.governor.pause_all()
+            self.btn_pause.configure(text=t['resume_btn'])
+        self.lbl_status.configure(text=self.queue_status_text(), text_color="white")
+
+    def cancel_all(self):
+        """Cancela todos os trabalhos (os resultados chegam por on_job_finished)."""
+        self.governor.cancel_all()
 
-        except ffmpeg.Error as e:
-            error_message = e.stderr.decode()
-            print("Erro no FFmpeg:", error_message)
-            # Erro FFmpeg: Passa a chave 'ffmpeg_error'
-            self.after(0, self.on_compression_finished, 'ffmpeg_error', 'red')
-        except Exception as e:
-             print("Erro inesperado:", str(e))
-             # Erro Genérico: Passa a chave 'generic_error' e a mensagem
-             self.after(0, self.on_compression_finished, 'generic_error', 'red', str(e))
+    def queue_status_text(self):
+        """Texto de status (traduzido) para os trabalhos ainda na fila."""
+        t = self.translations[self.current_lang.get()]
+        if self.governor.paused:
+            return t['paused_status'].format(count=self.pending_jobs)
+        if self.pending_jobs == 1:
+            return t['compressing_status']
+        return t['queue_status'].format(count=self.pending_jobs)
+
+    def update_overall_progress(self):
+        """A barra mostra a média das frações de todos os trabalhos na fila."""
+        if self.job_fractions:
+            self.progress_bar.set(sum(self.job_fractions.values()) / len(self.job_fractions))
+
+    def on_job_progress(self, progress):
+        """Chamado (na thread da UI) a cada atualização de progresso do ffmpeg."""
+        if id(progress.job) not in self.job_fractions or self.governor.paused:
+            return # o trabalho já terminou (atualização atrasada) ou está pausado
 
+        t = self.translations[self.current_lang.get()]
+        if progress.fraction is not None:
+            self.job_fractions[id(progress.job)] = progress.fraction
+            self.update_overall_progress()
+
+        percent = "--%" if progress.percent is None else f"{progress.percent:.0f}%"
+        projected = progress.projected_size
+        size = "--" if projected is None else f"{projected / (1024 * 1024):.1f}"
+        message = t['progress_status'].format(
+            file=os.path.basename(progress.job.video_path),
+            percent=percent,
+            eta=format_duration(progress.eta),
+            fps=f"{progress.fps:.0f}",
+            size=size,
+        )
+        self.lbl_status.configure(text=message, text_color="white")
+
+    def on_job_finished(self, result):
+        """Chamado (na thread da UI) quando um trabalho da fila termina."""
+        self.pending_jobs -= 1
+        self.job_fractions.pop(id(result.job), None)
+        self.update_overall_progress()
+
+        if result.cancelled:
+            self.on_compression_finished('cancelled', 'orange', os.path.basename(result.job.video_path))
+        elif result.success:
+            self.on_compression_finished('success', 'green', os.path.basename(result.job.save_path))
+        elif result.error == 'ffmpeg':
+            self.on_compression_finished('ffmpeg_error', 'red')
+        else:
+            self.on_compression_finished('generic_error', 'red', result.error)
 
     def on_compression_finished(self, message_key, color, data=None):
-        """Chamado quando a compressão termina (traduz a mensagem final)."""
-        self.progress_bar.stop()
-        self.progress_bar.grid_forget()
-        
+        """Mostra o resultado de um trabalho (traduz a mensagem final)."""
+        if self.pending_jobs == 0:
+            self.progress_bar.grid_forget()
+            self.frame_queue.grid_forget()
+            if self.governor.paused:
+                # Fila vazia: a próxima compressão não deve começar pausada
+                self.governor.resume_all()
+                self.btn_pause.configure(text=self.translations[self.current_lang.get()]['pause_btn'])
+
         t = self.translations[self.current_lang.get()]
         message = ""
 
         # Monta a mensagem final traduzida
         if message_key == 'success':
             message = t['success_message'].format(file=data)
+        elif message_key == 'cancelled':
+            message = t['cancelled_message'].format(file=data)
         elif message_key == 'ffmpeg_error':
             message = t['ffmpeg_error']
         elif message_key == 'generic_error':
             message = t['generic_error'].format(err=data)
-        
+
+        if self.pending_jobs > 0:
+            message = f"{message}  |  {self.queue_status_text()}"
+
         self.lbl_status.configure(text=message, text_color=color)
-        
-        # Destrava a UI
-        self.set_processing_state(False)
\ No newline at end of file
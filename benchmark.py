@@ -0,0 +1,431 @@
+# benchmark.py
+"""Benchmarks do motor de compressão.
+
+    python benchmark.py suite -o resultados.json [--grid full]
+    python benchmark.py compare antes.json depois.json [--threshold 0.10]
+    python benchmark.py chunked [--input video.mp4] [--duration 120]
+    python benchmark.py ladder [--input video.mp4] [--heights 480 720 1080]
+    python benchmark.py content [--input gravacao.mp4]
+
+`suite` gera clipes determinísticos com as fontes lavfi do ffmpeg (testsrc2,
+mandelbrot, ruído, tela estática) em várias resoluções e durações, roda todos
+os modos/níveis da grade e grava tempo, fps, CPU, tamanho e taxa de
+compressão em JSON. `compare` aponta regressões entre duas execuções.
+
+`chunked` compara o encode normal (um ffmpeg) com o encode em pedaços
+paralelos em cada modo, e confere se a duração e o número de frames da
+saída batem.
+
+`ladder` compara a escada de versões em um único ffmpeg (um decode) com uma
+rodada por versão, em tempo de parede e tempo de CPU.
+
+`content` codifica o mesmo arquivo pelo CRF normal e pelo modo de
+gravação de tela (análise + decimate + tune) e mostra a economia de tempo
+e de tamanho.
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource # só existe em POSIX (tempo de CPU dos processos filhos)
+except ImportError:
+    resource = None
+
+import ffmpeg
+
+from chunked_encode import run_chunked_job
+from compressor_engine import (
+    COMPRESSION_MODES, DEFAULT_VALUES, MODE_BITRATE, MODE_CRF, MODE_RESOLUTION,
+    MODE_TARGET_SIZE, CompressionJob, resolve_job, run_job,
+)
+from content_analysis import analyze_content
+from rendition_ladder import DEFAULT_HEIGHTS, LadderJob, build_ladder, run_ladder
+
+# Diferença de duração tolerada entre as saídas (em segundos, ~1 frame)
+DURATION_TOLERANCE = 0.05
+
+# Fontes lavfi determinísticas: conteúdo "difícil" (ruído) até "fácil" (tela parada)
+SOURCES = {
+    "testsrc2": "testsrc2=size={size}:rate={rate}",
+    "mandelbrot": "mandelbrot=size={size}:rate={rate}",
+    "noise": "color=c=gray:size={size}:rate={rate},noise=alls=60:allf=t+u:all_seed=42",
+    "static": "color=c=0x1e1e1e:size={size}:rate={rate},"
+              "drawbox=x=iw/8:y=ih/8:w=iw/2:h=ih/3:color=white:t=fill",
+    # Uma imagem nova por segundo, repetida até a próxima (como slides numa gravação de tela)
+    "slides": "testsrc2=size={size}:rate=1,fps={rate}",
+}
+
+# Níveis por modo. "full" cobre todas as posições dos sliders da GUI.
+GRIDS = {
+    "quick": {
+        MODE_CRF: [18, 23, 30],
+        MODE_BITRATE: [500, 1500, 5000],
+        MODE_RESOLUTION: [0, 1, 2],
+        MODE_TARGET_SIZE: [5],
+    },
+    "full": {
+        MODE_CRF: list(range(18, 31)),
+        MODE_BITRATE: list(range(500, 5001, 100)),
+        MODE_RESOLUTION: [0, 1, 2],
+        MODE_TARGET_SIZE: [2, 5, 10],
+    },
+}
+
+# Métricas comparadas pelo `compare`: True = maior é melhor
+COMPARED_METRICS = {
+    "wall_time": False,
+    "cpu_time": False,
+    "output_size": False,
+    "encode_fps": True,
+}
+
+
+def make_test_clip(path, duration, size="1280x720", rate=30, source="testsrc2"):
+    """Gera um clipe determinístico (fonte lavfi + senoide) com o ffmpeg."""
+    video = ffmpeg.input(SOURCES[source].format(size=size, rate=rate), f="lavfi", t=duration)
+    audio = ffmpeg.input("sine=frequency=440", f="lavfi", t=duration)
+    out = ffmpeg.output(video, audio, path, **{"c:v": "libx264", "preset": "ultrafast", "crf": 12,
+                                               "g": rate * 2, "c:a": "aac"})
+    ffmpeg.run(out, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+
+
+def probe_output(path):
+    """Duração e número de frames (pacotes de vídeo contados) de um arquivo."""
+    info = ffmpeg.probe(path, select_streams="v:0", count_packets=None)
+    frames = int(info["streams"][0]["nb_read_packets"])
+    return float(info["format"]["duration"]), frames
+
+
+def timed(runner, job):
+    start = time.perf_counter()
+    result = runner(job)
+    return time.perf_counter() - start, result
+
+
+def children_cpu_time():
+    """Tempo de CPU (user + sys) acumulado dos processos filhos já encerrados."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def ffmpeg_version():
+    try:
+        output = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else None
+    except OSError:
+        return None
+
+
+def bench_suite(args):
+    clips_dir = args.clips_dir or tempfile.mkdtemp(prefix="bench_clips_")
+    work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.makedirs(clips_dir, exist_ok=True)
+    grid = GRIDS[args.grid]
+    results = []
+    try:
+        for source in args.sources:
+            for size in args.sizes:
+                for duration in args.durations:
+                    clip_id = f"{source}_{size}_{duration}s"
+                    clip_path = os.path.join(clips_dir, f"{clip_id}.mp4")
+                    if not os.path.exists(clip_path):
+                        print(f"Gerando {clip_id}...")
+                        make_test_clip(clip_path, duration, size, source=source)
+                    _, frames = probe_output(clip_path)
+                    input_size = os.path.getsize(clip_path)
+
+                    for mode in args.modes:
+                        for value in grid[mode]:
+                            save_path = os.path.join(work_dir, "out.mp4")
+                            job = CompressionJob(clip_path, save_path, mode, value)
+
+                            cpu_before = children_cpu_time()
+                            start = time.perf_counter()
+                            encode_job = resolve_job(job)
+                            result = run_job(job, encode_job=encode_job)
+                            wall_time = time.perf_counter() - start
+                            cpu_after = children_cpu_time()
+
+                            record = {
+                                "id": f"{clip_id}/{mode}={value}",
+                                "source": source, "size": size, "duration": duration,
+                                "mode": mode, "value": value,
+                                "action": encode_job.mode, # o que realmente rodou (ex.: Cópia)
+                                "success": result.success,
+                                "wall_time": round(wall_time, 4),
+                                "cpu_time": None if cpu_before is None else round(cpu_after - cpu_before, 4),
+                                "encode_fps": round(frames / wall_time, 2) if wall_time else None,
+                                "input_size": input_size,
+                            }
+                            if result.success:
+                                output_size = os.path.getsize(save_path)
+                                record["output_size"] = output_size
+                                record["compression_ratio"] = round(input_size / output_size, 3)
+                                os.remove(save_path)
+                            results.append(record)
+                            print(f"{record['id']:<48} {wall_time:>7.2f}s {record['encode_fps'] or 0:>8.1f} fps "
+                                  f"{record.get('compression_ratio', 0):>6.2f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not args.clips_dir:
+            shutil.rmtree(clips_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": ffmpeg_version(),
+            "grid": args.grid,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.output}")
+    return 0 if all(r["success"] for r in results) else 1
+
+
+def bench_compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = {r["id"]: r for r in json.load(f)["results"]}
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = {r["id"]: r for r in json.load(f)["results"]}
+
+    regressions = 0
+    for case_id in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[case_id], candidate[case_id]
+        if before["success"] and not after["success"]:
+            print(f"REGRESSÃO {case_id}: passou a falhar")
+            regressions += 1
+            continue
+
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > args.threshold:
+                print(f"REGRESSÃO {case_id}: {metric} {old} -> {new} ({change:+.1%})")
+                regressions += 1
+
+    missing = baseline.keys() - candidate.keys()
+    if missing:
+        print(f"{len(missing)} caso(s) da base não estão na nova execução.")
+    print(f"{regressions} regressão(ões) acima de {args.threshold:.0%}.")
+    return 1 if regressions else 0
+
+
+def bench_chunked(args):
+    work_dir = tempfile.mkdtemp(prefix="bench_chunked_")
+    try:
+        video_path = args.input
+        if not video_path:
+            video_path = os.path.join(work_dir, "source.mp4")
+            print(f"Gerando clipe de teste ({args.duration}s, {args.size})...")
+            make_test_clip(video_path, args.duration, args.size)
+
+        ok = True
+        print(f"{'modo':<10} {'normal (s)':>11} {'pedaços (s)':>12} {'speedup':>8}  verificação")
+        for mode in args.modes:
+            value = DEFAULT_VALUES[mode]
+            single = CompressionJob(video_path, os.path.join(work_dir, f"single_{mode}.mp4"), mode, value)
+            chunked = CompressionJob(video_path, os.path.join(work_dir, f"chunked_{mode}.mp4"), mode, value)
+
+            single_time, single_result = timed(run_job, single)
+            chunked_runner = functools.partial(run_chunked_job, segment_count=args.segments)
+            chunked_time, chunked_result = timed(chunked_runner, chunked)
+            if not (single_result.success and chunked_result.success):
+                print(f"{mode:<10} falhou: {single_result.error or chunked_result.error}")
+                ok = False
+                continue
+
+            single_duration, single_frames = probe_output(single.save_path)
+            chunked_duration, chunked_frames = probe_output(chunked.save_path)
+            matches = (single_frames == chunked_frames
+                       and abs(single_duration - chunked_duration) <= DURATION_TOLERANCE)
+            ok = ok and matches
+
+            check = "OK" if matches else "DIVERGE"
+            print(f"{mode:<10} {single_time:>11.2f} {chunked_time:>12.2f} {single_time / chunked_time:>7.2f}x"
+                  f"  {check} ({single_frames} vs {chunked_frames} frames, "
+                  f"{single_duration:.3f}s vs {chunked_duration:.3f}s)")
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_ladder(args):
+    work_dir = tempfile.mkdtemp(prefix="bench_ladder_")
+    try:
+        video_path = args.input
+        if not video_path:
+            video_path = os.path.join(work_dir, "source.mp4")
+            print(f"Gerando clipe de teste ({args.duration}s, {args.size})...")
+            make_test_clip(video_path, args.duration, args.size)
+
+        def measure(jobs):
+            """Roda os trabalhos em sequência: (parede, CPU dos filhos, sucesso)."""
+            cpu_before = children_cpu_time()
+            start = time.perf_counter()
+            success = all(run_ladder(job).success for job in jobs)
+            wall_time = time.perf_counter() - start
+            cpu_after = children_cpu_time()
+            return wall_time, None if cpu_before is None else cpu_after - cpu_before, success
+
+        # Mesmas versões (alturas x CRFs) nos dois lados
+        ladder_dir = os.path.join(work_dir, "ladder")
+        sequential_dir = os.path.join(work_dir, "sequential")
+        os.makedirs(ladder_dir)
+        os.makedirs(sequential_dir)
+        heights = [height or None for height in args.heights]
+        ladder = LadderJob(video_path, build_ladder(video_path, ladder_dir, heights, args.crf))
+        sequential = [LadderJob(video_path, [rendition])
+                      for rendition in build_ladder(video_path, sequential_dir, heights, args.crf)]
+
+        sequential_wall, sequential_cpu, sequential_ok = measure(sequential)
+        ladder_wall, ladder_cpu, ladder_ok = measure([ladder])
+        if not (sequential_ok and ladder_ok):
+            print("Falhou: veja o erro do ffmpeg acima.")
+            return 1
+
+        ok = True
+        for single, shared in zip(sequential, ladder.renditions):
+            single_duration, single_frames = probe_output(single.save_path)
+            shared_duration, shared_frames = probe_output(shared.save_path)
+            matches = (single_frames == shared_frames
+                       and abs(single_duration - shared_duration) <= DURATION_TOLERANCE)
+            ok = ok and matches
+            label = f"{shared.height or 'original'}p crf{shared.crf}"
+            print(f"{label:<18} {'OK' if matches else 'DIVERGE'} ({single_frames} vs {shared_frames} frames)")
+
+        def cpu_text(seconds):
+            return "--" if seconds is None else f"{seconds:.2f}"
+
+        print(f"{'':<12} {'parede (s)':>11} {'CPU (s)':>9}")
+        print(f"{'separado':<12} {sequential_wall:>11.2f} {cpu_text(sequential_cpu):>9}")
+        print(f"{'um decode':<12} {ladder_wall:>11.2f} {cpu_text(ladder_cpu):>9}")
+        print(f"Parede: {sequential_wall / ladder_wall:.2f}x"
+              + (f" | CPU: {sequential_cpu / ladder_cpu:.2f}x" if ladder_cpu else ""))
+        return 0 if ok else 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_content(args):
+    work_dir = tempfile.mkdtemp(prefix="bench_content_")
+    try:
+        video_path = args.input
+        if not video_path:
+            video_path = os.path.join(work_dir, "source.mp4")
+            print(f"Gerando clipe de teste ({args.duration}s, {args.size}, {args.source})...")
+            make_test_clip(video_path, args.duration, args.size, source=args.source)
+
+        print(f"Análise: {analyze_content(video_path).describe()}")
+        standard = CompressionJob(video_path, os.path.join(work_dir, "standard.mp4"), MODE_CRF, args.crf)
+        aware = CompressionJob(video_path, os.path.join(work_dir, "content.mp4"), MODE_CRF, args.crf,
+                               content_aware=True)
+
+        standard_time, standard_result = timed(run_job, standard)
+        # A análise conta no tempo do modo de tela (roda dentro do resolve_job)
+        aware_time, aware_result = timed(run_job, aware)
+        if not (standard_result.success and aware_result.success):
+            print(f"Falhou: {standard_result.error or aware_result.error}")
+            return 1
+
+        standard_duration, standard_frames = probe_output(standard.save_path)
+        aware_duration, aware_frames = probe_output(aware.save_path)
+        standard_size = os.path.getsize(standard.save_path)
+        aware_size = os.path.getsize(aware.save_path)
+
+        print(f"{'':<8} {'tempo (s)':>10} {'tamanho (KB)':>13} {'frames':>7} {'duração (s)':>12}")
+        print(f"{'CRF':<8} {standard_time:>10.2f} {standard_size / 1024:>13.1f} {standard_frames:>7} "
+              f"{standard_duration:>12.3f}")
+        print(f"{'tela':<8} {aware_time:>10.2f} {aware_size / 1024:>13.1f} {aware_frames:>7} "
+              f"{aware_duration:>12.3f}")
+        print(f"Economia: tempo {1 - aware_time / standard_time:.1%}, tamanho {1 - aware_size / standard_size:.1%}")
+
+        # Descartar quadros não pode encurtar o vídeo
+        if abs(standard_duration - aware_duration) > args.duration_tolerance:
+            print(f"DIVERGE: duração {standard_duration:.3f}s vs {aware_duration:.3f}s")
+            return 1
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks do compressor de vídeo.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    suite = subparsers.add_parser("suite", help="Roda a grade de modos/níveis em clipes sintéticos.")
+    suite.add_argument("-o", "--output", required=True, help="Arquivo JSON de resultados.")
+    suite.add_argument("--grid", choices=sorted(GRIDS), default="quick")
+    suite.add_argument("--sources", nargs="+", choices=sorted(SOURCES), default=sorted(SOURCES))
+    suite.add_argument("--sizes", nargs="+", default=["640x360", "1280x720", "1920x1080"])
+    suite.add_argument("--durations", nargs="+", type=int, default=[5, 20])
+    suite.add_argument("--modes", nargs="+", choices=COMPRESSION_MODES, default=list(COMPRESSION_MODES))
+    suite.add_argument("--clips-dir", default=None,
+                       help="Guarda os clipes gerados aqui para reaproveitar entre execuções.")
+    suite.set_defaults(func=bench_suite)
+
+    compare = subparsers.add_parser("compare", help="Aponta regressões entre dois JSONs do suite.")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="Piora relativa tolerada (0.10 = 10%%).")
+    compare.set_defaults(func=bench_compare)
+
+    chunked = subparsers.add_parser("chunked", help="Encode normal vs. pedaços paralelos.")
+    chunked.add_argument("--input", default=None, help="Vídeo de entrada (padrão: clipe sintético).")
+    chunked.add_argument("--duration", type=int, default=120, help="Duração do clipe sintético (s).")
+    chunked.add_argument("--size", default="1280x720", help="Resolução do clipe sintético.")
+    chunked.add_argument("--segments", type=int, default=None,
+                         help="Número de pedaços (padrão: um por núcleo).")
+    chunked.add_argument("--modes", nargs="+", choices=COMPRESSION_MODES, default=list(COMPRESSION_MODES))
+    chunked.set_defaults(func=bench_chunked)
+
+    ladder = subparsers.add_parser("ladder", help="Escada de versões em um ffmpeg vs. uma rodada por versão.")
+    ladder.add_argument("--input", default=None, help="Vídeo de entrada (padrão: clipe sintético).")
+    ladder.add_argument("--duration", type=int, default=30, help="Duração do clipe sintético (s).")
+    ladder.add_argument("--size", default="1920x1080", help="Resolução do clipe sintético.")
+    ladder.add_argument("--heights", nargs="+", type=int, default=list(DEFAULT_HEIGHTS),
+                        help="Alturas das versões (0 = altura original).")
+    ladder.add_argument("--crf", nargs="+", type=int, default=[DEFAULT_VALUES[MODE_CRF]])
+    ladder.set_defaults(func=bench_ladder)
+
+    content = subparsers.add_parser("content", help="CRF normal vs. modo de gravação de tela.")
+    content.add_argument("--input", default=None, help="Vídeo de entrada (padrão: clipe sintético).")
+    content.add_argument("--duration", type=int, default=60, help="Duração do clipe sintético (s).")
+    content.add_argument("--size", default="1920x1080", help="Resolução do clipe sintético.")
+    content.add_argument("--source", choices=sorted(SOURCES), default="slides",
+                         help="Fonte do clipe sintético.")
+    content.add_argument("--crf", type=int, default=DEFAULT_VALUES[MODE_CRF])
+    content.add_argument("--duration-tolerance", type=float, default=1.0,
+                         help="Diferença de duração aceita entre as saídas (s); com quadros "
+                              "descartados o último quadro mantido pode durar menos.")
+    content.set_defaults(func=bench_content)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+# chunked_encode.py
+"""Encode paralelo em pedaços alinhados a keyframes.
+
+A entrada é cortada sem recodificar (stream copy) em segmentos que começam
+em keyframes, cada segmento é codificado por um ffmpeg próprio em paralelo
+e os resultados são juntados com o concat demuxer. O áudio não passa pelos
+segmentos: é copiado uma única vez da entrada original no passo final
+(o mesmo `c:a copy` do caminho normal).
+
+O encode é retomável: a pasta de trabalho fica ao lado da saída com um nome
+fixo para a mesma entrada e os mesmos parâmetros, e um diário (journal.json)
+registra o plano de cortes e cada segmento já codificado e verificado. Se o
+app fechar, a máquina reiniciar ou um ffmpeg morrer, a próxima execução do
+mesmo trabalho só codifica os segmentos que faltam. A saída final só é
+movida para o destino depois de completa e conferida.
+"""
+import dataclasses
+import glob
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from compressor_engine import (
+    MODE_BITRATE, MODE_COPY, JobResult, Progress, apply_video_filters, build_output_params,
+    container_params, failed_result, is_streaming, is_trimmed, oversize_error, probe_duration, resolve_job,
+    run_ffmpeg, run_job, size_fallback_job,
+)
+from governor import run_quiet
+from lazy_import import lazy_import
+from media_probe import get_probe
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Segmentos menores que isso não compensam o custo de abrir mais um ffmpeg
+MIN_SEGMENT_SECONDS = 10.0
+# Segmentos maiores que isso são divididos mesmo com poucos núcleos: é o
+# máximo de trabalho perdido se o encode for interrompido
+CHECKPOINT_SECONDS = 120.0
+
+JOURNAL_NAME = "journal.json"
+# Mude quando o formato do diário ou a receita dos segmentos mudar
+JOURNAL_VERSION = 1
+
+# Diferença de duração tolerada na verificação (segmento: ~1 frame; final: áudio x vídeo)
+SEGMENT_TOLERANCE = 0.1
+FINAL_TOLERANCE = 0.5
+
+# Pastas de trabalho em uso neste processo (o mesmo vídeo enfileirado duas vezes)
+_active_work_dirs = set()
+_active_work_dirs_lock = threading.Lock()
+
+
+def plan_cut_points(keyframes, duration, segment_count, min_seconds=MIN_SEGMENT_SECONDS):
+    """Escolhe, para cada corte igualmente espaçado, o keyframe mais próximo.
+
+    Devolve a lista de tempos de corte (vazia = não vale a pena dividir).
+    """
+    if not keyframes or not duration or segment_count <= 1:
+        return []
+    segment_count = min(segment_count, int(duration // min_seconds))
+
+    cuts = []
+    for i in range(1, segment_count):
+        target = duration * i / segment_count
+        keyframe = min(keyframes, key=lambda t: abs(t - target))
+        previous = cuts[-1] if cuts else 0.0
+        if keyframe - previous >= min_seconds and duration - keyframe >= min_seconds:
+            cuts.append(keyframe)
+    return cuts
+
+
+def split_video(job, cuts, work_dir, origin=0.0):
+    """Corta o vídeo (sem áudio, sem recodificar) nos keyframes dados.
+
+    `cuts` são tempos do índice de keyframes (a partir do início do
+    arquivo); `origin` é o primeiro keyframe, de onde o segment muxer conta.
+    """
+    pattern = os.path.join(work_dir, "source_%04d.mkv")
+    # O segment muxer corta no primeiro keyframe em/após cada tempo; o recuo
+    # de 1 ms evita que um arredondamento empurre o corte para o GOP seguinte.
+    segment_times = ",".join(f"{max(0.0, t - origin - 0.001):.6f}" for t in cuts)
+    out = ffmpeg.input(job.video_path).video.output(
+        pattern, c="copy", f="segment", segment_times=segment_times, reset_timestamps=1,
+    )
+    run_quiet(out, job.priority, job.control)
+    return sorted(glob.glob(os.path.join(work_dir, "source_*.mkv")))
+
+
+def encode_segment(job, source_path, target_path, on_progress=None):
+    """Codifica um segmento só de vídeo com os mesmos filtros/parâmetros do trabalho."""
+    in_video = apply_video_filters(job, ffmpeg.input(source_path).video)
+    output_params = build_output_params(job)
+    output_params.pop("c:a")
+    out = ffmpeg.output(in_video, target_path, **output_params)
+    run_ffmpeg(out, job, on_progress=on_progress)
+
+
+def concat_segments(job, segment_paths, work_dir, output_path):
+    """Junta os segmentos (concat demuxer) e copia o áudio da entrada original."""
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    in_video = ffmpeg.input(list_path, f="concat", safe=0).video
+    in_audio = ffmpeg.input(job.video_path).audio
+    out = ffmpeg.output(in_video, in_audio, output_path,
+                        **{"c:v": "copy", "c:a": "copy", **container_params(job.save_path)})
+    run_ffmpeg(out, job)
+
+
+def media_duration(path, stream=None):
+    """Duração de um arquivo (ou de um stream, ex.: 'v:0') lida direto do ffprobe.
+
+    Não passa pelo cache de probes: os arquivos intermediários são descartáveis.
+    """
+    if stream is None:
+        return float(ffmpeg.probe(path)["format"]["duration"])
+    info = ffmpeg.probe(path, select_streams=stream)
+    if not info["streams"]:
+        return None
+    return float(info["streams"][0].get("duration") or info["format"]["duration"])
+
+
+def frame_count(path):
+    """Quadros do primeiro stream de vídeo, contando os pacotes (sem decodificar)."""
+    info = ffmpeg.probe(path, select_streams="v:0", count_packets=None)
+    if not info["streams"]:
+        return None
+    return int(info["streams"][0].get("nb_read_packets") or 0)
+
+
+def job_identity(job):
+    """O que define o trabalho para fins de retomada: a entrada (caminho, tamanho,
+    mtime) e os parâmetros pedidos. Devolve (chave curta, identidade)."""
+    st = os.stat(job.video_path)
+    identity = {
+        "input": os.path.abspath(job.video_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "mode": job.mode,
+        "value": job.value,
+        "preset": job.preset,
+        "version": JOURNAL_VERSION,
+    }
+    if job.content_aware:
+        identity["content_aware"] = True # sem o campo, as chaves antigas continuam valendo
+    key = hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return key, identity
+
+
+class SegmentJournal:
+    """Diário em disco de um encode em pedaços (gravado de forma atômica)."""
+
+    def __init__(self, work_dir, identity):
+        self.work_dir = work_dir
+        self.path = os.path.join(work_dir, JOURNAL_NAME)
+        self._lock = threading.Lock()
+        self.data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if self.data.get("identity") != identity:
+            # Diário de outra versão (ou corrompido): começa do zero
+            shutil.rmtree(work_dir, ignore_errors=True)
+            self.data = {"identity": identity, "segments": {}}
+
+    @property
+    def started(self):
+        return "cuts" in self.data
+
+    def save(self):
+        with self._lock:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+
+    def segment_done(self, index, path):
+        """True se o segmento foi registrado e o arquivo continua lá, inteiro."""
+        entry = self.data["segments"].get(str(index))
+        return entry is not None and os.path.isfile(path) and os.path.getsize(path) == entry["size"]
+
+    def mark_segment(self, index, path, duration):
+        with self._lock:
+            self.data["segments"][str(index)] = {"size": os.path.getsize(path), "duration": duration}
+        self.save()
+
+
+class _ChunkProgress:
+    """Soma o progresso dos segmentos em andamento em um único Progress."""
+
+    def __init__(self, job, duration, on_progress):
+        self.job = job
+        self.duration = duration
+        self.on_progress = on_progress
+        self.parts = {}
+        self.lock = threading.Lock()
+
+    def seed(self, index, duration, size):
+        """Conta um segmento já pronto (retomado do diário)."""
+        self.parts[index] = Progress(self.job, out_time=duration, total_size=size, done=True)
+
+    def callback(self, index):
+        def update(progress):
+            with self.lock:
+                self.parts[index] = progress
+                running = [p for p in self.parts.values() if not p.done]
+                self.on_progress(Progress(
+                    self.job,
+                    out_time=sum(p.out_time for p in self.parts.values()),
+                    duration=self.duration,
+                    frame=sum(p.frame for p in self.parts.values()),
+                    fps=sum(p.fps for p in running),
+                    speed=sum(p.speed for p in running),
+                    total_size=sum(p.total_size for p in self.parts.values()),
+                ))
+        return update
+
+
+def encode_checkpointed(journal, index, segment_job, source, target, on_progress=None,
+                        encode=encode_segment):
+    """Codifica um segmento em um arquivo .part, confere a duração e os
+    quadros e só então o registra no diário."""
+    partial = target.replace(".mkv", ".part.mkv")
+    encode(segment_job, source, partial, on_progress)
+    expected = media_duration(source, "v:0")
+    duration = media_duration(partial, "v:0")
+    if duration is None or (expected and abs(duration - expected) > SEGMENT_TOLERANCE):
+        raise RuntimeError(f"Segmento {index} incompleto ({duration}s de {expected}s)")
+    frames, expected_frames = frame_count(partial), frame_count(source)
+    if frames != expected_frames:
+        raise RuntimeError(f"Segmento {index} com {frames} quadros em vez de {expected_frames}")
+    os.replace(partial, target)
+    journal.mark_segment(index, target, duration)
+
+
+def verify_output(path, duration, expected_frames=None):
+    """Confere a saída final (stream de vídeo, duração e quadros) antes de ir para o destino.
+
+    A duração sozinha não pega um GOP perdido ou repetido numa emenda:
+    `expected_frames` (os quadros de vídeo da entrada) tem que bater exato.
+    """
+    video_duration = media_duration(path, "v:0")
+    if video_duration is None:
+        raise RuntimeError("Saída final sem stream de vídeo")
+    if duration and abs(media_duration(path) - duration) > FINAL_TOLERANCE:
+        raise RuntimeError(f"Duração da saída final ({media_duration(path):.2f}s) "
+                           f"diferente da entrada ({duration:.2f}s)")
+    if expected_frames is not None:
+        frames = frame_count(path)
+        if frames != expected_frames:
+            raise RuntimeError(f"Saída final com {frames} quadros em vez de {expected_frames}")
+
+
+def run_chunked_job(job, on_progress=None, segment_count=None, encode=encode_segment, run_whole=run_job):
+    """Executa um trabalho em pedaços paralelos, retomando de um diário se houver.
+    Devolve um JobResult (nunca levanta exceção).
+
+    `encode(segment_job, source, target, on_progress)` codifica um segmento;
+    o padrão roda o ffmpeg nesta máquina (o encode_farm.py manda para os
+    workers). O orçamento `job.threads` também limita quantos segmentos
+    rodam ao mesmo tempo.
+
+    Entradas curtas demais para dividir, que só serão remuxadas, que
+    passam por pipe ou das quais só se quer um trecho seguem pelo caminho
+    normal (`run_whole`, com a mesma assinatura de `run_job`).
+    """
+    if is_streaming(job) or is_trimmed(job):
+        return run_whole(job, on_progress)
+    work_dir = None
+    try:
+        # O orçamento de threads do trabalho (definido pelo governor) vale para a soma dos segmentos
+        thread_budget = job.threads or os.cpu_count() or 1
+        duration = probe_duration(job.video_path)
+
+        # Pasta de trabalho ao lado da saída: mesmo disco, sem cópia entre volumes,
+        # e com nome fixo para o mesmo trabalho (é onde a retomada encontra o diário)
+        output_dir = os.path.dirname(os.path.abspath(job.save_path))
+        key, identity = job_identity(job)
+        work_dir = os.path.join(output_dir, f".chunks_{key}")
+        with _active_work_dirs_lock:
+            if work_dir in _active_work_dirs:
+                # Cópia simultânea do mesmo trabalho: pasta própria, sem retomada
+                work_dir = f"{work_dir}_{uuid.uuid4().hex[:8]}"
+            _active_work_dirs.add(work_dir)
+        journal = SegmentJournal(work_dir, identity)
+
+        if journal.started:
+            # O trabalho resolvido (CRF do Tamanho Alvo, preset do prazo) vem do diário
+            encode_job = dataclasses.replace(job, **journal.data["encode"])
+            cuts = journal.data["cuts"]
+            done = sum(journal.segment_done(i, os.path.join(work_dir, f"encoded_{i:04d}.mkv"))
+                       for i in range(len(cuts) + 1))
+            print(f"Retomando {os.path.basename(job.video_path)}: {done}/{len(cuts) + 1} pedaços prontos")
+            # Mantém o nome de saída da primeira tentativa (se ele ainda está livre)
+            first_path = journal.data.get("save_path")
+            if (first_path and not os.path.exists(first_path)
+                    and os.path.dirname(first_path) == os.path.dirname(os.path.abspath(job.save_path))):
+                job.save_path = first_path
+        else:
+            encode_job = resolve_job(job)
+            if encode_job.mode == MODE_COPY or encode_job.decimate:
+                # Sem quadros repetidos o encode já é curto, e cortes VFR não batem a duração
+                return run_whole(job, on_progress, encode_job)
+            count = segment_count or max(thread_budget, math.ceil((duration or 0) / CHECKPOINT_SECONDS))
+            cuts = plan_cut_points(get_probe().keyframes(job.video_path), duration, count)
+            if not cuts:
+                return run_whole(job, on_progress, encode_job)
+
+            os.makedirs(work_dir, exist_ok=True)
+            journal.data.update({
+                "encode": {"mode": encode_job.mode, "value": encode_job.value, "preset": encode_job.preset,
+                           "tune": encode_job.tune, "max_size": encode_job.max_size},
+                "cuts": cuts,
+                "save_path": os.path.abspath(job.save_path),
+            })
+            journal.save()
+
+        sources = sorted(glob.glob(os.path.join(work_dir, "source_*.mkv")))
+        if not journal.data.get("split") or len(sources) != journal.data["split"]:
+            keyframes = get_probe().keyframes(job.video_path)
+            sources = split_video(job, cuts, work_dir, keyframes[0] if keyframes else 0.0)
+            journal.data["split"] = len(sources)
+            journal.save()
+        targets = [os.path.join(work_dir, f"encoded_{i:04d}.mkv") for i in range(len(sources))]
+        pending = [i for i, target in enumerate(targets) if not journal.segment_done(i, target)]
+
+        tracker = _ChunkProgress(job, duration, on_progress) if on_progress else None
+        if tracker:
+            for i in set(range(len(targets))) - set(pending):
+                entry = journal.data["segments"][str(i)]
+                tracker.seed(i, entry["duration"], entry["size"])
+
+        if pending:
+            workers = min(len(pending), thread_budget)
+            threads = max(1, thread_budget // workers)
+            segment_job = dataclasses.replace(encode_job, threads=threads)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as pool:
+                futures = [
+                    pool.submit(encode_checkpointed, journal, i, segment_job, sources[i], targets[i],
+                                tracker.callback(i) if tracker else None, encode)
+                    for i in pending
+                ]
+                for future in futures:
+                    future.result()
+
+        # Junta em um arquivo temporário; o destino só recebe a saída conferida
+        final_path = os.path.join(work_dir, "final.part.mp4")
+        concat_segments(job, targets, work_dir, final_path)
+        # Duração do vídeo que foi codificado (a do contêiner da entrada pode incluir o start_time)
+        encoded = sum(entry["duration"] for entry in journal.data["segments"].values())
+        verify_output(final_path, encoded, frame_count(job.video_path))
+        error = oversize_error(encode_job, final_path)
+        if error:
+            # Os pedaços não servem para outro bitrate: refaz inteiro, com teto (VBV)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if encode_job.mode == MODE_BITRATE:
+                raise RuntimeError(error)
+            fallback = size_fallback_job(encode_job, encode_job.max_size)
+            print(f"{error}; refazendo com bitrate {fallback.value}k com teto")
+            return run_whole(job, on_progress, fallback)
+        os.replace(final_path, job.save_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+        if on_progress is not None:
+            on_progress(Progress(job, out_time=duration, duration=duration, done=True,
+                                 total_size=os.path.getsize(job.save_path)))
+        return JobResult(job, True)
+    except Exception as e:
+        if work_dir and os.path.isdir(work_dir):
+            if job.control.cancelled:
+                shutil.rmtree(work_dir, ignore_errors=True) # cancelado: não há o que retomar
+            else:
+                print(f"Pedaços prontos mantidos em {work_dir}; rode o mesmo trabalho de novo para retomar.")
+        return failed_result(job, e)
+    finally:
+        with _active_work_dirs_lock:
+            _active_work_dirs.discard(work_dir)
@@ -0,0 +1,195 @@
+# compress_cli.py
+"""Compressão em lote pela linha de comando (sem GUI).
+
+Exemplo:
+    python compress_cli.py videos/*.mp4 -o saida --mode CRF --value 26 -j 4
+
+Entre um download e um upload, sem arquivo intermediário (stdin -> stdout):
+    curl -s URL | python compress_cli.py - -o - | aws s3 cp - s3://balde/saida.mp4
+
+Em uma fazenda de encode (encode_farm.py), em pedaços espalhados pelos workers:
+    python compress_cli.py videos/*.mp4 -o saida --farm http://coordenador:8765 --chunked
+
+Só um trecho (de 1:30 a 2:45), recodificando só as pontas se a entrada já servir:
+    python compress_cli.py aula.mp4 -o saida --mode Bitrate --value 5000 --start 1:30 --end 2:45
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+from chunked_encode import run_chunked_job
+from compressor_engine import (
+    COMPRESSION_MODES, DEFAULT_VALUES, STDIO, VIDEO_EXTENSIONS,
+    CompressionEngine, CompressionJob, build_output_path, default_output_folder, parse_timestamp,
+)
+from encode_farm import FarmRunner
+from governor import PRIORITIES, PRIORITY_NORMAL, ResourceGovernor
+from output_cache import DEFAULT_MAX_BYTES, OutputCache
+from preset_planner import PRESETS, parse_deadline
+from supervisor import DEFAULT_STALL_TIMEOUT
+from telemetry import Telemetry
+
+
+def collect_inputs(paths):
+    """Expande pastas em arquivos de vídeo; arquivos são usados como estão."""
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    inputs.append(os.path.join(path, name))
+        else:
+            inputs.append(path)
+    return inputs
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Compressor de vídeo em lote (FFmpeg).")
+    parser.add_argument("inputs", nargs="+",
+                        help="Arquivos de vídeo ou pastas ('-' = stdin, 'fd:N' = descritor herdado).")
+    parser.add_argument("-o", "--output-folder", default=None,
+                        help="Pasta de saída (padrão: pasta 'Vídeos' do usuário). "
+                             "'-' escreve um MP4 fragmentado no stdout (uma entrada só).")
+    parser.add_argument("--mode", choices=COMPRESSION_MODES, default="CRF",
+                        help="Método de compressão.")
+    parser.add_argument("--value", type=int, default=None,
+                        help="Nível: CRF (18-30), bitrate em kbits/s, índice de resolução (0-2) ou tamanho alvo em MB.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Encodes simultâneos (padrão: metade dos núcleos; 1 com --chunked).")
+    parser.add_argument("--chunked", action="store_true",
+                        help="Divide cada vídeo em pedaços alinhados a keyframes e codifica em paralelo. "
+                             "Se for interrompido, rodar de novo retoma dos pedaços prontos.")
+    parser.add_argument("--farm", default=None, metavar="URL",
+                        help="Manda os trabalhos para o coordenador de uma fazenda de encode (encode_farm.py). "
+                             "Os caminhos precisam valer na máquina do coordenador.")
+    parser.add_argument("--farm-token", default=None, help="Segredo do coordenador da fazenda.")
+    parser.add_argument("--cache-size", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3,
+                        help="Orçamento do cache de saídas em GB (0 desliga o cache).")
+    parser.add_argument("--priority", choices=PRIORITIES, default=PRIORITY_NORMAL,
+                        help="Prioridade de CPU/disco dos ffmpeg (nice/ionice; classe de prioridade no Windows).")
+    parser.add_argument("--max-threads", type=int, default=None,
+                        help="Total de threads do ffmpeg somando os encodes simultâneos.")
+    parser.add_argument("--job-threads", type=int, default=None,
+                        help="Teto de threads do ffmpeg por encode.")
+    parser.add_argument("--preset", choices=PRESETS, default=None,
+                        help="Preset do x264 (padrão: fast, ou escolhido por --deadline/--min-speed).")
+    parser.add_argument("--deadline", default=None,
+                        help="Prazo para o lote inteiro: '2h', '1h30m', '45m' ou 'HH:MM'. "
+                             "Escolhe o preset mais lento (menor arquivo) que ainda termina a tempo.")
+    parser.add_argument("--min-speed", type=float, default=None,
+                        help="Velocidade mínima de cada encode, em múltiplos do tempo real (ex.: 2 = 2x).")
+    parser.add_argument("--content-aware", action="store_true",
+                        help="Analisa cada entrada; gravações de tela perdem os quadros repetidos (saída VFR) "
+                             "e usam o tune do x264 para esse conteúdo.")
+    parser.add_argument("--start", default=None,
+                        help="Início do trecho a manter (segundos, MM:SS ou H:MM:SS).")
+    parser.add_argument("--end", default=None,
+                        help="Fim do trecho a manter (segundos, MM:SS ou H:MM:SS). "
+                             "Se a entrada já serviria sem recodificar, só os GOPs das pontas são recodificados.")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Tempo limite de cada trabalho, em segundos (sem contar fila e pausa).")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help="Mata um ffmpeg que ficar este tanto de segundos sem avançar (0 desliga).")
+    parser.add_argument("--progress", action="store_true",
+                        help="Emite o progresso de cada encode como JSON (uma linha por atualização).")
+    parser.add_argument("--telemetry-log", default=None,
+                        help="Log JSONL (com rotação) da telemetria de cada trabalho "
+                             "(padrão: jobs.jsonl na pasta de cache).")
+    parser.add_argument("--prometheus-textfile", default=None,
+                        help="Arquivo .prom para o textfile collector do node_exporter.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    to_stdout = args.output_folder == STDIO
+    if to_stdout:
+        # O stdout leva o vídeo: as mensagens vão para o stderr
+        sys.stdout = sys.stderr
+    output_folder = args.output_folder or default_output_folder()
+    if not to_stdout and not os.path.isdir(output_folder):
+        print(f"ERRO: Pasta de saída inválida: {output_folder}")
+        return 2
+
+    value = args.value if args.value is not None else DEFAULT_VALUES[args.mode]
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("ERRO: Nenhum vídeo encontrado.")
+        return 2
+    if to_stdout and len(inputs) > 1:
+        print("ERRO: Com '-o -' só dá para comprimir uma entrada.")
+        return 2
+
+    try:
+        deadline = parse_deadline(args.deadline) if args.deadline else None
+        trim_start, trim_end = parse_timestamp(args.start), parse_timestamp(args.end)
+        jobs = [CompressionJob(path, STDIO if to_stdout else build_output_path(path, output_folder),
+                               args.mode, value, preset=args.preset, min_speed=args.min_speed,
+                               content_aware=args.content_aware, trim_start=trim_start, trim_end=trim_end)
+                for path in inputs]
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        return 2
+
+    governor = ResourceGovernor(max_threads=args.max_threads, job_threads=args.job_threads,
+                                priority=args.priority)
+    output_cache = OutputCache(max_bytes=int(args.cache_size * 1024 ** 3)) if args.cache_size > 0 else None
+    telemetry = (Telemetry(args.telemetry_log, args.prometheus_textfile)
+                 if args.telemetry_log or args.prometheus_textfile else None)
+    if args.farm:
+        # A fila de verdade fica no coordenador: aqui só esperamos os resultados
+        engine = CompressionEngine(max_workers=args.jobs or len(jobs),
+                                   runner=FarmRunner(args.farm, args.chunked, args.farm_token),
+                                   output_cache=output_cache, governor=governor, telemetry=telemetry,
+                                   timeout=args.timeout, stall_timeout=args.stall_timeout)
+    elif args.chunked:
+        # Cada trabalho em pedaços já usa todos os núcleos
+        engine = CompressionEngine(max_workers=args.jobs or 1, runner=run_chunked_job,
+                                   output_cache=output_cache, governor=governor, telemetry=telemetry,
+                                   timeout=args.timeout, stall_timeout=args.stall_timeout)
+    else:
+        engine = CompressionEngine(max_workers=args.jobs, output_cache=output_cache, governor=governor,
+                                   telemetry=telemetry, timeout=args.timeout, stall_timeout=args.stall_timeout)
+    print(f"Comprimindo {len(jobs)} arquivo(s) com {engine.max_workers} trabalho(s) simultâneo(s)...")
+
+    # Os callbacks chegam de várias threads; o lock evita linhas misturadas
+    print_lock = threading.Lock()
+
+    def report(result):
+        name = os.path.basename(result.job.video_path)
+        with print_lock:
+            if result.cancelled:
+                print(f"[CANCELADO] {name}")
+            elif result.reused:
+                print(f"[CACHE]  {name} -> {result.job.save_path}")
+            elif result.success:
+                print(f"[OK]     {name} -> {result.job.save_path}")
+            else:
+                print(f"[FALHOU] {name}: {result.error}")
+
+    def report_progress(progress):
+        with print_lock:
+            print(json.dumps(progress.as_dict(), ensure_ascii=False), flush=True)
+
+    try:
+        results = engine.run_batch(jobs, callback=report,
+                                   on_progress=report_progress if args.progress else None,
+                                   deadline=deadline)
+    except KeyboardInterrupt:
+        # Ctrl+C: mata os ffmpeg em andamento, descarta a fila e apaga saídas parciais
+        print("Cancelando...")
+        engine.cancel_all()
+        return 130
+    finally:
+        engine.shutdown()
+
+    failed = sum(1 for r in results if not r.success)
+    print(f"Concluído: {len(results) - failed} sucesso(s), {failed} falha(s).")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,31 @@
+from startup_timing import StartupTimer, launch_origin, startup_timing_enabled
+
+timer = StartupTimer(origin=launch_origin())
+timer.mark("início do app")
+
 import customtkinter as ctk
 from CompressorClass import CompressorApp
 
+timer.mark("imports")
 
-# Define a aparência padrão (pode ser "dark", "light")
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("blue")
 
-if __name__ == "__main__":
+def main():
+    # Define a aparência padrão (pode ser "dark", "light")
+    ctk.set_appearance_mode("dark")
+    # O tema "blue" já é o carregado no import do customtkinter; chamar
+    # ctk.set_default_color_theme("blue") só leria o mesmo JSON de novo.
+
     app = CompressorApp()
-    app.mainloop()
\ No newline at end of file
+    timer.mark("janela criada")
+
+    if startup_timing_enabled():
+        def report():
+            timer.mark("primeira tela")
+            print(timer.report("app"))
+        app.after_idle(report)
+
+    app.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,859 @@
+# compressor_engine.py
+"""Motor de compressão independente da UI.
+
+Monta o grafo do FFmpeg a partir de um CompressionJob e executa vários
+trabalhos em paralelo. Cada trabalho roda em um processo ffmpeg próprio;
+as threads do pool orquestram cada trabalho e reportam percentual, ETA e
+velocidade, enquanto os pipes de todos os ffmpeg (log e -progress) são lidos
+por um único event loop (supervisor.py), que também aplica tempo limite e
+detecta encodes travados. Prioridade, limites de threads/concorrência,
+cancelamento e pausa ficam no governor.py.
+
+Saídas em arquivo são escritas com um nome temporário na mesma pasta e só
+renomeadas para o destino quando o ffmpeg termina bem, então quem vigia a
+pasta nunca vê um mp4 pela metade. Entrada e saída também podem ser pipes
+('-' para stdin/stdout, 'fd:N' para um descritor herdado, ou um FIFO): a
+saída por pipe sai como MP4 fragmentado, que não precisa voltar ao início
+do arquivo para fechar.
+
+Um trabalho pode pedir só um trecho da entrada (`trim_start`/`trim_end`):
+recodificado, só o trecho é lido e codificado; quando a entrada já serviria
+como está (Cópia), só os GOPs das pontas são recodificados (smart_trim.py).
+"""
+import os
+import dataclasses
+import datetime
+import random
+import re
+import stat
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from content_analysis import apply_content_settings
+from governor import JobCancelled, JobControl, JobTimedOut, ResourceGovernor, spawn, wait_process
+from lazy_import import lazy_import
+from media_probe import VIDEO_EXTENSIONS, get_probe
+from preset_planner import DEFAULT_PRESET, PRESETS, choose_preset, record_encode, required_speed
+from supervisor import DEFAULT_STALL_TIMEOUT, ProgressMailbox, get_supervisor
+from target_size import find_crf_for_size, video_budget
+from telemetry import RateStats, get_telemetry
+
+# ffmpeg-python só é carregado no primeiro uso (abre a GUI mais rápido)
+ffmpeg = lazy_import("ffmpeg")
+# smart_trim importa este módulo: só é carregado quando um corte é copiado
+smart_trim = lazy_import("smart_trim")
+
+
+# --- Modos e valores técnicos (compartilhados com a GUI e a CLI) ---
+MODE_CRF = "CRF"
+MODE_BITRATE = "Bitrate"
+MODE_RESOLUTION = "Resolução"
+MODE_TARGET_SIZE = "Tamanho"
+COMPRESSION_MODES = (MODE_CRF, MODE_BITRATE, MODE_RESOLUTION, MODE_TARGET_SIZE)
+# Modo interno: resolve_job troca para ele quando recodificar não ajudaria
+MODE_COPY = "Cópia"
+
+# Valor inicial do slider em cada modo
+DEFAULT_VALUES = {
+    MODE_CRF: 23,
+    MODE_BITRATE: 1500,
+    MODE_RESOLUTION: 1,
+    MODE_TARGET_SIZE: 100, # MB
+}
+
+RESOLUTION_MAP = {
+    0: {"label": "480p", "height": 480},
+    1: {"label": "720p", "height": 720},
+    2: {"label": "1080p", "height": 1080}
+}
+
+# --- Entrada/saída por pipe ---
+STDIO = "-" # stdin como entrada, stdout como saída
+# MP4 fragmentado: o moov vai no começo, vazio, e cada fragmento se fecha sozinho
+FRAGMENTED_MP4 = {"f": "mp4", "movflags": "frag_keyframe+empty_moov+default_base_moof"}
+# Contêineres em que o faststart (moov no início) se aplica
+FASTSTART_EXTENSIONS = (".mp4", ".m4v", ".mov")
+# Áudio copiado de um trecho: o seek cai no keyframe de vídeo anterior, e sem
+# isto o áudio desde ali entraria na saída (no MP4 fragmentado, adiantado)
+TRIM_AUDIO_PARAMS = {"copypriorss": 0}
+
+# Plano B do Tamanho Alvo (bitrate médio com teto): segundos de vídeo no buffer do VBV
+VBV_SECONDS = 2.0
+
+
+@dataclass
+class CompressionJob:
+    """Um trabalho de compressão: entrada, saída e parâmetros do encoder."""
+    video_path: str
+    save_path: str
+    mode: str = MODE_CRF
+    value: int = DEFAULT_VALUES[MODE_CRF]
+    threads: int = None  # None = o ffmpeg decide
+    priority: str = None # governor.PRIORITIES (None = normal)
+    preset: str = None   # preset do x264 (None = escolhido pelo prazo, ou o padrão)
+    deadline: float = None  # instante (time.time) em que o encode precisa ter terminado
+    min_speed: float = None # velocidade mínima, em múltiplos do tempo real
+    content_aware: bool = False # analisa a entrada e ajusta o encode para gravações de tela
+    decimate: bool = False  # descarta quadros repetidos (mpdecimate, saída VFR)
+    tune: str = None        # tune do x264 (ex.: 'animation', 'stillimage')
+    timeout: float = None   # segundos para o trabalho inteiro, sem contar fila e pausa (None = sem limite)
+    stall_timeout: float = None # segundos sem o ffmpeg avançar até matá-lo (None = padrão do motor, 0 = nunca)
+    trim_start: float = None # início do trecho, em segundos (None = começo da entrada)
+    trim_end: float = None   # fim do trecho, em segundos (None = até o fim da entrada)
+    max_size: int = None     # bytes: teto da saída (Tamanho Alvo resolvido); passar dele é falha
+    # Compartilhado pelas cópias derivadas (dataclasses.replace) do trabalho
+    control: JobControl = field(default_factory=JobControl, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.mode not in COMPRESSION_MODES + (MODE_COPY,):
+            raise ValueError(f"Modo de compressão desconhecido: {self.mode}")
+        if self.mode == MODE_RESOLUTION and self.value not in RESOLUTION_MAP:
+            raise ValueError(f"Nível de resolução inválido: {self.value}")
+        if self.mode == MODE_TARGET_SIZE and self.value <= 0:
+            raise ValueError(f"Tamanho alvo inválido: {self.value} MB")
+        if self.preset is not None and self.preset not in PRESETS:
+            raise ValueError(f"Preset desconhecido: {self.preset}")
+        if self.min_speed is not None and self.min_speed <= 0:
+            raise ValueError(f"Velocidade mínima inválida: {self.min_speed}")
+        if self.timeout is not None and self.timeout < 0:
+            raise ValueError(f"Tempo limite inválido: {self.timeout}")
+        if self.trim_start is not None and self.trim_start < 0:
+            raise ValueError(f"Início do corte inválido: {self.trim_start}")
+        if self.trim_end is not None and self.trim_end <= (self.trim_start or 0.0):
+            raise ValueError(f"O fim do corte ({self.trim_end}s) precisa vir depois do início")
+
+
+@dataclass
+class JobResult:
+    """Resultado de um trabalho (sucesso ou falha, por arquivo)."""
+    job: CompressionJob
+    success: bool
+    error: str = None
+    stderr: str = field(default=None, repr=False)
+    reused: bool = False # saída veio do cache, sem encode
+    cancelled: bool = False
+
+
+@dataclass
+class Progress:
+    """Um instantâneo do progresso de um encode, lido do `-progress` do ffmpeg."""
+    job: CompressionJob
+    out_time: float = 0.0   # segundos do vídeo já codificados
+    duration: float = None  # duração da entrada (None = desconhecida)
+    frame: int = 0          # quadros já codificados
+    fps: float = 0.0
+    speed: float = 0.0      # múltiplo do tempo real (1.0 = tempo real)
+    total_size: int = 0     # bytes escritos até agora
+    done: bool = False
+
+    @property
+    def fraction(self):
+        """Fração concluída (0.0 a 1.0), ou None sem duração conhecida."""
+        if self.done:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(1.0, max(0.0, self.out_time / self.duration))
+
+    @property
+    def percent(self):
+        fraction = self.fraction
+        return None if fraction is None else fraction * 100
+
+    @property
+    def eta(self):
+        """Segundos restantes estimados pela velocidade atual."""
+        if self.done:
+            return 0.0
+        if not self.duration or self.speed <= 0:
+            return None
+        return max(0.0, (self.duration - self.out_time) / self.speed)
+
+    @property
+    def projected_size(self):
+        """Tamanho final estimado em bytes, extrapolando o que já foi escrito."""
+        fraction = self.fraction
+        if not fraction or not self.total_size:
+            return None
+        return int(self.total_size / fraction)
+
+    def as_dict(self):
+        return {
+            "input": self.job.video_path,
+            "output": self.job.save_path,
+            "out_time": round(self.out_time, 3),
+            "duration": self.duration,
+            "frame": self.frame,
+            "percent": None if self.percent is None else round(self.percent, 2),
+            "eta": None if self.eta is None else round(self.eta, 1),
+            "fps": self.fps,
+            "speed": self.speed,
+            "total_size": self.total_size,
+            "projected_size": self.projected_size,
+            "done": self.done,
+        }
+
+
+def format_duration(seconds):
+    """Formata segundos como MM:SS ou H:MM:SS ('--:--' se desconhecido)."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def parse_timestamp(text):
+    """Converte '90', '1:30' ou '1:02:03.5' em segundos (vazio = None)."""
+    text = (text or "").strip()
+    if not text:
+        return None
+    parts = text.split(":")
+    try:
+        if len(parts) > 3 or any(float(part) < 0 for part in parts):
+            raise ValueError
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise ValueError(f"Tempo inválido: '{text}' (use segundos, MM:SS ou H:MM:SS)")
+    return seconds
+
+
+def default_output_folder():
+    """Encontra a pasta 'Vídeos' do usuário (ou a home) para salvar as saídas."""
+    try:
+        home = Path.home()
+        videos_dir_pt = home / "Vídeos" # Português
+        videos_dir_en = home / "Videos" # Inglês
+
+        if videos_dir_pt.is_dir():
+            return str(videos_dir_pt)
+        elif videos_dir_en.is_dir():
+            return str(videos_dir_en)
+        return str(home)
+    except Exception as e:
+        print(f"Erro ao encontrar pasta de vídeos: {e}")
+        return os.getcwd()
+
+
+def build_output_path(video_path, output_folder):
+    """Gera um nome único (timestamp + código aleatório) dentro da pasta de saída."""
+    base_name_full = "stream" if pipe_url(video_path, 0) else os.path.basename(video_path)
+    original_name, _ = os.path.splitext(base_name_full)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    unique_code = f"{random.randint(100000, 999999)}"
+    file_name = f"{original_name}_{timestamp}_{unique_code}.mp4"
+    return os.path.join(output_folder, file_name)
+
+
+def pipe_url(path, stdio_fd):
+    """URL do ffmpeg para '-', 'pipe:N' ou 'fd:N' (None para caminhos comuns).
+
+    `stdio_fd` é o descritor que '-' representa: 0 na entrada, 1 na saída.
+    """
+    if path == STDIO:
+        return f"pipe:{stdio_fd}"
+    match = re.fullmatch(r"(?:pipe|fd):(\d+)", path or "")
+    return f"pipe:{match[1]}" if match else None
+
+
+def is_pipe(path, stdio_fd):
+    """True se o caminho não permite seek: pipe, descritor, FIFO ou dispositivo."""
+    if pipe_url(path, stdio_fd) is not None:
+        return True
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False # ainda não existe: vai ser um arquivo comum
+    return stat.S_ISFIFO(mode) or stat.S_ISCHR(mode)
+
+
+def is_streaming(job):
+    """O trabalho lê ou escreve por pipe (sem probe, cache nem divisão em pedaços)."""
+    return is_pipe(job.video_path, 0) or is_pipe(job.save_path, 1)
+
+
+def pipe_fds(job):
+    """Descritores além de stdin/stdout/stderr que o ffmpeg precisa herdar."""
+    urls = (pipe_url(job.video_path, 0), pipe_url(job.save_path, 1))
+    return tuple(sorted({int(url.split(":")[1]) for url in urls if url} - {0, 1, 2}))
+
+
+def partial_path(save_path):
+    """Nome temporário, oculto e na mesma pasta do destino (o rename é atômico)."""
+    folder, name = os.path.split(os.path.abspath(save_path))
+    stem, ext = os.path.splitext(name)
+    return os.path.join(folder, f".{stem}.{uuid.uuid4().hex[:8]}.part{ext}")
+
+
+def container_params(save_path):
+    """Opções do contêiner: MP4 fragmentado em pipes, faststart em arquivos mp4."""
+    if is_pipe(save_path, 1):
+        return dict(FRAGMENTED_MP4)
+    if save_path.lower().endswith(FASTSTART_EXTENSIONS):
+        return {"movflags": "+faststart"}
+    return {}
+
+
+def is_trimmed(job):
+    """O trabalho pede só um trecho da entrada."""
+    return bool(job.trim_start) or job.trim_end is not None
+
+
+def trim_span(job, duration=None):
+    """(início, fim) do trecho em segundos; fim None = até o fim da entrada.
+
+    Com a `duration` da entrada, um fim além dela vira None.
+    """
+    start, end = job.trim_start or 0.0, job.trim_end
+    if end is not None and duration and end >= duration:
+        end = None
+    return start, end
+
+
+def clip_duration(job, duration):
+    """Duração do que o trabalho vai codificar: o trecho ou a entrada inteira."""
+    start, end = trim_span(job, duration)
+    if end is not None:
+        return end - start
+    return None if duration is None else max(0.0, duration - start)
+
+
+def clip_info(job, info):
+    """MediaInfo do trecho: duração e tamanho proporcionais ao corte.
+
+    As decisões (preset pelo prazo, Cópia, Tamanho Alvo) valem para o que sai.
+    """
+    if not is_trimmed(job) or not info.duration:
+        return info
+    duration = clip_duration(job, info.duration)
+    return dataclasses.replace(info, duration=duration, size=int(info.size * duration / info.duration))
+
+
+def trim_params(job):
+    """Opções de entrada que limitam a leitura ao trecho (seek e duração)."""
+    start, end = trim_span(job)
+    params = {}
+    if start:
+        params["ss"] = start
+    if end is not None:
+        params["t"] = end - start
+    return params
+
+
+def default_worker_count():
+    """Quantos ffmpeg rodar ao mesmo tempo, com base nos núcleos da máquina.
+
+    O libx264 já usa várias threads por conta própria, então metade dos
+    núcleos em trabalhos simultâneos dá boa ocupação sem disputa excessiva.
+    """
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+def build_output_params(job):
+    """Parâmetros do encoder para o modo do trabalho (sem filtros)."""
+    if job.mode == MODE_COPY:
+        return {"c:v": "copy", "c:a": "copy"}
+
+    output_params = {"c:a": "copy", "preset": job.preset or DEFAULT_PRESET}
+    if job.tune:
+        output_params["tune"] = job.tune
+    if job.decimate:
+        # Cada quadro mantido dura até o próximo (sem isso o mp4 repetiria os descartados)
+        output_params["fps_mode"] = "vfr"
+
+    if job.mode == MODE_CRF:
+        output_params["crf"] = job.value
+    elif job.mode == MODE_BITRATE:
+        output_params["b:v"] = f"{job.value}k"
+        if job.max_size:
+            # VBV: o vídeo nunca passa de maxrate * duração + bufsize
+            output_params.update(maxrate=f"{job.value}k", bufsize=f"{int(job.value * VBV_SECONDS)}k")
+
+    if job.threads:
+        output_params["threads"] = job.threads
+    return output_params
+
+
+def copy_reason(job, info):
+    """Motivo para só remuxar em vez de recodificar (None = recodificar).
+
+    Só vale para entradas H.264, que cabem no mp4 de saída sem conversão.
+    """
+    if info.video_codec != "h264":
+        return None
+
+    if job.mode == MODE_BITRATE:
+        video_bit_rate = info.video_bit_rate or info.bit_rate
+        if video_bit_rate and video_bit_rate <= job.value * 1000:
+            return f"bitrate da entrada ({video_bit_rate // 1000}k) já é menor ou igual a {job.value}k"
+    elif job.mode == MODE_RESOLUTION:
+        height = RESOLUTION_MAP[job.value]["height"]
+        if info.height and info.height <= height:
+            return f"altura da entrada ({info.height}p) já é menor ou igual a {height}p"
+    elif job.mode == MODE_TARGET_SIZE:
+        if info.size <= job.value * 1024 * 1024:
+            return f"entrada ({info.size / 1024 / 1024:.1f} MB) já cabe em {job.value} MB"
+    return None
+
+
+def output_height(job, info):
+    """Altura do vídeo que o encoder vai receber (depois do scale da Resolução)."""
+    if job.mode == MODE_RESOLUTION:
+        return RESOLUTION_MAP[job.value]["height"]
+    return info.height
+
+
+def resolve_preset(job):
+    """`job` com o preset escolhido pelo prazo ou velocidade mínima.
+
+    Sem prazo, com preset explícito, Cópia ou entrada por pipe, devolve o
+    próprio `job`.
+    """
+    if job.preset is not None or (job.deadline is None and not job.min_speed):
+        return job
+    if job.mode == MODE_COPY or is_pipe(job.video_path, 0):
+        return job
+    try:
+        info = clip_info(job, get_probe().probe(job.video_path))
+        preset = choose_preset(info, output_height(job, info), job.deadline, job.min_speed)
+    except Exception as e:
+        print(f"Erro ao escolher o preset pelo prazo: {e}")
+        preset = DEFAULT_PRESET
+    return dataclasses.replace(job, preset=preset)
+
+
+def resolve_job(job):
+    """Transforma o trabalho pedido no encode que realmente vai rodar.
+
+    - Entrada por pipe roda como pedida (não dá para analisá-la antes).
+    - Com prazo ou velocidade mínima, escolhe o preset pelo fps medido.
+    - Com `content_aware`, gravações de tela ganham decimate e tune.
+    - Se recodificar não reduziria tamanho nem resolução, vira Cópia (remux).
+      Com corte, a Cópia só vale se o smart render aceitar a entrada; senão
+      o trecho é recodificado.
+    - Tamanho: as amostras escolhem o CRF e o trabalho vira um CRF. Se nem o
+      CRF máximo couber, cai para bitrate médio calculado pelo orçamento.
+    """
+    if job.mode == MODE_COPY:
+        return job
+
+    if is_pipe(job.video_path, 0):
+        # Um pipe só pode ser lido uma vez: nada de probe nem de amostras
+        if job.mode == MODE_TARGET_SIZE:
+            raise ValueError("O Tamanho Alvo precisa de um arquivo de entrada (não funciona com pipe).")
+        return job
+
+    if job.trim_start:
+        duration = probe_duration(job.video_path)
+        if duration and job.trim_start >= duration:
+            raise ValueError(f"O início do corte ({format_duration(job.trim_start)}) "
+                             f"passa do fim do vídeo ({format_duration(duration)})")
+
+    job = resolve_preset(job)
+
+    if job.content_aware and not job.decimate and job.tune is None:
+        job = apply_content_settings(job)
+
+    if job.mode == MODE_CRF:
+        return job
+
+    try:
+        info = clip_info(job, get_probe().probe(job.video_path))
+    except Exception:
+        info = None # sem probe não dá para decidir; recodifica como antes
+    reason = copy_reason(job, info) if info else None
+    if reason and is_trimmed(job) and not smart_trim.can_smart_trim(job.video_path):
+        print(f"Corte de {os.path.basename(job.video_path)} sem smart render: o trecho será recodificado")
+        if job.mode == MODE_RESOLUTION:
+            # A altura já serve: recodifica sem o scale, na qualidade das pontas do smart render
+            return dataclasses.replace(job, mode=MODE_CRF, value=smart_trim.BOUNDARY_CRF)
+        reason = None
+    max_size = int(job.value * 1024 * 1024) if job.mode == MODE_TARGET_SIZE else job.max_size
+    if reason:
+        print(f"Sem recodificar {os.path.basename(job.video_path)}: {reason}")
+        return dataclasses.replace(job, mode=MODE_COPY, max_size=max_size)
+
+    if job.mode != MODE_TARGET_SIZE:
+        return job
+
+    start, _ = trim_span(job)
+    crf, predicted, budget = find_crf_for_size(job.video_path, job.value, job.preset or DEFAULT_PRESET,
+                                               job.threads, job.priority, job.control,
+                                               job.decimate, job.tune, start, info.duration if info else None)
+    if crf is not None:
+        print(f"Tamanho alvo {job.value} MB: CRF {crf} (vídeo previsto {predicted / 1024 / 1024:.1f} MB)")
+        return dataclasses.replace(job, mode=MODE_CRF, value=crf, max_size=max_size)
+
+    fallback = size_fallback_job(job, max_size)
+    if predicted is None:
+        print(f"Tamanho alvo {job.value} MB: entrada curta, sem amostras; bitrate {fallback.value}k com teto")
+    else:
+        print(f"Tamanho alvo {job.value} MB: nem o CRF máximo cabe, usando bitrate {fallback.value}k com teto")
+    return fallback
+
+
+def size_fallback_job(job, max_size):
+    """Plano B do Tamanho Alvo: bitrate médio com teto (VBV) que cabe em `max_size`.
+
+    O VBV limita o vídeo a maxrate * duração + bufsize; o bitrate já
+    desconta o buffer, então o teto cabe no orçamento de vídeo.
+    """
+    info = clip_info(job, get_probe().probe(job.video_path))
+    if not info.duration:
+        raise ValueError("Duração desconhecida: não dá para calcular o bitrate do tamanho alvo.")
+    budget = video_budget(info, max_size / 1024 / 1024)
+    kbits = max(1, int(budget * 8 / (info.duration + VBV_SECONDS) / 1000))
+    return dataclasses.replace(job, mode=MODE_BITRATE, value=kbits, max_size=max_size)
+
+
+def oversize_error(encode_job, path):
+    """Mensagem se a saída passou do teto do Tamanho Alvo (None = cabe ou sem teto)."""
+    if not encode_job.max_size or not path:
+        return None
+    size = os.path.getsize(path)
+    if size <= encode_job.max_size:
+        return None
+    return (f"Saída de {size / 1024 / 1024:.2f} MB passou do tamanho alvo "
+            f"({encode_job.max_size / 1024 / 1024:.2f} MB)")
+
+
+def apply_video_filters(job, in_video):
+    """Aplica os filtros de vídeo do trabalho: decimate e o scale da Resolução."""
+    if job.decimate and job.mode != MODE_COPY:
+        in_video = in_video.filter("mpdecimate") # antes do scale: menos quadros para redimensionar
+    if job.mode == MODE_RESOLUTION:
+        height = RESOLUTION_MAP[job.value]["height"]
+        in_video = in_video.filter('scale', -2, height)
+    return in_video
+
+
+def build_ffmpeg_output(job, output_path=None):
+    """Monta o grafo do ffmpeg-python para um trabalho.
+
+    `output_path` substitui o destino (ex.: o nome temporário de run_job).
+    Com corte, só o trecho é lido (seek na entrada, exato ao recodificar).
+    """
+    input_url = pipe_url(job.video_path, 0)
+    in_file = ffmpeg.input(input_url or job.video_path, **trim_params(job))
+    # Sem probe do pipe, o áudio é opcional ('0:a?') para não falhar em vídeo mudo
+    in_audio = in_file["a?"] if is_pipe(job.video_path, 0) else in_file.audio
+    in_video = apply_video_filters(job, in_file.video)
+
+    output_params = {**build_output_params(job), **container_params(job.save_path)}
+    if is_trimmed(job):
+        output_params.update(TRIM_AUDIO_PARAMS)
+    output = output_path or pipe_url(job.save_path, 1) or job.save_path
+    return ffmpeg.output(in_video, in_audio, output, **output_params)
+
+
+def probe_duration(video_path):
+    """Duração da entrada em segundos, via cache de probe (None se não der para saber)."""
+    if is_pipe(video_path, 0):
+        return None # o ffprobe consumiria o que o encode precisa ler
+    try:
+        return get_probe().probe(video_path).duration
+    except Exception:
+        return None
+
+
+def _parse_float(value, suffix=""):
+    """Converte os valores do -progress ('N/A', '1.5x', ...) para float."""
+    try:
+        return float(value.rstrip(suffix))
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+class ProgressParser:
+    """Monta um Progress a cada bloco `key=value` que o ffmpeg escreve em -progress."""
+
+    def __init__(self, job, duration=None):
+        self.progress = Progress(job, duration=duration)
+
+    def __call__(self, raw_line):
+        """Lê uma linha; devolve o Progress quando ela fecha um bloco (senão None)."""
+        line = raw_line.decode("utf-8", errors="replace").strip()
+        key, sep, value = line.partition("=")
+        if not sep:
+            return None
+
+        progress = self.progress
+        if key == "out_time_us":
+            # out_time_us pode vir como 'N/A' no começo do encode
+            progress.out_time = max(0.0, _parse_float(value) / 1_000_000)
+        elif key == "frame":
+            progress.frame = int(_parse_float(value))
+        elif key == "fps":
+            progress.fps = _parse_float(value)
+        elif key == "speed":
+            progress.speed = _parse_float(value, "x")
+        elif key == "total_size":
+            progress.total_size = int(_parse_float(value))
+        elif key == "progress":
+            progress.done = value == "end"
+            return Progress(**vars(progress))
+        return None
+
+
+def run_ffmpeg(out, job, duration=None, on_progress=None):
+    """Roda um grafo do ffmpeg-python lendo o -progress.
+
+    Levanta ffmpeg.Error se o ffmpeg falhar (com as últimas linhas do log)
+    e JobTimedOut se o supervisor o matar por tempo limite ou travamento.
+
+    `on_progress(progress)` é chamado na thread atual com o progresso mais
+    recente (o ffmpeg atualiza cerca de duas vezes por segundo).
+
+    Entrada e saída por stdin/stdout vão direto para o ffmpeg (ele herda os
+    descritores, sem cópia passando pelo Python); nesse caso o -progress
+    vem misturado ao stderr.
+    """
+    to_stdout = pipe_url(job.save_path, 1) == "pipe:1"
+    out = out.global_args("-progress", "pipe:2" if to_stdout else "pipe:1", "-nostats")
+    process = spawn(out, job.priority, job.control, pass_fds=pipe_fds(job),
+                    pipe_stdout=not to_stdout, pipe_stderr=True, overwrite_output=True)
+
+    with job.control.track(process):
+        mailbox = ProgressMailbox(ProgressParser(job, duration))
+        supervision = get_supervisor().watch(process, job.control, job.stall_timeout, mailbox.feed)
+        supervision.finished.add_done_callback(mailbox.close)
+        for progress in mailbox:
+            if on_progress is not None:
+                on_progress(progress)
+        supervision.wait()
+        wait_process(process, job.control)
+    if supervision.reason is not None:
+        raise JobTimedOut(supervision.reason, supervision.tail())
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", None, supervision.tail())
+
+
+def cancelled_result(job):
+    """JobResult de um trabalho cancelado.
+
+    A saída parcial fica sempre num nome temporário, que quem a escreveu
+    apaga; o destino (e um arquivo que já estivesse lá) não é tocado.
+    """
+    print(f"Cancelado: {os.path.basename(job.video_path)}")
+    return JobResult(job, False, error="cancelado", cancelled=True)
+
+
+def failed_result(job, error):
+    """Converte uma exceção de um trabalho em JobResult de falha (e loga no console)."""
+    # Cancelar mata o ffmpeg, que então sai com erro: isso não é uma falha
+    if isinstance(error, JobCancelled) or job.control.cancelled:
+        return cancelled_result(job)
+    if isinstance(error, ffmpeg.Error):
+        stderr = error.stderr.decode(errors="replace") if error.stderr else ""
+        print("Erro no FFmpeg:", stderr)
+        return JobResult(job, False, error="ffmpeg", stderr=stderr)
+    if isinstance(error, JobTimedOut):
+        stderr = error.stderr.decode(errors="replace") if error.stderr else ""
+        print(f"Interrompido ({error}):", stderr)
+        return JobResult(job, False, error=str(error), stderr=stderr)
+    print("Erro inesperado:", str(error))
+    return JobResult(job, False, error=str(error))
+
+
+def run_job(job, on_progress=None, encode_job=None):
+    """Executa um trabalho e devolve um JobResult (nunca levanta exceção).
+
+    `encode_job` é o trabalho já resolvido por `resolve_job`, se quem chamou
+    já fez essa etapa.
+
+    Em arquivo, o ffmpeg escreve num nome temporário ao lado do destino,
+    renomeado só no sucesso; em pipe, escreve direto. Um corte que seria
+    Cópia passa pelo smart render (smart_trim.py).
+
+    Com teto de tamanho (Tamanho Alvo), uma saída grande demais é refeita
+    uma vez com bitrate com teto (VBV); se ainda passar, o trabalho falha.
+    """
+    temp_path = None
+    try:
+        encode_job = encode_job or resolve_job(job)
+        if not is_pipe(job.save_path, 1):
+            temp_path = partial_path(job.save_path)
+        started, pauses = time.monotonic(), job.control.pauses
+        encode_once(job, encode_job, temp_path, on_progress)
+        error = oversize_error(encode_job, temp_path)
+        if error and encode_job.mode != MODE_BITRATE:
+            encode_job = size_fallback_job(encode_job, encode_job.max_size)
+            print(f"{error}; refazendo com bitrate {encode_job.value}k com teto")
+            started, pauses = time.monotonic(), job.control.pauses
+            encode_once(job, encode_job, temp_path, on_progress)
+            error = oversize_error(encode_job, temp_path)
+        if error:
+            raise RuntimeError(error)
+        if temp_path:
+            os.replace(temp_path, job.save_path)
+        # Um encode pausado no meio não diz nada sobre a velocidade do preset
+        if encode_job.mode != MODE_COPY and not is_pipe(job.video_path, 0) and job.control.pauses == pauses:
+            record_throughput(encode_job, time.monotonic() - started)
+        return JobResult(job, True)
+    except Exception as e:
+        discard_partial(temp_path)
+        return failed_result(job, e)
+
+
+def encode_once(job, encode_job, output_path, on_progress=None):
+    """Roda o encode resolvido `encode_job` em `output_path` (None = o destino, ex.: pipe)."""
+    # O progresso continua referindo o trabalho original (a GUI rastreia por ele)
+    if encode_job.mode == MODE_COPY and is_trimmed(encode_job):
+        smart_trim.run_smart_trim(job, output_path, on_progress)
+    else:
+        out = build_ffmpeg_output(encode_job, output_path)
+        run_ffmpeg(out, job, clip_duration(job, probe_duration(job.video_path)), on_progress)
+
+
+def discard_partial(path):
+    """Apaga uma saída temporária que não chegou ao destino."""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        print(f"Erro ao apagar a saída parcial {path}: {e}")
+
+
+def result_status(result):
+    """Status de um JobResult na telemetria."""
+    if result.cancelled:
+        return "cancelado"
+    if result.reused:
+        return "cache"
+    return "ok" if result.success else "falhou"
+
+
+def record_throughput(job, seconds):
+    """Alimenta as medições de fps por preset usadas na escolha por prazo."""
+    try:
+        info = clip_info(job, get_probe().probe(job.video_path))
+        frames = (info.duration or 0) * (info.frame_rate or 0)
+        record_encode(job.preset, output_height(job, info), frames, seconds)
+    except Exception as e:
+        print(f"Erro ao registrar a velocidade do encode: {e}")
+
+
+class CompressionEngine:
+    """Fila de trabalhos com N encodes simultâneos."""
+
+    def __init__(self, max_workers=None, runner=run_job, output_cache=None, governor=None,
+                 telemetry=None, timeout=None, stall_timeout=DEFAULT_STALL_TIMEOUT):
+        """`runner(job, on_progress)` executa um trabalho e devolve um JobResult.
+
+        `output_cache` (um output_cache.OutputCache) devolve saídas de trabalhos
+        idênticos já feitos sem rodar o encode de novo.
+
+        `governor` (um governor.ResourceGovernor) aplica prioridade e limites de
+        threads/concorrência; passe o mesmo para motores que dividem a máquina.
+
+        `telemetry` (um telemetry.Telemetry) recebe um registro por trabalho;
+        o padrão grava o log JSONL ao lado dos caches.
+
+        `timeout` e `stall_timeout` (segundos) valem para os trabalhos que
+        não definiram os seus: o primeiro limita o trabalho inteiro, o segundo
+        mata um ffmpeg que parou de avançar.
+        """
+        self.max_workers = max_workers or default_worker_count()
+        self.runner = runner
+        self.output_cache = output_cache
+        self.governor = governor or ResourceGovernor()
+        self.telemetry = telemetry or get_telemetry()
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix="compressor")
+
+    def threads_per_job(self):
+        """Divide os núcleos (ou o orçamento do governor) entre os trabalhos simultâneos."""
+        return self.governor.threads_for(self.max_workers)
+
+    def submit(self, job, callback=None, on_progress=None):
+        """Enfileira um trabalho. Cancele ou pause pelo `job.control`.
+
+        `callback(result)` e `on_progress(progress)` rodam na thread do worker.
+        """
+        limit = self.threads_per_job()
+        if limit is not None:
+            job.threads = min(job.threads or limit, limit)
+        if job.priority is None:
+            job.priority = self.governor.priority
+        if job.timeout is None:
+            job.timeout = self.timeout
+        if job.stall_timeout is None:
+            job.stall_timeout = self.stall_timeout
+
+        self.governor.register(job.control)
+        future = self._executor.submit(self._run, job, on_progress)
+        if callback is not None:
+            future.add_done_callback(lambda f: callback(f.result()))
+        return future
+
+    def _run(self, job, on_progress):
+        rates = RateStats()
+
+        def observe(progress):
+            rates.observe(progress)
+            if on_progress is not None:
+                on_progress(progress)
+
+        started = None
+        try:
+            with self.governor.slot(job.control):
+                started = time.monotonic() # o tempo na fila não conta
+                job.control.start_deadline(job.timeout)
+                if self.output_cache is not None:
+                    result = self.output_cache.run(job, self.runner, observe)
+                else:
+                    result = self.runner(job, observe)
+        except JobCancelled:
+            result = cancelled_result(job) # cancelado ainda na fila
+        finally:
+            self.governor.unregister(job.control)
+
+        seconds = time.monotonic() - started if started is not None else 0.0
+        self.telemetry.record(job, result_status(result), seconds, rates, result.error)
+        return result
+
+    def cancel_all(self):
+        """Cancela os trabalhos deste motor e de quem divide o mesmo governor."""
+        self.governor.cancel_all()
+
+    def pause_all(self):
+        self.governor.pause_all()
+
+    def resume_all(self):
+        self.governor.resume_all()
+
+    def apply_batch_deadline(self, jobs, deadline):
+        """Converte o prazo do lote em velocidade mínima para cada trabalho.
+
+        Os N workers dividem a duração somada das entradas (ou dos trechos);
+        o trabalho mais longo sozinho também precisa caber no prazo.
+        """
+        durations = [clip_duration(job, probe_duration(job.video_path)) or 0.0 for job in jobs]
+        per_worker = max(sum(durations) / self.max_workers, max(durations, default=0.0))
+        speed = required_speed(per_worker, deadline)
+        if speed > 0:
+            for job in jobs:
+                job.min_speed = max(job.min_speed or 0.0, speed)
+
+    def run_batch(self, jobs, callback=None, on_progress=None, deadline=None):
+        """Executa todos os trabalhos e devolve os resultados na mesma ordem.
+
+        `deadline` (instante, time.time) vale para o lote inteiro.
+        """
+        if deadline is not None:
+            self.apply_batch_deadline(jobs, deadline)
+        futures = [self.submit(job, callback, on_progress) for job in jobs]
+        return [f.result() for f in futures]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,145 @@
+# content_analysis.py
+"""Detecção de gravações de tela e ajuste do encode para elas.
+
+Gravações de tela passam longos trechos paradas, e o caminho normal codifica
+cada quadro repetido na taxa de quadros da origem. A análise decodifica
+alguns trechos curtos da entrada e mede:
+
+- a fração de quadros repetidos (o que o filtro `mpdecimate` descartaria);
+- a entropia do histograma de luma: telas têm áreas chapadas e poucas
+  cores, câmeras têm ruído e gradientes.
+
+Conteúdo de tela é codificado com `mpdecimate` e saída de taxa variável
+(cada quadro mantido dura até a próxima mudança), e com o `tune` do x264
+para esse tipo de imagem. Vídeo de câmera segue o caminho normal.
+
+    python content_analysis.py gravacao.mp4 outra.mp4
+
+Economia contra o CRF normal no mesmo arquivo: `python benchmark.py content`.
+"""
+import argparse
+import dataclasses
+import re
+import statistics
+import sys
+from dataclasses import dataclass
+
+from governor import run_quiet
+from lazy_import import lazy_import
+from media_probe import get_probe
+from target_size import sample_windows
+
+ffmpeg = lazy_import("ffmpeg")
+
+CONTENT_SCREEN = "tela"
+CONTENT_CAMERA = "câmera"
+
+SAMPLE_COUNT = 3
+SAMPLE_SECONDS = 4.0
+
+# A partir desta fração de quadros repetidos, vale descartar os repetidos
+MIN_DUPLICATES = 0.2
+# Quadros quase sempre parados (slides, apresentação): tune stillimage
+STILL_DUPLICATES = 0.8
+# Entropia normalizada do luma abaixo disto = imagem chapada, típica de tela
+SCREEN_ENTROPY = 0.5
+
+_METADATA_FRAME = re.compile(r"\] frame:\d+")
+_METADATA_ENTROPY = re.compile(r"normalized_entropy\.normal\.Y=([\d.]+)")
+
+
+@dataclass
+class ContentInfo:
+    """Resultado da análise de uma entrada."""
+    content: str           # CONTENT_SCREEN ou CONTENT_CAMERA
+    duplicate_ratio: float # fração dos quadros amostrados que eram repetidos
+    entropy: float         # mediana da entropia normalizada do luma (0 a 1)
+    decimate: bool = False
+    tune: str = None
+
+    def describe(self):
+        settings = []
+        if self.decimate:
+            settings.append("sem quadros repetidos (VFR)")
+        if self.tune:
+            settings.append(f"tune {self.tune}")
+        summary = f"{self.content}: {self.duplicate_ratio:.0%} quadros repetidos, entropia {self.entropy:.2f}"
+        return f"{summary} -> {', '.join(settings)}" if settings else summary
+
+
+def measure_window(video_path, start, seconds, priority=None, control=None):
+    """(quadros mantidos pelo mpdecimate, entropias deles) em um trecho."""
+    video = ffmpeg.input(video_path, ss=start, t=seconds).video
+    video = (video.filter("mpdecimate")
+                  .filter("entropy")
+                  .filter("metadata", mode="print", key="lavfi.entropy.normalized_entropy.normal.Y"))
+    # O filtro metadata escreve cada quadro que passou no log (stderr)
+    out = video.output("-", f="null").global_args("-loglevel", "info")
+    _, stderr = run_quiet(out, priority, control)
+    log = stderr.decode("utf-8", errors="replace")
+    kept = len(_METADATA_FRAME.findall(log))
+    entropies = [float(value) for value in _METADATA_ENTROPY.findall(log)]
+    return kept, entropies
+
+
+def analyze_content(video_path, priority=None, control=None, info=None):
+    """Classifica a entrada como tela ou câmera e escolhe os ajustes do encode."""
+    info = info or get_probe().probe(video_path)
+    if not info.duration or not info.frame_rate:
+        raise ValueError("Sem duração ou taxa de quadros para analisar o conteúdo.")
+
+    total = kept = 0
+    entropies = []
+    for start, seconds in sample_windows(info.duration, SAMPLE_COUNT, SAMPLE_SECONDS):
+        window_kept, window_entropies = measure_window(video_path, start, seconds, priority, control)
+        total += max(window_kept, round(seconds * info.frame_rate))
+        kept += window_kept
+        entropies += window_entropies
+
+    duplicate_ratio = 1 - kept / total if total else 0.0
+    entropy = statistics.median(entropies) if entropies else 1.0
+
+    decimate = duplicate_ratio >= MIN_DUPLICATES
+    flat = entropy < SCREEN_ENTROPY
+    if not (decimate or flat):
+        return ContentInfo(CONTENT_CAMERA, duplicate_ratio, entropy)
+
+    if duplicate_ratio >= STILL_DUPLICATES:
+        tune = "stillimage"
+    elif flat:
+        tune = "animation" # bordas nítidas e áreas chapadas
+    else:
+        tune = None # câmera parada: só descarta os repetidos
+    return ContentInfo(CONTENT_SCREEN, duplicate_ratio, entropy, decimate, tune)
+
+
+def apply_content_settings(job):
+    """Devolve o trabalho com os ajustes de conteúdo (decimate/tune) já decididos."""
+    try:
+        analysis = analyze_content(job.video_path, job.priority, job.control)
+    except Exception as e:
+        if job.control.cancelled:
+            raise
+        print(f"Erro ao analisar o conteúdo de {job.video_path}: {e}")
+        return job
+    print(f"Conteúdo de {job.video_path}: {analysis.describe()}")
+    return dataclasses.replace(job, decimate=analysis.decimate, tune=analysis.tune)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classifica vídeos como gravação de tela ou câmera.")
+    parser.add_argument("inputs", nargs="+", help="Arquivos de vídeo.")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for path in args.inputs:
+        try:
+            print(f"{path}: {analyze_content(path).describe()}")
+        except Exception as e:
+            print(f"{path}: ERRO: {e}")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
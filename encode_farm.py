@@ -0,0 +1,937 @@
+# encode_farm.py
+"""Fazenda de encode: um coordenador e workers em várias máquinas, por HTTP.
+
+O coordenador recebe trabalhos (os mesmos parâmetros do CompressionJob) e
+os divide em tarefas para os workers: o trabalho inteiro ou, com
+`chunked`, os segmentos alinhados a keyframes do chunked_encode (o corte,
+o diário de retomada, a conferência e a junção continuam no coordenador,
+que só faz stream copy).
+
+    python encode_farm.py coordinator --host 0.0.0.0 --token SEGREDO --input-root /videos --output-root /saida
+    python encode_farm.py worker http://coordenador:8765 -j 2 --shared
+    python compress_cli.py videos/*.mp4 -o saida --farm http://coordenador:8765 --chunked
+
+- Transferência: um worker `--shared` vê os mesmos caminhos que o
+  coordenador (armazenamento compartilhado montado no mesmo lugar) e lê e
+  escreve direto neles; os outros baixam a entrada e enviam a saída pelo
+  próprio HTTP.
+- Capacidade: cada worker declara quantas tarefas roda ao mesmo tempo (`-j`)
+  e só recebe tarefas até esse limite.
+- Heartbeats: os workers avisam que estão vivos (com o progresso de cada
+  tarefa) a cada HEARTBEAT_INTERVAL segundos. Um worker calado por
+  WORKER_TIMEOUT segundos é dado como morto e as tarefas dele voltam para a
+  fila; se ele reaparecer, o resultado atrasado é descartado.
+
+Os caminhos dos trabalhos são os do coordenador: rode-o na máquina (ou no
+armazenamento) onde estão os vídeos. Quem envia um trabalho escolhe o que o
+coordenador lê e onde ele escreve, então só são aceitos caminhos dentro das
+pastas `--input-root` e `--output-root` (padrão: a pasta atual). Por padrão
+o coordenador só ouve em 127.0.0.1; outro endereço exige `--token`. O
+protocolo não tem criptografia: use uma rede confiável.
+"""
+import argparse
+import collections
+import hmac
+import http.server
+import ipaddress
+import json
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from chunked_encode import encode_segment, run_chunked_job
+from compressor_engine import (
+    MODE_COPY, CompressionEngine, CompressionJob, JobResult, Progress, cancelled_result,
+    default_worker_count, discard_partial, failed_result, partial_path, result_status, run_job,
+)
+from governor import PRIORITIES, PRIORITY_NORMAL, JobCancelled, JobTimedOut, ResourceGovernor
+from lazy_import import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+HEARTBEAT_INTERVAL = 2.0 # segundos
+WORKER_TIMEOUT = 15.0    # sem heartbeat por este tempo = worker morto
+LEASE_POLL = 1.0         # espera do worker quando a fila está vazia
+POLL_INTERVAL = 1.0      # quem enviou o trabalho consulta o status neste ritmo
+MAX_ATTEMPTS = 3         # tentativas de uma tarefa (worker morto, falha de transferência)
+MAX_ACTIVE_JOBS = 32     # trabalhos que o coordenador orquestra ao mesmo tempo
+JOB_RETENTION = 3600.0   # segundos que um trabalho terminado continua consultável
+HTTP_TIMEOUT = 30.0
+TOKEN_HEADER = "X-Farm-Token"
+COPY_BUFFER = 1024 * 1024
+
+TASK_JOB = "trabalho"    # o trabalho inteiro (run_job no worker)
+TASK_SEGMENT = "segmento" # um segmento de um encode em pedaços (encode_segment no worker)
+
+STATE_PENDING = "pendente"
+STATE_LEASED = "em andamento"
+STATE_DONE = "pronta"
+STATE_FAILED = "falhou"
+STATE_CANCELLED = "cancelada"
+
+STATUS_RUNNING = "rodando"
+
+# Campos do CompressionJob que viajam entre as máquinas. Threads e prioridade
+# são decididas por quem executa; o prazo já virou min_speed antes de sair.
+JOB_FIELDS = ("mode", "value", "preset", "min_speed", "content_aware", "decimate", "tune",
+              "timeout", "stall_timeout", "trim_start", "trim_end", "max_size")
+
+
+class StaleLease(Exception):
+    """A tarefa não pertence mais a este worker (redistribuída ou cancelada)."""
+
+
+def job_to_dict(job):
+    data = {"video_path": job.video_path, "save_path": job.save_path}
+    data.update({name: getattr(job, name) for name in JOB_FIELDS})
+    return data
+
+
+def job_from_dict(data):
+    """CompressionJob a partir de job_to_dict (valida os parâmetros: ValueError)."""
+    names = ("video_path", "save_path") + JOB_FIELDS
+    return CompressionJob(**{name: data[name] for name in names if name in data})
+
+
+def progress_from_dict(job, data):
+    """Progress a partir de Progress.as_dict (vindo de outra máquina)."""
+    return Progress(job, out_time=data.get("out_time") or 0.0, duration=data.get("duration"),
+                    frame=data.get("frame") or 0, fps=data.get("fps") or 0.0,
+                    speed=data.get("speed") or 0.0, total_size=data.get("total_size") or 0,
+                    done=bool(data.get("done")))
+
+
+# --- Coordenador ---
+
+def _inside_roots(path, roots, what):
+    """Caminho real de `path` se ele estiver dentro de uma das `roots` (senão, ValueError).
+
+    Links simbólicos são seguidos antes da comparação: um link dentro da
+    pasta que aponta para fora dela também é recusado.
+    """
+    real = os.path.realpath(path)
+    for root in roots:
+        try:
+            if os.path.commonpath([os.path.normcase(real), os.path.normcase(root)]) == os.path.normcase(root):
+                return real
+        except ValueError:
+            pass # outro drive (Windows)
+    raise ValueError(f"Caminho de {what} fora das pastas permitidas: {path}")
+
+
+def is_loopback(host):
+    """O endereço de escuta só aceita conexões da própria máquina."""
+    if not host:
+        return False # "" = todas as interfaces
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(address.split("%")[0]).is_loopback for address in addresses)
+
+
+@dataclass
+class FarmTask:
+    """Uma unidade de trabalho para um worker."""
+    id: str
+    kind: str         # TASK_JOB ou TASK_SEGMENT
+    job: CompressionJob # trabalho do lado do coordenador (controle e progresso)
+    params: dict      # parâmetros do encode enviados ao worker (JOB_FIELDS)
+    input_path: str
+    output_path: str  # onde o resultado precisa chegar, no coordenador
+    on_progress: object = None
+    state: str = STATE_PENDING
+    worker: str = None
+    lease: str = None
+    lease_path: str = None # saída temporária da tentativa atual
+    attempts: int = 0
+    error: str = None
+    stderr: str = None
+    finished: threading.Event = field(default_factory=threading.Event)
+
+
+@dataclass
+class WorkerInfo:
+    """Um worker registrado no coordenador."""
+    id: str
+    name: str
+    capacity: int
+    shared: bool
+    last_seen: float
+    tasks: set = field(default_factory=set)
+    cancel: set = field(default_factory=set) # tarefas a cancelar no próximo heartbeat
+
+
+@dataclass
+class FarmJob:
+    """Um trabalho recebido pelo coordenador."""
+    id: str
+    job: CompressionJob
+    future: object = None
+    progress: Progress = None
+    finished_at: float = None
+
+    def update(self, progress):
+        self.progress = progress
+
+
+class FarmCoordinator:
+    """Fila de tarefas, registro de workers e execução dos trabalhos recebidos.
+
+    Os trabalhos rodam em dois CompressionEngine (normal e em pedaços, como
+    na GUI) cujos runners mandam o encode para os workers e esperam.
+
+    `input_roots`/`output_roots`: pastas onde ficam as entradas e as saídas
+    aceitas (padrão: a pasta atual; as saídas, nas mesmas das entradas).
+    """
+
+    def __init__(self, token=None, max_jobs=MAX_ACTIVE_JOBS, worker_timeout=WORKER_TIMEOUT,
+                 telemetry=None, input_roots=None, output_roots=None):
+        self.token = token
+        self.input_roots = [os.path.realpath(root) for root in input_roots or [os.getcwd()]]
+        self.output_roots = [os.path.realpath(root) for root in output_roots or self.input_roots]
+        self.worker_timeout = worker_timeout
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._pending = collections.deque()
+        self._workers = {}
+        self._jobs = {}
+        self.engine = CompressionEngine(max_workers=max_jobs, runner=self.run_job, telemetry=telemetry)
+        self.chunked_engine = CompressionEngine(max_workers=max_jobs, runner=self.run_chunked_job,
+                                                governor=self.engine.governor, telemetry=telemetry)
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap, name="farm-reaper", daemon=True)
+        self._reaper.start()
+
+    # Trabalhos
+
+    def submit(self, data):
+        job = job_from_dict(data["job"])
+        # Sem isso, quem alcança o coordenador leria e sobrescreveria qualquer arquivo dele
+        job.video_path = _inside_roots(job.video_path, self.input_roots, "entrada")
+        job.save_path = _inside_roots(job.save_path, self.output_roots, "saída")
+        record = FarmJob(uuid.uuid4().hex[:12], job)
+        engine = self.chunked_engine if data.get("chunked") else self.engine
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[record.id] = record
+        record.future = engine.submit(job, on_progress=record.update)
+        record.future.add_done_callback(lambda _: setattr(record, "finished_at", time.monotonic()))
+        print(f"Trabalho {record.id}: {job.video_path}{' (em pedaços)' if data.get('chunked') else ''}")
+        return {"id": record.id}
+
+    def _prune_jobs(self):
+        now = time.monotonic()
+        for job_id, record in list(self._jobs.items()):
+            if record.finished_at is not None and now - record.finished_at > JOB_RETENTION:
+                del self._jobs[job_id]
+
+    def _job(self, job_id):
+        with self._lock:
+            return self._jobs[job_id]
+
+    def job_status(self, job_id):
+        record = self._job(job_id)
+        status = {"status": STATUS_RUNNING, "error": None, "stderr": None,
+                  "progress": record.progress.as_dict() if record.progress else None}
+        if record.future.done():
+            result = record.future.result()
+            status.update(status=result_status(result), error=result.error, stderr=result.stderr)
+        return status
+
+    def cancel_job(self, job_id):
+        self._job(job_id).job.control.cancel()
+        return {"id": job_id}
+
+    def run_job(self, job, on_progress=None, encode_job=None):
+        """Runner do motor normal: o trabalho inteiro vai para um worker.
+
+        `encode_job` (já resolvido pelo encode em pedaços) é o que o worker
+        codifica; um remux fica aqui mesmo, não vale a transferência.
+        """
+        if encode_job is not None and encode_job.mode == MODE_COPY:
+            return run_job(job, on_progress, encode_job)
+        try:
+            self.dispatch(TASK_JOB, job, job.video_path, job.save_path, on_progress, encode_job)
+            return JobResult(job, True)
+        except Exception as e:
+            return failed_result(job, e)
+
+    def run_chunked_job(self, job, on_progress=None):
+        """Runner do motor em pedaços: um segmento por vaga nos workers vivos."""
+        job.threads = max(2, self.capacity())
+        return run_chunked_job(job, on_progress, encode=self.encode_segment, run_whole=self.run_job)
+
+    def encode_segment(self, job, source_path, target_path, on_progress=None):
+        """`encode` do run_chunked_job: o segmento vai para um worker."""
+        self.dispatch(TASK_SEGMENT, job, source_path, target_path, on_progress)
+
+    def dispatch(self, kind, job, input_path, output_path, on_progress=None, encode_job=None):
+        """Enfileira uma tarefa e espera o worker entregar `output_path`.
+
+        O worker recebe os parâmetros de `encode_job` (padrão: `job`).
+
+        Levanta ffmpeg.Error (com o log do worker), JobCancelled ou
+        JobTimedOut como se o encode tivesse rodado aqui.
+        """
+        params = {name: getattr(encode_job or job, name) for name in JOB_FIELDS}
+        task = FarmTask(uuid.uuid4().hex[:12], kind, job, params, input_path, output_path, on_progress)
+        with self._lock:
+            self._tasks[task.id] = task
+            self._pending.append(task)
+        try:
+            while not task.finished.wait(POLL_INTERVAL):
+                if job.control.cancelled:
+                    raise JobCancelled()
+                if job.control.expired():
+                    raise JobTimedOut("tempo limite do trabalho esgotado")
+        except BaseException:
+            self._cancel_task(task)
+            raise
+        finally:
+            with self._lock:
+                self._tasks.pop(task.id, None)
+
+        if task.state == STATE_FAILED:
+            if task.error == "ffmpeg":
+                raise ffmpeg.Error("ffmpeg", None, (task.stderr or "").encode())
+            raise RuntimeError(task.error)
+
+    def _cancel_task(self, task):
+        with self._lock:
+            worker = self._workers.get(task.worker) if task.state == STATE_LEASED else None
+            if worker is not None:
+                worker.tasks.discard(task.id)
+                worker.cancel.add(task.id)
+            task.state = STATE_CANCELLED
+        discard_partial(task.lease_path)
+
+    # Workers
+
+    def capacity(self):
+        """Tarefas simultâneas somando os workers vivos."""
+        with self._lock:
+            return sum(worker.capacity for worker in self._workers.values())
+
+    def register(self, data):
+        worker = WorkerInfo(uuid.uuid4().hex[:12], str(data.get("name") or "?"),
+                            max(1, int(data.get("capacity") or 1)), bool(data.get("shared")),
+                            time.monotonic())
+        with self._lock:
+            self._workers[worker.id] = worker
+        print(f"Worker {worker.name} registrado ({worker.capacity} tarefa(s), "
+              f"{'armazenamento compartilhado' if worker.shared else 'transferência por HTTP'})")
+        return {"id": worker.id, "heartbeat": HEARTBEAT_INTERVAL}
+
+    def _worker(self, worker_id):
+        worker = self._workers[worker_id] # LookupError = worker desconhecido ou dado como morto
+        worker.last_seen = time.monotonic()
+        return worker
+
+    def heartbeat(self, worker_id, data):
+        updates = []
+        with self._lock:
+            worker = self._worker(worker_id)
+            cancel = sorted(worker.cancel)
+            worker.cancel.clear()
+            for task_id, progress in (data.get("progress") or {}).items():
+                task = self._tasks.get(task_id)
+                if task is not None and task.worker == worker_id and task.on_progress is not None:
+                    updates.append((task, progress))
+        # Fora do lock: o callback pode ser lento (ex.: o rastreador do encode em pedaços)
+        for task, progress in updates:
+            task.on_progress(progress_from_dict(task.job, progress))
+        return {"cancel": cancel}
+
+    def lease(self, worker_id):
+        """Próxima tarefa para o worker, ou None se ele está cheio ou a fila vazia."""
+        with self._lock:
+            worker = self._worker(worker_id)
+            if len(worker.tasks) >= worker.capacity:
+                return None
+            while self._pending:
+                task = self._pending.popleft()
+                if task.state != STATE_PENDING:
+                    continue # cancelada enquanto esperava
+                task.state = STATE_LEASED
+                task.worker = worker.id
+                task.lease = uuid.uuid4().hex
+                task.lease_path = partial_path(task.output_path)
+                worker.tasks.add(task.id)
+                return self._describe(task, worker)
+        return None
+
+    @staticmethod
+    def _describe(task, worker):
+        return {
+            "id": task.id,
+            "kind": task.kind,
+            "lease": task.lease,
+            "job": task.params,
+            # Sem armazenamento compartilhado, o worker só recebe as extensões
+            "input": task.input_path if worker.shared else None,
+            "output": task.lease_path if worker.shared else None,
+            "input_ext": os.path.splitext(task.input_path)[1],
+            "output_ext": os.path.splitext(task.output_path)[1],
+        }
+
+    def _leased_task(self, task_id, lease):
+        task = self._tasks.get(task_id)
+        if task is None or task.state != STATE_LEASED or not hmac.compare_digest(task.lease, lease or ""):
+            raise StaleLease()
+        return task
+
+    def input_path(self, task_id, lease):
+        with self._lock:
+            return self._leased_task(task_id, lease).input_path
+
+    def output_path(self, task_id, lease):
+        with self._lock:
+            return self._leased_task(task_id, lease).lease_path
+
+    def accept_output(self, task_id, lease, path):
+        """Move o arquivo enviado (`path`) para a saída da tentativa.
+
+        O lease é conferido de novo sob o lock: a tarefa pode ter sido
+        redistribuída ou cancelada durante o envio (StaleLease; quem chamou
+        descarta o arquivo).
+        """
+        with self._lock:
+            os.replace(path, self._leased_task(task_id, lease).lease_path)
+
+    def finish(self, task_id, data):
+        """Resultado de uma tarefa; a saída da tentativa vai para o destino."""
+        with self._lock:
+            task = self._leased_task(task_id, data.get("lease"))
+            worker = self._workers.get(task.worker)
+            if worker is not None:
+                worker.tasks.discard(task.id)
+            if data.get("retry"):
+                # Falha do worker (ex.: transferência), não do encode: tenta em outro
+                self._requeue(task, data.get("error"))
+                return {"id": task_id}
+            if data.get("success"):
+                try:
+                    os.replace(task.lease_path, task.output_path)
+                    task.state = STATE_DONE
+                except OSError as e:
+                    task.state, task.error = STATE_FAILED, f"saída do worker não chegou: {e}"
+            else:
+                task.state, task.error, task.stderr = STATE_FAILED, data.get("error"), data.get("stderr")
+            task.finished.set()
+        if task.state == STATE_FAILED:
+            discard_partial(task.lease_path)
+        return {"id": task_id}
+
+    def _requeue(self, task, reason):
+        """Devolve uma tarefa à frente da fila (chame com o lock)."""
+        discard_partial(task.lease_path)
+        task.attempts += 1
+        task.worker = task.lease = task.lease_path = None
+        if task.attempts >= MAX_ATTEMPTS:
+            task.state, task.error = STATE_FAILED, f"{task.attempts} tentativas sem sucesso ({reason})"
+            task.finished.set()
+            return
+        task.state = STATE_PENDING
+        self._pending.appendleft(task)
+
+    def _reap(self):
+        """Dá como mortos os workers sem heartbeat e redistribui as tarefas deles."""
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            now = time.monotonic()
+            with self._lock:
+                for worker in list(self._workers.values()):
+                    if now - worker.last_seen <= self.worker_timeout:
+                        continue
+                    print(f"Worker {worker.name} sem sinal há {now - worker.last_seen:.0f}s; "
+                          f"redistribuindo {len(worker.tasks)} tarefa(s)")
+                    del self._workers[worker.id]
+                    for task_id in worker.tasks:
+                        task = self._tasks.get(task_id)
+                        if task is not None and task.state == STATE_LEASED:
+                            self._requeue(task, f"worker {worker.name} perdido")
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "workers": [{"name": w.name, "capacity": w.capacity, "shared": w.shared,
+                             "tasks": len(w.tasks), "last_seen": round(now - w.last_seen, 1)}
+                            for w in self._workers.values()],
+                "pending": sum(1 for task in self._pending if task.state == STATE_PENDING),
+                "jobs": sum(1 for record in self._jobs.values() if record.finished_at is None),
+            }
+
+    def shutdown(self):
+        self._stop.set()
+        self.engine.cancel_all()
+        self.engine.shutdown(wait=False)
+        self.chunked_engine.shutdown(wait=False)
+
+
+class _FarmHandler(http.server.BaseHTTPRequestHandler):
+    """Rotas HTTP do coordenador (JSON, mais os arquivos da transferência)."""
+
+    ROUTES = (
+        ("POST", r"/jobs", "_submit_job"),
+        ("GET", r"/jobs/(\w+)", "_job_status"),
+        ("DELETE", r"/jobs/(\w+)", "_cancel_job"),
+        ("GET", r"/status", "_status"),
+        ("POST", r"/workers", "_register"),
+        ("POST", r"/workers/(\w+)/heartbeat", "_heartbeat"),
+        ("POST", r"/workers/(\w+)/lease", "_lease"),
+        ("POST", r"/tasks/(\w+)/done", "_finish"),
+        ("GET", r"/tasks/(\w+)/input", "_send_input"),
+        ("PUT", r"/tasks/(\w+)/output", "_receive_output"),
+    )
+
+    def log_message(self, format, *args):
+        pass # um heartbeat a cada 2s por worker encheria o console
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _route(self, method):
+        coordinator = self.server.coordinator
+        url = urllib.parse.urlsplit(self.path)
+        self.query = dict(urllib.parse.parse_qsl(url.query))
+        token = self.headers.get(TOKEN_HEADER) or ""
+        if coordinator.token and not hmac.compare_digest(token, coordinator.token):
+            return self._send_json(403, {"error": "token inválido"})
+        for route_method, pattern, name in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if match and route_method == method:
+                try:
+                    getattr(self, name)(coordinator, *match.groups())
+                except StaleLease:
+                    self._send_json(409, {"error": "tarefa não pertence mais a este worker"})
+                except LookupError:
+                    self._send_json(404, {"error": "não encontrado"})
+                except (ValueError, TypeError) as e:
+                    self._send_json(400, {"error": str(e)})
+                return
+        self._send_json(404, {"error": "rota desconhecida"})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status, payload=None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _submit_job(self, coordinator):
+        self._send_json(200, coordinator.submit(self._read_json()))
+
+    def _job_status(self, coordinator, job_id):
+        self._send_json(200, coordinator.job_status(job_id))
+
+    def _cancel_job(self, coordinator, job_id):
+        self._send_json(200, coordinator.cancel_job(job_id))
+
+    def _status(self, coordinator):
+        self._send_json(200, coordinator.status())
+
+    def _register(self, coordinator):
+        self._send_json(200, coordinator.register(self._read_json()))
+
+    def _heartbeat(self, coordinator, worker_id):
+        self._send_json(200, coordinator.heartbeat(worker_id, self._read_json()))
+
+    def _lease(self, coordinator, worker_id):
+        task = coordinator.lease(worker_id)
+        self._send_json(200, task) if task else self._send_json(204)
+
+    def _finish(self, coordinator, task_id):
+        self._send_json(200, coordinator.finish(task_id, self._read_json()))
+
+    def _send_input(self, coordinator, task_id):
+        path = coordinator.input_path(task_id, self.query.get("lease"))
+        with open(path, "rb") as f:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile, COPY_BUFFER)
+
+    def _receive_output(self, coordinator, task_id):
+        lease = self.query.get("lease")
+        # Cada envio num nome próprio: um envio atrasado (de um worker dado como
+        # morto) nunca escreve por cima da saída da tentativa que vale
+        path = partial_path(coordinator.output_path(task_id, lease))
+        remaining = int(self.headers.get("Content-Length") or 0)
+        try:
+            with open(path, "wb") as f:
+                while remaining > 0:
+                    chunk = self.rfile.read(min(COPY_BUFFER, remaining))
+                    if not chunk:
+                        raise ValueError("envio interrompido")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            coordinator.accept_output(task_id, lease, path)
+        except BaseException:
+            discard_partial(path)
+            raise
+        self._send_json(200, {"id": task_id})
+
+
+def serve(coordinator, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Servidor HTTP do coordenador (rode com serve_forever()).
+
+    Fora do loopback, exige token (senão, ValueError): os trabalhos leem e
+    escrevem arquivos na máquina do coordenador.
+    """
+    if not coordinator.token and not is_loopback(host):
+        raise ValueError(f"Ouvir em {host} exige --token (sem ele, só 127.0.0.1)")
+    server = http.server.ThreadingHTTPServer((host, port), _FarmHandler)
+    server.daemon_threads = True
+    server.coordinator = coordinator
+    return server
+
+
+# --- Cliente (workers e quem envia trabalhos) ---
+
+class FarmClient:
+    """Chamadas HTTP ao coordenador."""
+
+    def __init__(self, url, token=None, timeout=HTTP_TIMEOUT):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+
+    def _open(self, method, path, data=None, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers[TOKEN_HEADER] = self.token
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        with self._open(method, path, data, {"Content-Type": "application/json"}) as response:
+            body = response.read()
+        return json.loads(body) if body else None
+
+    def submit(self, job, chunked=False):
+        data = job_to_dict(job)
+        # Os caminhos são lidos pelo coordenador, que roda em outra pasta
+        data.update(video_path=os.path.abspath(job.video_path), save_path=os.path.abspath(job.save_path))
+        return self.request("POST", "/jobs", {"job": data, "chunked": chunked})["id"]
+
+    def job_status(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def cancel(self, job_id):
+        return self.request("DELETE", f"/jobs/{job_id}")
+
+    def status(self):
+        return self.request("GET", "/status")
+
+    def register(self, name, capacity, shared):
+        return self.request("POST", "/workers", {"name": name, "capacity": capacity, "shared": shared})["id"]
+
+    def heartbeat(self, worker_id, progress):
+        return self.request("POST", f"/workers/{worker_id}/heartbeat", {"progress": progress})
+
+    def lease(self, worker_id):
+        return self.request("POST", f"/workers/{worker_id}/lease", {})
+
+    def finish(self, task_id, report):
+        return self.request("POST", f"/tasks/{task_id}/done", report)
+
+    def download(self, task_id, lease, path):
+        query = urllib.parse.urlencode({"lease": lease})
+        with self._open("GET", f"/tasks/{task_id}/input?{query}") as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f, COPY_BUFFER)
+
+    def upload(self, task_id, lease, path):
+        query = urllib.parse.urlencode({"lease": lease})
+        with open(path, "rb") as f:
+            headers = {"Content-Type": "application/octet-stream",
+                       "Content-Length": str(os.fstat(f.fileno()).st_size)}
+            with self._open("PUT", f"/tasks/{task_id}/output?{query}", f, headers) as response:
+                response.read()
+
+
+class FarmRunner:
+    """Runner do CompressionEngine que executa cada trabalho na fazenda.
+
+    Os caminhos do trabalho precisam ser válidos no coordenador (mesma
+    máquina ou armazenamento compartilhado).
+    """
+
+    def __init__(self, url, chunked=False, token=None):
+        self.client = FarmClient(url, token)
+        self.chunked = chunked
+
+    def __call__(self, job, on_progress=None):
+        try:
+            job_id = self.client.submit(job, self.chunked)
+            while True:
+                if job.control.cancelled:
+                    self.client.cancel(job_id)
+                    return cancelled_result(job)
+                status = self.client.job_status(job_id)
+                if status["progress"] and on_progress is not None:
+                    on_progress(progress_from_dict(job, status["progress"]))
+                if status["status"] != STATUS_RUNNING:
+                    break
+                time.sleep(POLL_INTERVAL)
+        except Exception as e:
+            return failed_result(job, e)
+
+        if status["status"] == "cancelado":
+            return cancelled_result(job)
+        if status["status"] in ("ok", "cache"):
+            return JobResult(job, True)
+        print(f"Erro na fazenda ({status['error']}):", status["stderr"] or "")
+        return JobResult(job, False, error=status["error"], stderr=status["stderr"])
+
+
+# --- Worker ---
+
+def run_segment(job, source_path, target_path, on_progress=None):
+    """Codifica um segmento recebido do coordenador; devolve um JobResult."""
+    try:
+        encode_segment(job, source_path, target_path, on_progress)
+        return JobResult(job, True)
+    except Exception as e:
+        discard_partial(target_path)
+        return failed_result(job, e)
+
+
+class FarmWorker:
+    """Pega tarefas do coordenador e roda até `capacity` delas ao mesmo tempo.
+
+    `runner(job, on_progress)` executa as tarefas de trabalho inteiro
+    (padrão: run_job, o ffmpeg nesta máquina).
+    """
+
+    def __init__(self, client, capacity=None, shared=False, name=None, work_dir=None, governor=None,
+                 runner=run_job):
+        self.client = client
+        self.runner = runner
+        self.capacity = capacity or default_worker_count()
+        self.shared = shared
+        self.name = name or socket.gethostname()
+        self.work_dir = work_dir or tempfile.gettempdir()
+        self.governor = governor or ResourceGovernor()
+        self.worker_id = None
+        self._lock = threading.Lock()
+        self._running = {} # id da tarefa -> [JobControl, último progresso]
+        self._stop = threading.Event()
+
+    def register(self):
+        self.worker_id = self.client.register(self.name, self.capacity, self.shared)
+        print(f"Registrado em {self.client.url} como {self.name} ({self.capacity} tarefa(s))")
+
+    def _reregister(self):
+        """O coordenador nos deu como mortos: as tarefas em andamento já foram redistribuídas."""
+        with self._lock:
+            for control, _ in self._running.values():
+                control.cancel()
+        self.register()
+
+    def run(self):
+        self.register()
+        threading.Thread(target=self._heartbeats, name="farm-heartbeat", daemon=True).start()
+        slots = threading.Semaphore(self.capacity)
+        with ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="farm") as pool:
+            while not self._stop.is_set():
+                slots.acquire()
+                task = None
+                try:
+                    task = self.client.lease(self.worker_id)
+                except urllib.error.HTTPError as e:
+                    if e.code in (401, 403):
+                        raise # token errado: tentar de novo não adianta
+                    if e.code == 404:
+                        self._reregister()
+                    else:
+                        # Erro passageiro do coordenador (ex.: 500): espera e tenta de novo
+                        print(f"Erro do coordenador ao pedir tarefa: {e}")
+                except OSError as e:
+                    print(f"Coordenador inacessível: {e}")
+                if task is None:
+                    slots.release()
+                    self._stop.wait(LEASE_POLL)
+                    continue
+                pool.submit(self.run_task, task).add_done_callback(lambda _: slots.release())
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            for control, _ in self._running.values():
+                control.cancel()
+
+    def _heartbeats(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                progress = {task_id: latest.as_dict() for task_id, (_, latest) in self._running.items()
+                            if latest is not None}
+            try:
+                reply = self.client.heartbeat(self.worker_id, progress)
+            except urllib.error.HTTPError as e:
+                if e.code == 404:
+                    self._reregister()
+                continue
+            except OSError as e:
+                print(f"Coordenador inacessível: {e}")
+                continue
+            with self._lock:
+                for task_id in reply["cancel"]:
+                    if task_id in self._running:
+                        self._running[task_id][0].cancel()
+
+    def _set_progress(self, task_id, progress):
+        with self._lock:
+            if task_id in self._running:
+                self._running[task_id][1] = progress
+
+    def run_task(self, task):
+        task_id, lease = task["id"], task["lease"]
+        scratch = None
+        output_path = None
+        report = {"lease": lease}
+        try:
+            job = job_from_dict(dict(task["job"], video_path="", save_path=""))
+            job.threads = self.governor.threads_for(self.capacity)
+            job.priority = self.governor.priority
+            with self._lock:
+                self._running[task_id] = [job.control, None]
+
+            if self.shared:
+                input_path, output_path = task["input"], task["output"]
+            else:
+                scratch = tempfile.mkdtemp(prefix="farm_", dir=self.work_dir)
+                input_path = os.path.join(scratch, "input" + task["input_ext"])
+                output_path = os.path.join(scratch, "output" + task["output_ext"])
+                try:
+                    self.client.download(task_id, lease, input_path)
+                except OSError as e:
+                    raise _TransferError(f"download da entrada: {e}")
+            job.video_path, job.save_path = input_path, output_path
+
+            job.control.start_deadline(job.timeout)
+            on_progress = lambda progress: self._set_progress(task_id, progress)
+            if task["kind"] == TASK_JOB:
+                result = self.runner(job, on_progress)
+            else:
+                result = run_segment(job, input_path, output_path, on_progress)
+
+            if result.success and not self.shared:
+                try:
+                    self.client.upload(task_id, lease, output_path)
+                except OSError as e:
+                    raise _TransferError(f"envio da saída: {e}")
+            report.update(success=result.success, error=result.error, stderr=result.stderr)
+        except _TransferError as e:
+            print(f"Falha de transferência na tarefa {task_id}: {e}")
+            report.update(success=False, retry=True, error=str(e))
+        except Exception as e:
+            print(f"Erro na tarefa {task_id}: {e}")
+            report.update(success=False, error=str(e))
+        finally:
+            with self._lock:
+                self._running.pop(task_id, None)
+
+        try:
+            self.client.finish(task_id, report)
+            print(f"Tarefa {task_id} ({task['kind']}): {'ok' if report['success'] else report['error']}")
+        except (urllib.error.HTTPError, OSError) as e:
+            # Redistribuída ou cancelada enquanto rodava: o resultado não vale mais
+            print(f"Resultado da tarefa {task_id} descartado: {e}")
+            if self.shared:
+                discard_partial(output_path)
+        finally:
+            if scratch:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+
+class _TransferError(Exception):
+    """Falha ao mover arquivos entre worker e coordenador (vale tentar em outro worker)."""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fazenda de encode: coordenador e workers por HTTP.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="Recebe trabalhos e distribui aos workers.")
+    coordinator.add_argument("--host", default=DEFAULT_HOST,
+                             help="Endereço de escuta (fora do loopback, exige --token).")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT, help="Porta HTTP.")
+    coordinator.add_argument("--token", default=None, help="Segredo que workers e clientes precisam enviar.")
+    coordinator.add_argument("--input-root", action="append", default=None,
+                             help="Pasta de onde os trabalhos podem ler (repetível; padrão: a pasta atual).")
+    coordinator.add_argument("--output-root", action="append", default=None,
+                             help="Pasta onde os trabalhos podem escrever (repetível; padrão: as de entrada).")
+    coordinator.add_argument("--worker-timeout", type=float, default=WORKER_TIMEOUT,
+                             help="Segundos sem heartbeat até um worker ser dado como morto.")
+
+    worker = subparsers.add_parser("worker", help="Executa tarefas de um coordenador.")
+    worker.add_argument("url", help="Endereço do coordenador (ex.: http://maquina:8765).")
+    worker.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Tarefas simultâneas (padrão: metade dos núcleos).")
+    worker.add_argument("--shared", action="store_true",
+                        help="Lê e escreve direto nos caminhos do coordenador (armazenamento compartilhado).")
+    worker.add_argument("--name", default=None, help="Nome do worker (padrão: nome da máquina).")
+    worker.add_argument("--work-dir", default=None, help="Pasta temporária para as transferências.")
+    worker.add_argument("--token", default=None, help="Segredo do coordenador.")
+    worker.add_argument("--priority", choices=PRIORITIES, default=PRIORITY_NORMAL,
+                        help="Prioridade de CPU/disco dos ffmpeg.")
+
+    args = parser.parse_args(argv)
+    if args.command == "coordinator":
+        if not args.token and not is_loopback(args.host):
+            parser.error(f"--host {args.host} exige --token")
+        farm = FarmCoordinator(token=args.token, worker_timeout=args.worker_timeout,
+                               input_roots=args.input_root, output_roots=args.output_root)
+        server = serve(farm, args.host, args.port)
+        print(f"Entradas em: {', '.join(farm.input_roots)}; saídas em: {', '.join(farm.output_roots)}")
+        print(f"Coordenador ouvindo em http://{args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            farm.shutdown()
+        return 0
+
+    farm_worker = FarmWorker(FarmClient(args.url, args.token), args.jobs, args.shared, args.name,
+                             args.work_dir, ResourceGovernor(priority=args.priority))
+    try:
+        farm_worker.run()
+    except KeyboardInterrupt:
+        farm_worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
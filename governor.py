@@ -0,0 +1,365 @@
+# governor.py
+"""Limites de recursos e controle (cancelar/pausar) dos processos ffmpeg.
+
+- Prioridade: cada ffmpeg é iniciado com `nice`/`ionice` (POSIX) ou com a
+  classe de prioridade do Windows, para não disputar a máquina com outros
+  serviços.
+- Threads: um orçamento global de threads é dividido entre os encodes
+  simultâneos, com teto opcional por encode.
+- Concorrência: um ResourceGovernor pode ser compartilhado por vários
+  motores (ex.: fila normal e fila em pedaços da GUI) e limita quantos
+  encodes rodam ao mesmo tempo somando todos eles.
+- Controle: cada trabalho tem um JobControl que acompanha os processos
+  filhos dele; cancelar mata os processos, pausar os suspende. Ele também
+  guarda as linhas de comando e o uso de recursos desses processos
+  (telemetry.py).
+- Tempo limite: o JobControl guarda o prazo do trabalho; o supervisor
+  (supervisor.py) mata o ffmpeg que passar dele ou parar de avançar.
+"""
+import contextlib
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from lazy_import import lazy_import
+from telemetry import JobUsage, wait_with_usage
+
+ffmpeg = lazy_import("ffmpeg")
+
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "baixa"
+PRIORITY_IDLE = "ociosa"
+PRIORITIES = (PRIORITY_NORMAL, PRIORITY_LOW, PRIORITY_IDLE)
+
+# Prioridade -> (nice, argumentos do ionice) em POSIX
+POSIX_PRIORITY = {
+    PRIORITY_LOW: (10, ["-c", "2", "-n", "7"]),  # best-effort, a mais baixa
+    PRIORITY_IDLE: (19, ["-c", "3"]),            # só usa disco/CPU ociosos
+}
+
+# Prioridade -> classe de prioridade do processo no Windows
+WINDOWS_PRIORITY = {
+    PRIORITY_LOW: 0x00004000,  # BELOW_NORMAL_PRIORITY_CLASS
+    PRIORITY_IDLE: 0x00000040, # IDLE_PRIORITY_CLASS
+}
+
+
+class JobCancelled(Exception):
+    """O trabalho foi cancelado antes ou durante o encode."""
+
+
+class JobTimedOut(Exception):
+    """O trabalho estourou o tempo limite ou o ffmpeg parou de avançar.
+
+    `stderr` traz as últimas linhas do log do ffmpeg morto (bytes).
+    """
+
+    def __init__(self, message, stderr=None):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+def ffmpeg_command(priority=None):
+    """Comando que inicia o ffmpeg na prioridade pedida (lista para o ffmpeg-python)."""
+    cmd = ["ffmpeg"]
+    if sys.platform == "win32" or priority not in POSIX_PRIORITY:
+        return cmd
+
+    niceness, ionice_args = POSIX_PRIORITY[priority]
+    # nice e ionice fazem exec: o pid do processo continua sendo o do ffmpeg
+    if shutil.which("ionice"):
+        cmd = ["ionice", *ionice_args] + cmd
+    if shutil.which("nice"):
+        cmd = ["nice", "-n", str(niceness)] + cmd
+    return cmd
+
+
+def _set_windows_priority(process, priority):
+    if priority not in WINDOWS_PRIORITY:
+        return
+    import ctypes
+    ctypes.windll.kernel32.SetPriorityClass(int(process._handle), WINDOWS_PRIORITY[priority])
+
+
+def _suspend(process):
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            ctypes.windll.ntdll.NtSuspendProcess(int(process._handle))
+        else:
+            os.kill(process.pid, signal.SIGSTOP)
+    except OSError:
+        pass # o processo já terminou
+
+
+def _resume(process):
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            ctypes.windll.ntdll.NtResumeProcess(int(process._handle))
+        else:
+            os.kill(process.pid, signal.SIGCONT)
+    except OSError:
+        pass
+
+
+def kill_process(process):
+    # Um processo suspenso precisa voltar a rodar para tratar o sinal
+    _resume(process)
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+def signal_kill(process):
+    """Mata `process` só pelo pid/handle, sem chamar métodos do Popen.
+
+    Popen.kill() faz um poll() antes do sinal e pode recolher o processo no
+    lugar de quem o espera. Quem chama garante que ele ainda não foi
+    recolhido (senão o pid pode ser de outro processo).
+    """
+    _resume(process) # SIGCONT/NtResumeProcess também vão direto pelo pid/handle
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            ctypes.windll.kernel32.TerminateProcess(int(process._handle), 1)
+        else:
+            os.kill(process.pid, signal.SIGKILL)
+    except OSError:
+        pass # o processo já terminou
+
+
+class JobControl:
+    """Cancelamento, pausa e tempo limite de um trabalho e de todos os ffmpeg dele.
+
+    É compartilhado entre o trabalho pedido e as cópias que `resolve_job`
+    e o encode em pedaços derivam dele, então um cancelamento alcança
+    também as amostras do Tamanho Alvo e os segmentos paralelos.
+
+    O prazo (`start_deadline`) não corre enquanto o trabalho está pausado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._running = threading.Event() # limpo = pausado
+        self._running.set()
+        self._cancelled = False
+        self._paused_at = None
+        # Pausas já retomadas: um encode que viu este número mudar ficou parado no meio
+        # (a contagem muda na retomada, então pega também a pausa que começou antes dele)
+        self.pauses = 0
+        self.deadline = None # time.monotonic() limite (None = sem tempo limite)
+        self.usage = JobUsage()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            self._running.set() # acorda quem está esperando em checkpoint()
+            for process in self._processes:
+                kill_process(process)
+
+    def pause(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            if not self.paused:
+                self._paused_at = time.monotonic()
+            self._running.clear()
+            for process in self._processes:
+                _suspend(process)
+
+    def resume(self):
+        with self._lock:
+            if self.paused:
+                self.pauses += 1
+                if self.deadline is not None:
+                    self.deadline += time.monotonic() - self._paused_at
+            self._running.set()
+            for process in self._processes:
+                _resume(process)
+
+    def start_deadline(self, seconds):
+        """Começa a contar o tempo limite do trabalho (None ou 0 = sem limite)."""
+        self.deadline = time.monotonic() + seconds if seconds else None
+
+    def expired(self, now=None):
+        """True se o tempo limite passou (nunca enquanto pausado)."""
+        if self.deadline is None or self.paused:
+            return False
+        return (now or time.monotonic()) > self.deadline
+
+    def checkpoint(self):
+        """Espera enquanto pausado; levanta JobCancelled se foi cancelado
+        e JobTimedOut se o tempo limite passou."""
+        self._running.wait()
+        if self._cancelled:
+            raise JobCancelled()
+        if self.expired():
+            raise JobTimedOut("tempo limite do trabalho esgotado")
+
+    @contextlib.contextmanager
+    def track(self, process):
+        """Acompanha um processo filho enquanto o bloco roda.
+
+        Se o bloco sair com o processo ainda vivo (erro ou cancelamento),
+        o processo é morto para não ficar órfão.
+        """
+        with self._lock:
+            self._processes.add(process)
+            if self._cancelled:
+                kill_process(process)
+            elif self.paused:
+                _suspend(process)
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+            if process.poll() is None:
+                kill_process(process)
+                process.wait()
+
+
+def spawn(out, priority=None, control=None, pass_fds=(), pipe_stdout=False, pipe_stderr=False,
+          overwrite_output=False):
+    """Como ffmpeg.run_async, na prioridade pedida (espera se o trabalho estiver pausado).
+
+    `pass_fds`: descritores extras que o ffmpeg herda (entrada/saída 'fd:N').
+    """
+    if control is not None:
+        control.checkpoint()
+    args = ffmpeg.compile(out, cmd=ffmpeg_command(priority), overwrite_output=overwrite_output)
+    process = subprocess.Popen(
+        args, pass_fds=pass_fds,
+        stdout=subprocess.PIPE if pipe_stdout else None,
+        stderr=subprocess.PIPE if pipe_stderr else None,
+    )
+    if sys.platform == "win32":
+        _set_windows_priority(process, priority)
+    if control is not None:
+        control.usage.add_command(args)
+    return process
+
+
+def wait_process(process, control=None):
+    """process.wait() que soma o uso de recursos do processo ao trabalho."""
+    usage = wait_with_usage(process)
+    if control is not None:
+        control.usage.add_usage(usage)
+    return process.returncode
+
+
+def _read_all(stream, chunks):
+    chunks.append(stream.read())
+
+
+def run_quiet(out, priority=None, control=None):
+    """Como ffmpeg.run(capture_stdout/stderr), mas com prioridade e controle."""
+    process = spawn(out, priority, control, pipe_stdout=True, pipe_stderr=True,
+                    overwrite_output=True)
+    with control.track(process) if control is not None else contextlib.nullcontext():
+        # Lê os dois pipes em paralelo (como communicate) e recolhe o processo medindo o uso
+        stdout, stderr = [], []
+        readers = [threading.Thread(target=_read_all, args=(process.stdout, stdout), daemon=True),
+                   threading.Thread(target=_read_all, args=(process.stderr, stderr), daemon=True)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        wait_process(process, control)
+    stdout, stderr = b"".join(stdout), b"".join(stderr)
+    if process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", stdout, stderr)
+    return stdout, stderr
+
+
+class ResourceGovernor:
+    """Limites compartilhados por um ou mais motores de compressão.
+
+    `max_concurrent`: encodes ao mesmo tempo somando todos os motores.
+    `max_threads`: threads de ffmpeg somando os encodes simultâneos.
+    `job_threads`: teto de threads de cada encode.
+    `priority`: prioridade padrão dos trabalhos que não escolheram uma.
+    None = sem limite (o comportamento de antes).
+    """
+
+    def __init__(self, max_concurrent=None, max_threads=None, job_threads=None,
+                 priority=PRIORITY_NORMAL):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade desconhecida: {priority}")
+        self.max_concurrent = max_concurrent
+        self.max_threads = max_threads
+        self.job_threads = job_threads
+        self.priority = priority
+        self._slots = threading.Semaphore(max_concurrent) if max_concurrent else None
+        self._lock = threading.Lock()
+        self._controls = set()
+        self.paused = False
+
+    def threads_for(self, concurrent):
+        """Threads de cada encode quando `concurrent` rodam juntos (None = o ffmpeg decide)."""
+        if self.max_concurrent:
+            concurrent = min(concurrent, self.max_concurrent)
+        threads = None
+        if self.max_threads or concurrent > 1:
+            budget = self.max_threads or os.cpu_count() or 1
+            threads = max(1, budget // concurrent)
+        if self.job_threads:
+            threads = min(threads or self.job_threads, self.job_threads)
+        return threads
+
+    @contextlib.contextmanager
+    def slot(self, control):
+        """Reserva uma vaga de encode; cancelar ou pausar vale também na espera."""
+        if self._slots is not None:
+            while not self._slots.acquire(timeout=0.2):
+                control.checkpoint()
+        try:
+            control.checkpoint()
+            yield
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def register(self, control):
+        with self._lock:
+            self._controls.add(control)
+            if self.paused:
+                control.pause() # trabalho novo entra na fila já pausado
+
+    def unregister(self, control):
+        with self._lock:
+            self._controls.discard(control)
+
+    def _each_control(self):
+        with self._lock:
+            return list(self._controls)
+
+    def cancel_all(self):
+        """Cancela os trabalhos em andamento e os que ainda estão na fila."""
+        for control in self._each_control():
+            control.cancel()
+
+    def pause_all(self):
+        self.paused = True
+        for control in self._each_control():
+            control.pause()
+
+    def resume_all(self):
+        self.paused = False
+        for control in self._each_control():
+            control.resume()
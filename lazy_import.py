@@ -0,0 +1,33 @@
+# lazy_import.py
+"""Importação preguiçosa de módulos pesados (ex.: ffmpeg-python).
+
+O módulo só é importado no primeiro acesso a um atributo, então a janela
+abre sem pagar o custo de importar o que só a compressão usa.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    """Procurador de um módulo; importa de verdade no primeiro atributo pedido.
+
+    O lock garante um único import mesmo quando vários workers tocam o
+    módulo ao mesmo tempo.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name):
+    """Devolve o módulo `name`, carregado de verdade só quando for usado."""
+    return LazyModule(name)
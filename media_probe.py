@@ -0,0 +1,340 @@
+# media_probe.py
+"""Metadados de mídia (ffprobe) com cache persistente em SQLite.
+
+Cada arquivo é identificado por (caminho, tamanho, mtime): se o arquivo mudar,
+a entrada fica velha e é refeita no próximo acesso. O índice de keyframes e o
+hash do conteúdo são guardados à parte, só quando alguém pede (são os mais
+caros: um lê todos os pacotes, o outro o arquivo inteiro). O cache tem
+limite de entradas e de bytes e descarta primeiro o que foi usado há mais tempo.
+
+Aquecer o cache de uma pasta inteira:
+    python media_probe.py /mnt/capturas -j 8 --recursive
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from lazy_import import lazy_import
+
+ffmpeg = lazy_import("ffmpeg")
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi")
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # índices de keyframes de arquivos longos pesam
+# Mude quando o cálculo do índice de keyframes mudar (índices antigos são refeitos)
+KEYFRAMES_VERSION = 2
+
+
+@dataclass
+class MediaInfo:
+    """O que o resto do app precisa saber de uma entrada."""
+    path: str
+    size: int
+    duration: float = None
+    format_name: str = None
+    bit_rate: int = None
+    video_codec: str = None
+    width: int = None
+    height: int = None
+    frame_rate: float = None
+    video_bit_rate: int = None
+    audio_codec: str = None
+    audio_bit_rate: int = None
+
+
+def default_cache_dir():
+    """Pasta de cache do app dentro da pasta de cache do usuário (varia por SO)."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else: # macOS / Linux
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return os.path.join(base, "video-compressor")
+
+
+def default_cache_path():
+    """Arquivo SQLite do cache de probes."""
+    return os.path.join(default_cache_dir(), "probe.sqlite3")
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_rate(value):
+    """'30000/1001' -> 29.97 (None para '0/0' ou ausente)."""
+    num, _, den = (value or "").partition("/")
+    num, den = _to_float(num), _to_float(den or 1)
+    if not num or not den:
+        return None
+    return num / den
+
+
+def parse_probe(path, size, info):
+    """Converte o JSON do ffprobe em MediaInfo."""
+    fmt = info.get("format", {})
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    return MediaInfo(
+        path=path,
+        size=size,
+        duration=_to_float(fmt.get("duration")),
+        format_name=fmt.get("format_name"),
+        bit_rate=_to_int(fmt.get("bit_rate")),
+        video_codec=video.get("codec_name"),
+        width=_to_int(video.get("width")),
+        height=_to_int(video.get("height")),
+        frame_rate=_parse_rate(video.get("avg_frame_rate")),
+        video_bit_rate=_to_int(video.get("bit_rate")),
+        audio_codec=audio.get("codec_name"),
+        audio_bit_rate=_to_int(audio.get("bit_rate")),
+    )
+
+
+def probe_keyframes(video_path):
+    """Tempos (s) dos keyframes do primeiro stream de vídeo, sem cache.
+
+    Lê só os pacotes (flag K), sem decodificar nada. Os tempos são relativos
+    ao início do arquivo (start_time), como o -ss e o corte os enxergam.
+    """
+    # Sem format=start_time, o ffprobe só devolve os pacotes
+    info = ffmpeg.probe(video_path, select_streams="v:0", show_packets=None,
+                        show_entries="packet=pts_time,flags:format=start_time")
+    start_time = float(info.get("format", {}).get("start_time", 0) or 0)
+
+    keyframes = []
+    for packet in info.get("packets", []):
+        if "K" in packet.get("flags", "") and packet.get("pts_time", "N/A") != "N/A":
+            keyframes.append(float(packet["pts_time"]) - start_time)
+    return sorted(keyframes)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo, sem cache."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MediaProbe:
+    """Cache de probes em SQLite, seguro para uso por várias threads."""
+
+    def __init__(self, db_path=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path or default_cache_path()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS probes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                info TEXT,
+                keyframes TEXT,
+                sha256 TEXT,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL
+            )"""
+        )
+        # Bancos criados por versões anteriores não têm a coluna do hash
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(probes)")}
+        if "sha256" not in columns:
+            self._conn.execute("ALTER TABLE probes ADD COLUMN sha256 TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS probes_last_access ON probes (last_access)")
+        self._conn.commit()
+
+    # --- Acesso ao banco ---
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def _load(self, path, stat, column):
+        """Valor em cache (JSON decodificado) ou None se ausente/velho."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT size, mtime_ns, {column} FROM probes WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None or (row[0], row[1]) != stat or row[2] is None:
+                return None
+            self._conn.execute("UPDATE probes SET last_access = ? WHERE path = ?", (time.time(), path))
+            self._conn.commit()
+        return json.loads(row[2])
+
+    def _save(self, path, stat, column, value):
+        """Grava uma coluna; se o arquivo mudou, a linha inteira é refeita."""
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime_ns FROM probes WHERE path = ?", (path,)).fetchone()
+            if row is None or (row[0], row[1]) != stat:
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO probes (path, size, mtime_ns, {column}, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (path, stat[0], stat[1], data, now),
+                )
+            else:
+                self._conn.execute(
+                    f"UPDATE probes SET {column} = ?, last_access = ? WHERE path = ?", (data, now, path)
+                )
+            self._conn.execute(
+                "UPDATE probes SET bytes = LENGTH(COALESCE(info, '')) + LENGTH(COALESCE(keyframes, '')) "
+                "+ LENGTH(COALESCE(sha256, '')) WHERE path = ?", (path,)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Descarta as entradas usadas há mais tempo até caber nos limites (LRU)."""
+        while True:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM probes").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return
+            # Pelo menos uma entrada por volta; 10% de uma vez quando o limite é de bytes
+            excess = max(count - self.max_entries, count // 10, 1)
+            self._conn.execute(
+                "DELETE FROM probes WHERE path IN "
+                "(SELECT path FROM probes ORDER BY last_access LIMIT ?)", (excess,)
+            )
+
+    # --- API pública ---
+
+    def probe(self, video_path):
+        """MediaInfo do arquivo (do cache, se o arquivo não mudou). Levanta ffmpeg.Error."""
+        path = os.path.abspath(video_path)
+        # O stat vem antes do ffprobe: se o arquivo mudar no meio, a entrada já nasce velha
+        stat = self._stat(path)
+        cached = self._load(path, stat, "info")
+        if cached is not None:
+            return MediaInfo(**cached)
+
+        info = parse_probe(path, stat[0], ffmpeg.probe(path))
+        self._save(path, stat, "info", asdict(info))
+        return info
+
+    def keyframes(self, video_path):
+        """Índice de keyframes (s) do arquivo, do cache quando possível."""
+        path = os.path.abspath(video_path)
+        stat = self._stat(path)
+        cached = self._load(path, stat, "keyframes")
+        if isinstance(cached, dict) and cached.get("version") == KEYFRAMES_VERSION:
+            return cached["times"]
+
+        keyframes = probe_keyframes(path)
+        self._save(path, stat, "keyframes", {"version": KEYFRAMES_VERSION, "times": keyframes})
+        return keyframes
+
+    def content_hash(self, video_path):
+        """SHA-256 do conteúdo, recalculado só quando o arquivo muda."""
+        path = os.path.abspath(video_path)
+        stat = self._stat(path)
+        cached = self._load(path, stat, "sha256")
+        if cached is not None:
+            return cached
+
+        digest = hash_file(path)
+        self._save(path, stat, "sha256", digest)
+        return digest
+
+    def probe_many(self, paths, workers=None, with_keyframes=False):
+        """Probe em paralelo. Devolve {caminho: MediaInfo ou None se falhou}."""
+        def probe_one(path):
+            try:
+                info = self.probe(path)
+                if with_keyframes:
+                    self.keyframes(path)
+                return info
+            except Exception as e:
+                print(f"Erro no probe de {path}: {e}")
+                return None
+
+        workers = workers or min(8, (os.cpu_count() or 1) * 2)  # ffprobe espera mais I/O que CPU
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="probe") as pool:
+            return dict(zip(paths, pool.map(probe_one, paths)))
+
+    def probe_directory(self, folder, workers=None, recursive=False, with_keyframes=False):
+        """Probe em paralelo de todos os vídeos de uma pasta."""
+        if recursive:
+            paths = [os.path.join(root, name)
+                     for root, _, names in os.walk(folder) for name in sorted(names)]
+        else:
+            paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))]
+        paths = [p for p in paths if p.lower().endswith(VIDEO_EXTENSIONS) and os.path.isfile(p)]
+        return self.probe_many(paths, workers, with_keyframes)
+
+    def invalidate(self, video_path):
+        with self._lock:
+            self._conn.execute("DELETE FROM probes WHERE path = ?", (os.path.abspath(video_path),))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_probe = None
+_default_probe_lock = threading.Lock()
+
+
+def get_probe():
+    """Instância compartilhada do cache (criada no primeiro uso)."""
+    global _default_probe
+    with _default_probe_lock:
+        if _default_probe is None:
+            _default_probe = MediaProbe()
+        return _default_probe
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Probe (com cache) de vídeos e pastas.")
+    parser.add_argument("paths", nargs="+", help="Arquivos de vídeo ou pastas.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="ffprobes simultâneos.")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Entra nas subpastas.")
+    parser.add_argument("--keyframes", action="store_true", help="Também indexa os keyframes.")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON (uma linha por arquivo).")
+    args = parser.parse_args(argv)
+
+    cache = get_probe()
+    results = {}
+    files = [p for p in args.paths if not os.path.isdir(p)]
+    for folder in (p for p in args.paths if os.path.isdir(p)):
+        results.update(cache.probe_directory(folder, args.jobs, args.recursive, args.keyframes))
+    results.update(cache.probe_many(files, args.jobs, args.keyframes))
+
+    for path, info in results.items():
+        if args.json:
+            print(json.dumps(asdict(info) if info else {"path": path, "error": True}, ensure_ascii=False))
+        elif info:
+            print(f"{path}: {info.width}x{info.height} {info.video_codec}/{info.audio_codec} "
+                  f"{info.duration or 0:.1f}s {(info.bit_rate or 0) // 1000} kbits/s")
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# output_cache.py
+"""Cache de saídas endereçado por conteúdo.
+
+A chave de um trabalho é o SHA-256 do conteúdo da entrada mais os parâmetros
+de encode. Se o mesmo trabalho já rodou, a saída guardada é ligada (hard link)
+ou copiada para o novo destino na hora, sem rodar o ffmpeg. A entrada do
+cache é sempre uma cópia: um hard link com a saída do usuário deixaria uma
+edição no lugar desse arquivo corromper o cache. O cache tem um orçamento em
+bytes e descarta primeiro as saídas usadas há mais tempo.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from compressor_engine import JobResult, Progress, is_streaming, partial_path, resolve_preset
+from media_probe import default_cache_dir, get_probe
+from preset_planner import DEFAULT_PRESET
+
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3  # 10 GB
+
+# Mude quando a receita de encode mudar (preset, filtros...) para não reaproveitar saídas antigas
+CACHE_VERSION = 3
+
+
+def default_output_cache_dir():
+    return os.path.join(default_cache_dir(), "outputs")
+
+
+def _link_or_copy(source, target):
+    """Hard link quando possível (mesmo disco, instantâneo); senão, cópia."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class OutputCache:
+    """Saídas prontas guardadas por (hash da entrada, parâmetros de encode)."""
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_output_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, job):
+        """Chave do trabalho: conteúdo da entrada + o que muda a saída.
+
+        `job` já deve ter o preset resolvido (resolve_preset): com prazo, o
+        preset None ainda não diz qual encode vai rodar.
+        """
+        params = {
+            "input": get_probe().content_hash(job.video_path),
+            "mode": job.mode,
+            "value": job.value,
+            "version": CACHE_VERSION,
+        }
+        if (job.preset or DEFAULT_PRESET) != DEFAULT_PRESET:
+            params["preset"] = job.preset # o padrão fica fora da chave (mantém as chaves antigas)
+        if job.content_aware:
+            params["content_aware"] = True
+        if job.trim_start:
+            params["trim_start"] = job.trim_start
+        if job.trim_end is not None:
+            params["trim_end"] = job.trim_end
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def restore(self, key, save_path):
+        """Coloca a saída em cache em `save_path`. False se não houver entrada."""
+        entry = self._entry_path(key)
+        with self._lock:
+            if not os.path.isfile(entry):
+                return False
+            os.utime(entry) # mtime marca o último uso (LRU)
+        # Cópia num nome temporário e rename: o destino nunca aparece pela metade
+        temp_path = partial_path(save_path)
+        try:
+            _link_or_copy(entry, temp_path)
+            os.replace(temp_path, save_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return True
+
+    def store(self, key, save_path):
+        """Guarda a saída de um trabalho concluído e respeita o orçamento."""
+        entry = self._entry_path(key)
+        temp_path = os.path.join(self.cache_dir, f".{uuid.uuid4().hex}.tmp")
+        try:
+            # Cópia, nunca link: a saída é do usuário e pode ser editada no lugar
+            shutil.copyfile(save_path, temp_path)
+            with self._lock:
+                os.replace(temp_path, entry)
+                os.utime(entry)
+                self._evict()
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _evict(self):
+        """Apaga as entradas usadas há mais tempo até caber no orçamento."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp4"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def run(self, job, runner, on_progress=None):
+        """Devolve a saída em cache, ou roda `runner` e guarda o resultado."""
+        if is_streaming(job):
+            return runner(job, on_progress) # pipe não tem conteúdo para hashear nem arquivo para guardar
+        # O preset do prazo é escolhido uma vez, aqui: a chave e o encode usam o mesmo
+        encode_job = resolve_preset(job)
+        try:
+            key = self.key_for(encode_job)
+        except Exception as e:
+            print(f"Cache de saídas indisponível para {job.video_path}: {e}")
+            return self._run_as(job, encode_job, runner, on_progress)
+
+        try:
+            if self.restore(key, job.save_path):
+                print(f"Saída reaproveitada do cache: {os.path.basename(job.save_path)}")
+                if on_progress is not None:
+                    size = os.path.getsize(job.save_path)
+                    on_progress(Progress(job, done=True, total_size=size))
+                return JobResult(job, True, reused=True)
+        except OSError as e:
+            print(f"Erro ao ler o cache de saídas: {e}")
+
+        result = self._run_as(job, encode_job, runner, on_progress)
+        if result.success and self.max_bytes > 0:
+            try:
+                self.store(key, job.save_path)
+            except OSError as e:
+                print(f"Erro ao gravar no cache de saídas: {e}")
+        return result
+
+    @staticmethod
+    def _run_as(job, encode_job, runner, on_progress):
+        """Roda `encode_job`, mas reporta progresso e resultado como `job` (quem chamou)."""
+        if encode_job is job:
+            return runner(job, on_progress)
+        report = None
+        if on_progress is not None:
+            def report(progress):
+                job.save_path = progress.job.save_path
+                on_progress(dataclasses.replace(progress, job=job))
+        result = runner(encode_job, report)
+        # A retomada do chunked grava no destino da primeira tentativa: quem
+        # chamou (e o store) precisam do save_path que o runner usou de fato
+        job.save_path = result.job.save_path
+        return dataclasses.replace(result, job=job)
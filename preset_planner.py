@@ -0,0 +1,248 @@
+# preset_planner.py
+"""Escolha do preset do x264 por prazo, com base na velocidade medida nesta máquina.
+
+Presets mais lentos dão arquivos menores na mesma qualidade, mas demoram mais.
+Com um prazo (ou uma velocidade mínima), o planejador escolhe o preset mais
+lento que ainda termina a tempo, usando o fps que cada preset alcançou aqui
+em encodes anteriores de resolução parecida. Cada encode concluído refina a
+medição (média móvel), guardada em SQLite ao lado do cache de probes.
+
+Medir todos os presets de uma vez com um vídeo de exemplo:
+    python preset_planner.py --calibrate exemplo.mp4
+"""
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from lazy_import import lazy_import
+from media_probe import default_cache_dir, get_probe
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Do mais rápido ao mais lento (menor arquivo)
+PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast",
+           "medium", "slow", "slower", "veryslow")
+DEFAULT_PRESET = "fast"
+
+# Velocidade típica de cada preset em relação ao medium: só serve para
+# estimar um preset ainda não medido a partir de outro que já foi
+RELATIVE_SPEED = {
+    "ultrafast": 8.0, "superfast": 5.5, "veryfast": 3.5, "faster": 2.2, "fast": 1.6,
+    "medium": 1.0, "slow": 0.6, "slower": 0.3, "veryslow": 0.12,
+}
+
+# Alturas de referência: medições são agrupadas pela mais próxima
+HEIGHT_BUCKETS = (360, 480, 720, 1080, 1440, 2160)
+
+# Folga sobre a velocidade necessária (a medição varia com a carga da máquina)
+SPEED_MARGIN = 1.15
+# Peso mínimo de uma medição nova na média móvel
+MIN_SMOOTHING = 0.2
+
+CALIBRATION_SECONDS = 5.0
+
+
+def height_bucket(height):
+    return min(HEIGHT_BUCKETS, key=lambda bucket: abs(bucket - (height or 720)))
+
+
+def default_throughput_path():
+    return os.path.join(default_cache_dir(), "throughput.sqlite")
+
+
+def parse_deadline(text, now=None):
+    """Prazo como instante (time.time): '2h', '1h30m', '45m', '90s' a partir de agora, ou 'HH:MM'."""
+    now = now or time.time()
+    text = text.strip().lower()
+
+    clock = re.fullmatch(r"(\d{1,2}):(\d{2})", text)
+    if clock:
+        current = datetime.datetime.fromtimestamp(now)
+        target = current.replace(hour=int(clock[1]), minute=int(clock[2]), second=0, microsecond=0)
+        if target <= current:
+            target += datetime.timedelta(days=1) # 'HH:MM' que já passou = amanhã
+        return target.timestamp()
+
+    parts = re.fullmatch(r"(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?", text)
+    if not parts or not any(parts.groups()):
+        raise ValueError(f"Prazo inválido: {text!r} (use '2h', '1h30m', '45m' ou 'HH:MM')")
+    hours, minutes, seconds = (int(value or 0) for value in parts.groups())
+    return now + hours * 3600 + minutes * 60 + seconds
+
+
+class ThroughputStore:
+    """fps por (preset, altura de referência), refinado a cada encode."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_throughput_path()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS throughput (
+                preset TEXT NOT NULL,
+                height INTEGER NOT NULL,
+                fps REAL NOT NULL,
+                samples INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (preset, height)
+            )"""
+        )
+        self._conn.commit()
+
+    def record(self, preset, height, fps):
+        """Junta uma medição nova à média móvel do (preset, altura)."""
+        if fps <= 0:
+            return
+        bucket = height_bucket(height)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fps, samples FROM throughput WHERE preset = ? AND height = ?", (preset, bucket)
+            ).fetchone()
+            if row is None:
+                average, samples = fps, 1
+            else:
+                # As primeiras medições valem como média simples; depois, média móvel
+                weight = max(MIN_SMOOTHING, 1 / (row[1] + 1))
+                average, samples = row[0] * (1 - weight) + fps * weight, row[1] + 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO throughput (preset, height, fps, samples, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", (preset, bucket, average, samples, time.time()),
+            )
+            self._conn.commit()
+
+    def measurements(self):
+        """{(preset, altura): fps} de tudo que já foi medido."""
+        with self._lock:
+            rows = self._conn.execute("SELECT preset, height, fps FROM throughput").fetchall()
+        return {(preset, height): fps for preset, height, fps in rows if preset in RELATIVE_SPEED}
+
+    def estimate(self, preset, height, measurements=None):
+        """fps esperado para o preset nessa altura (None = nada medido ainda).
+
+        Sem medição exata, parte da medição mais parecida (preset vizinho e/ou
+        outra resolução), corrigindo pela velocidade relativa dos presets e
+        pelo número de pixels.
+        """
+        measurements = self.measurements() if measurements is None else measurements
+        bucket = height_bucket(height)
+        if (preset, bucket) in measurements:
+            return measurements[(preset, bucket)]
+        if not measurements:
+            return None
+
+        def distance(key):
+            other_preset, other_height = key
+            return (abs(PRESETS.index(other_preset) - PRESETS.index(preset))
+                    + abs(HEIGHT_BUCKETS.index(other_height) - HEIGHT_BUCKETS.index(bucket)))
+
+        other_preset, other_height = min(measurements, key=distance)
+        fps = measurements[(other_preset, other_height)]
+        return (fps * RELATIVE_SPEED[preset] / RELATIVE_SPEED[other_preset]
+                * (other_height / bucket) ** 2)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_throughput_store():
+    """Instância compartilhada (criada no primeiro uso)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ThroughputStore()
+        return _default_store
+
+
+def required_speed(duration, deadline=None, min_speed=None, now=None):
+    """Múltiplo do tempo real necessário para cumprir prazo e velocidade mínima."""
+    speeds = [min_speed or 0.0]
+    if deadline is not None:
+        remaining = deadline - (now or time.time())
+        speeds.append(float("inf") if remaining <= 0 else duration / remaining)
+    return max(speeds)
+
+
+def choose_preset(info, output_height, deadline=None, min_speed=None, store=None):
+    """Preset mais lento que ainda cumpre o prazo/velocidade pedidos.
+
+    `info` é o MediaInfo da entrada. Sem medições nesta máquina, volta ao
+    preset padrão; se nem o ultrafast chegar lá, usa ele mesmo (o mais rápido).
+    """
+    if not info.duration or not info.frame_rate:
+        return DEFAULT_PRESET
+    store = store or get_throughput_store()
+    measurements = store.measurements()
+    if not measurements:
+        print(f"Sem medições de velocidade ainda; usando o preset {DEFAULT_PRESET}.")
+        return DEFAULT_PRESET
+
+    needed_fps = required_speed(info.duration, deadline, min_speed) * info.frame_rate * SPEED_MARGIN
+    for preset in reversed(PRESETS):
+        if store.estimate(preset, output_height, measurements) >= needed_fps:
+            print(f"Prazo: preset {preset} ({needed_fps:.0f} fps necessários)")
+            return preset
+
+    print(f"Prazo: nem o ultrafast alcança {needed_fps:.0f} fps; usando ultrafast.")
+    return PRESETS[0]
+
+
+def record_encode(preset, output_height, frames, seconds, store=None):
+    """Registra a velocidade de um encode concluído."""
+    if frames and seconds > 0:
+        (store or get_throughput_store()).record(preset or DEFAULT_PRESET, output_height, frames / seconds)
+
+
+def calibrate(video_path, seconds=CALIBRATION_SECONDS, presets=PRESETS, store=None):
+    """Mede cada preset num trecho da entrada (saída descartada) e grava as medições."""
+    store = store or get_throughput_store()
+    info = get_probe().probe(video_path)
+    start = max(0.0, (info.duration or 0) / 2 - seconds / 2)
+    results = {}
+    for preset in presets:
+        out = ffmpeg.input(video_path, ss=start, t=seconds).video.output(
+            "-", f="null", vcodec="libx264", preset=preset,
+        )
+        began = time.monotonic()
+        ffmpeg.run(out, capture_stdout=True, capture_stderr=True)
+        elapsed = time.monotonic() - began
+        frames = min(seconds, info.duration or seconds) * (info.frame_rate or 0)
+        record_encode(preset, info.height, frames, elapsed, store)
+        results[preset] = frames / elapsed if elapsed else 0.0
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Velocidade medida de cada preset do x264.")
+    parser.add_argument("--calibrate", metavar="VIDEO", help="Mede todos os presets com este vídeo.")
+    parser.add_argument("--seconds", type=float, default=CALIBRATION_SECONDS,
+                        help="Duração do trecho usado na calibração.")
+    args = parser.parse_args(argv)
+
+    store = get_throughput_store()
+    if args.calibrate:
+        print(f"Calibrando com {args.calibrate}...")
+        calibrate(args.calibrate, args.seconds, store=store)
+
+    measurements = store.measurements()
+    if not measurements:
+        print("Nenhuma medição ainda. Rode com --calibrate VIDEO ou comprima alguns vídeos.")
+        return 0
+    for height in sorted({h for _, h in measurements}):
+        row = "  ".join(f"{preset}={store.estimate(preset, height, measurements):.0f}" for preset in PRESETS)
+        print(f"{height}p: {row}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
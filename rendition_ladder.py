@@ -0,0 +1,193 @@
+# rendition_ladder.py
+"""Várias versões (alturas e CRFs) da mesma entrada em um único ffmpeg.
+
+A entrada é decodificada uma vez só: o filtro `split` reparte o vídeo entre
+um ramo `scale` + encoder por versão, e o áudio da entrada é copiado para
+todas as saídas (sem recodificar). Comparado a rodar o pipeline uma vez por
+versão, economiza a decodificação e a leitura do arquivo N-1 vezes.
+
+    python rendition_ladder.py entrada.mp4 -o saida --heights 480 720 1080 --crf 23 28
+
+Compare com rodadas separadas: `python benchmark.py ladder`.
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+from dataclasses import dataclass, field
+
+from compressor_engine import (
+    DEFAULT_VALUES, MODE_CRF, RESOLUTION_MAP, CompressionEngine, JobResult,
+    container_params, default_output_folder, discard_partial, failed_result,
+    partial_path, probe_duration, run_ffmpeg,
+)
+from governor import PRIORITIES, PRIORITY_NORMAL, JobControl, ResourceGovernor
+from lazy_import import lazy_import
+from media_probe import get_probe
+from preset_planner import DEFAULT_PRESET, PRESETS
+
+ffmpeg = lazy_import("ffmpeg")
+
+DEFAULT_HEIGHTS = tuple(option["height"] for option in RESOLUTION_MAP.values())
+
+
+@dataclass
+class Rendition:
+    """Uma versão da escada: altura (None = original) e CRF."""
+    save_path: str
+    height: int = None
+    crf: int = DEFAULT_VALUES[MODE_CRF]
+
+
+@dataclass
+class LadderJob:
+    """Todas as versões de uma entrada, produzidas por um único ffmpeg.
+
+    Tem os mesmos campos de controle do CompressionJob (threads, prioridade,
+    tempos limite, JobControl), então roda no CompressionEngine com `runner=run_ladder`.
+    """
+    video_path: str
+    renditions: list
+    preset: str = None
+    threads: int = None  # somando todas as versões
+    priority: str = None
+    timeout: float = None
+    stall_timeout: float = None
+    control: JobControl = field(default_factory=JobControl, repr=False, compare=False)
+
+    def __post_init__(self):
+        if not self.renditions:
+            raise ValueError("A escada precisa de pelo menos uma versão.")
+        if self.preset is not None and self.preset not in PRESETS:
+            raise ValueError(f"Preset desconhecido: {self.preset}")
+
+    @property
+    def save_path(self):
+        """Saída principal (a primeira versão), usada no progresso."""
+        return self.renditions[0].save_path
+
+
+def ladder_output_path(video_path, output_folder, height, crf):
+    """Nome único por versão, no mesmo padrão de build_output_path."""
+    original_name, _ = os.path.splitext(os.path.basename(video_path))
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    unique_code = f"{random.randint(100000, 999999)}"
+    label = f"{height}p" if height else "original"
+    return os.path.join(output_folder, f"{original_name}_{label}_crf{crf}_{timestamp}_{unique_code}.mp4")
+
+
+def build_ladder(video_path, output_folder, heights=DEFAULT_HEIGHTS, crfs=(DEFAULT_VALUES[MODE_CRF],)):
+    """Uma versão para cada combinação de altura e CRF."""
+    return [Rendition(ladder_output_path(video_path, output_folder, height, crf), height, crf)
+            for height in heights for crf in crfs]
+
+
+def build_ladder_output(job, output_paths=None):
+    """Grafo do ffmpeg-python: um decode, um `split`, N ramos scale + libx264.
+
+    `output_paths` substitui os destinos das versões (nomes temporários).
+    """
+    output_paths = output_paths or [rendition.save_path for rendition in job.renditions]
+    in_file = ffmpeg.input(job.video_path)
+    try:
+        has_audio = get_probe().probe(job.video_path).audio_codec is not None
+    except Exception:
+        has_audio = True # sem probe, tenta mapear o áudio como o caminho normal
+
+    count = len(job.renditions)
+    split = in_file.video.filter_multi_output("split", count)
+    # As threads do trabalho são divididas entre os encoders das versões
+    threads = max(1, job.threads // count) if job.threads else None
+
+    outputs = []
+    for index, (rendition, output_path) in enumerate(zip(job.renditions, output_paths)):
+        video = split.stream(index)
+        if rendition.height:
+            video = video.filter("scale", -2, rendition.height)
+        output_params = {"crf": rendition.crf, "preset": job.preset or DEFAULT_PRESET,
+                         **container_params(rendition.save_path)}
+        if threads:
+            output_params["threads"] = threads
+        if has_audio:
+            output_params["c:a"] = "copy"
+            outputs.append(ffmpeg.output(video, in_file.audio, output_path, **output_params))
+        else:
+            outputs.append(ffmpeg.output(video, output_path, **output_params))
+    return ffmpeg.merge_outputs(*outputs)
+
+
+def run_ladder(job, on_progress=None):
+    """Executa a escada e devolve um JobResult (nunca levanta exceção).
+
+    Cada versão é escrita num nome temporário e só renomeada quando o
+    ffmpeg termina bem.
+    """
+    temp_paths = [partial_path(rendition.save_path) for rendition in job.renditions]
+    try:
+        out = build_ladder_output(job, temp_paths)
+        run_ffmpeg(out, job, probe_duration(job.video_path), on_progress)
+        for rendition, temp_path in zip(job.renditions, temp_paths):
+            os.replace(temp_path, rendition.save_path)
+        return JobResult(job, True)
+    except Exception as e:
+        for temp_path in temp_paths:
+            discard_partial(temp_path)
+        return failed_result(job, e)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Gera várias alturas/CRFs de um vídeo decodificando uma vez só.")
+    parser.add_argument("inputs", nargs="+", help="Arquivos de vídeo.")
+    parser.add_argument("-o", "--output-folder", default=None,
+                        help="Pasta de saída (padrão: pasta 'Vídeos' do usuário).")
+    parser.add_argument("--heights", nargs="+", type=int, default=list(DEFAULT_HEIGHTS),
+                        help="Alturas das versões (0 = altura original).")
+    parser.add_argument("--crf", nargs="+", type=int, default=[DEFAULT_VALUES[MODE_CRF]],
+                        help="CRFs das versões (cada altura sai em cada CRF).")
+    parser.add_argument("--preset", choices=PRESETS, default=None, help="Preset do x264.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Entradas processadas ao mesmo tempo.")
+    parser.add_argument("--priority", choices=PRIORITIES, default=PRIORITY_NORMAL,
+                        help="Prioridade de CPU/disco dos ffmpeg.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    output_folder = args.output_folder or default_output_folder()
+    if not os.path.isdir(output_folder):
+        print(f"ERRO: Pasta de saída inválida: {output_folder}")
+        return 2
+
+    heights = [height or None for height in args.heights]
+    jobs = [LadderJob(path, build_ladder(path, output_folder, heights, args.crf), preset=args.preset)
+            for path in args.inputs]
+
+    engine = CompressionEngine(max_workers=args.jobs, runner=run_ladder,
+                               governor=ResourceGovernor(priority=args.priority))
+    print(f"Gerando {len(heights) * len(args.crf)} versão(ões) de {len(jobs)} arquivo(s)...")
+    try:
+        results = engine.run_batch(jobs)
+    except KeyboardInterrupt:
+        print("Cancelando...")
+        engine.cancel_all()
+        return 130
+    finally:
+        engine.shutdown()
+
+    for result in results:
+        name = os.path.basename(result.job.video_path)
+        if result.success:
+            print(f"[OK]     {name}")
+            for rendition in result.job.renditions:
+                print(f"           -> {rendition.save_path}")
+        elif result.cancelled:
+            print(f"[CANCELADO] {name}")
+        else:
+            print(f"[FALHOU] {name}: {result.error}")
+    return 0 if all(r.success for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 # run.py
+import codecs
+import glob
+import hashlib
 import os
 import sys
 import subprocess
 
+from startup_timing import ENV_VAR, StartupTimer, startup_timing_enabled
+
 VENV_DIR = "venv"
+REQUIREMENTS_FILE = "requirements.txt"
+# Impressão digital das dependências instaladas (pula o pip quando nada mudou)
+FINGERPRINT_FILE = os.path.join(VENV_DIR, ".dependencies.sha256")
 
 def get_venv_python():
     """Retorna o caminho para o executável Python dentro da venv, baseado no SO."""
@@ -26,15 +34,60 @@ def create_venv(venv_python_path):
         print("ERRO: Python não encontrado. Verifique sua instalação.")
         sys.exit(1)
 
+def read_requirements(requirements_file):
+    """Lê as linhas do requirements.txt (o arquivo do repo é UTF-16; aceita UTF-8 também)."""
+    with open(requirements_file, "rb") as f:
+        data = f.read()
+
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        text = data.decode("utf-16")
+    else:
+        text = data.decode("utf-8-sig")
+
+    lines = (line.strip() for line in text.splitlines())
+    return [line for line in lines if line and not line.startswith("#")]
+
+def dependencies_fingerprint(venv_python):
+    """Hash do requirements.txt (conteúdo, não codificação) e do estado da venv.
+
+    Entra o pyvenv.cfg (versão do Python da venv) e o mtime da pasta
+    site-packages, que muda quando algo é instalado ou removido por fora.
+    """
+    digest = hashlib.sha256()
+    digest.update("\n".join(read_requirements(REQUIREMENTS_FILE)).encode("utf-8"))
+    digest.update(os.path.realpath(venv_python).encode("utf-8"))
+
+    pyvenv_cfg = os.path.join(VENV_DIR, "pyvenv.cfg")
+    if os.path.exists(pyvenv_cfg):
+        with open(pyvenv_cfg, "rb") as f:
+            digest.update(f.read())
+
+    site_packages = glob.glob(os.path.join(VENV_DIR, "lib", "python*", "site-packages"))
+    site_packages += glob.glob(os.path.join(VENV_DIR, "Lib", "site-packages"))
+    for path in sorted(site_packages):
+        digest.update(str(os.stat(path).st_mtime_ns).encode("utf-8"))
+
+    return digest.hexdigest()
+
+def dependencies_up_to_date(venv_python):
+    """True se as dependências já foram instaladas com este requirements.txt e esta venv."""
+    if not os.path.exists(FINGERPRINT_FILE):
+        return False
+    with open(FINGERPRINT_FILE, "r", encoding="utf-8") as f:
+        return f.read().strip() == dependencies_fingerprint(venv_python)
+
 def install_dependencies(venv_python):
     """Instala as dependências usando o pip da venv a partir do requirements.txt."""
-    requirements_file = "requirements.txt"
-    
+    requirements_file = REQUIREMENTS_FILE
+
     if not os.path.exists(requirements_file):
         print(f"ERRO: Arquivo '{requirements_file}' não encontrado.")
         print("Certifique-se de que o arquivo com as dependências está na mesma pasta do run.py.")
         sys.exit(1)
-        
+
+    if dependencies_up_to_date(venv_python):
+        return
+
     print(f"Instalando/verificando dependências a partir de '{requirements_file}'...")
     try:
         subprocess.run(
@@ -49,30 +102,57 @@ def install_dependencies(venv_python):
         print(e.stderr)
         sys.exit(1)
 
+    # Grava a impressão digital só depois do pip (ele mexe no site-packages)
+    with open(FINGERPRINT_FILE, "w", encoding="utf-8") as f:
+        f.write(dependencies_fingerprint(venv_python))
+
+def running_in_venv():
+    """True se este script já está rodando com o Python da venv."""
+    return os.path.realpath(sys.prefix) == os.path.realpath(VENV_DIR)
+
 def launch_app(venv_python):
     """Inicia a aplicação principal."""
     print("Iniciando o Compressor de Vídeo...")
     try:
-        # Executa o compressor_app.py usando o Python da venv
-        subprocess.run([venv_python, "compressor_app.py"])
+        if running_in_venv():
+            # Já estamos na venv: nada de segundo interpretador
+            import compressor_app
+            compressor_app.main()
+        elif sys.platform != "win32":
+            # Substitui este processo pelo Python da venv (sem um pai parado esperando)
+            sys.stdout.flush()
+            os.execv(venv_python, [venv_python, "compressor_app.py"])
+        else:
+            # Executa o compressor_app.py usando o Python da venv
+            subprocess.run([venv_python, "compressor_app.py"])
     except Exception as e:
         print(f"ERRO: Falha ao iniciar a aplicação. {e}")
         sys.exit(1)
 
 def main():
+    timer = StartupTimer()
+    timing = "--timing" in sys.argv[1:] or startup_timing_enabled()
+
     # 1. Define o caminho do executável da venv
     venv_python = get_venv_python()
 
     # 2. Verifica se a venv existe
     if not os.path.exists(venv_python):
         create_venv(venv_python)
-    
+    timer.mark("venv")
+
     # 3. Instala/verifica as dependências
-    # (O pip é inteligente, ele só baixa se for necessário)
+    # (Pula o pip quando a impressão digital do requirements.txt e da venv não mudou)
     install_dependencies(venv_python)
+    timer.mark("dependências")
+
+    if timing:
+        # O app continua o relatório a partir do instante em que o launcher começou
+        os.environ[ENV_VAR] = repr(timer.origin)
+        print(timer.report("launcher"))
 
     # 4. Inicia a aplicação
     launch_app(venv_python)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
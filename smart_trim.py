@@ -0,0 +1,240 @@
+# smart_trim.py
+"""Corte de trechos sem recodificar o que está entre keyframes ("smart render").
+
+Um trecho [início, fim) quase nunca começa e termina em keyframes. Em vez de
+recodificar o trecho inteiro, só os GOPs parciais das pontas passam pelo
+encoder:
+
+    início ... k1   recodificado (primeiro keyframe em/após o início)
+    k1 ... k2       stream copy, sem perda (k2 = último keyframe até o fim)
+    k2 ... fim      recodificado
+
+Cada parte vira um MKV só de vídeo; o concat demuxer as junta pelo tempo
+do primeiro quadro de cada uma e pela duração exata da parte, e o áudio é
+copiado da entrada original, no mesmo trecho. O tempo
+gasto depende dos dois GOPs das pontas, não da duração da entrada.
+
+As pontas saem do libx264 e a cópia, do encoder original. Para o stream
+continuar válido nas emendas:
+- as partes levam SPS/PPS em banda (repeat-headers nas pontas,
+  h264_mp4toannexb na cópia), e o decoder aceita a troca de parâmetros;
+- as pontas usam o mesmo atraso de B-frames da entrada, senão os DTS de
+  uma parte invadiriam os da outra.
+Por isso só vale para H.264 8 bits 4:2:0 progressivo, com perfil e atraso
+de B-frames que o libx264 também gera; fora disso (`can_smart_trim` False)
+o trecho é recodificado.
+"""
+import dataclasses
+import os
+import tempfile
+
+from compressor_engine import (
+    TRIM_AUDIO_PARAMS, Progress, clip_duration, container_params, is_pipe, pipe_url, run_ffmpeg, trim_span,
+)
+from lazy_import import lazy_import
+from media_probe import get_probe
+
+ffmpeg = lazy_import("ffmpeg")
+
+# Qualidade das pontas recodificadas: visualmente sem perda, para não destoar da cópia
+BOUNDARY_CRF = 18
+BOUNDARY_PRESET = "fast" # 3 B-frames em pirâmide: atraso 2, o mesmo do padrão do x264
+# Perfis do H.264 (nome do ffprobe) que o libx264 também gera
+X264_PROFILES = {"baseline": "baseline", "constrained baseline": "baseline", "main": "main", "high": "high"}
+# Atraso de B-frames da entrada (has_b_frames) -> opções do x264 que dão o mesmo atraso
+X264_DELAY_PARAMS = {0: "bframes=0", 1: "b-pyramid=none", 2: ""}
+# Folga ao comparar tempos: o ffprobe arredonda os pts a microssegundos
+EPSILON = 0.001
+
+PART_ENCODE = "encode"
+PART_COPY = "copy"
+
+
+def source_params(video_path):
+    """Parâmetros da entrada para o smart render, ou None se ele não se aplica.
+
+    Devolve {"profile", "x264_params", "start_time"}.
+    """
+    try:
+        info = ffmpeg.probe(video_path, select_streams="v:0")
+    except ffmpeg.Error:
+        return None
+    if not info.get("streams"):
+        return None
+    stream = info["streams"][0]
+    profile = X264_PROFILES.get((stream.get("profile") or "").lower())
+    delay_params = X264_DELAY_PARAMS.get(int(stream.get("has_b_frames") or 0))
+    if (stream.get("codec_name") != "h264" or stream.get("pix_fmt") != "yuv420p"
+            or profile is None or delay_params is None
+            or stream.get("field_order", "progressive") not in ("progressive", "unknown")):
+        return None
+    x264_params = ":".join(p for p in ("repeat-headers=1", delay_params) if p)
+    return {"profile": profile, "x264_params": x264_params,
+            "start_time": float(info.get("format", {}).get("start_time") or 0)}
+
+
+def can_smart_trim(video_path):
+    """A entrada permite copiar o meio do trecho e recodificar só as pontas."""
+    return source_params(video_path) is not None
+
+
+def plan_parts(keyframes, start, end):
+    """Divide [start, end) em partes (tipo, início, fim); fim None = até o fim da entrada."""
+    k1 = next((t for t in keyframes if t >= start - EPSILON), None)
+    k2 = max((t for t in keyframes if end is None or t <= end + EPSILON), default=None)
+    if k1 is None or (end is not None and (k2 is None or k2 <= k1)):
+        # O trecho cabe dentro de um GOP: não há o que copiar
+        return [(PART_ENCODE, start, end)]
+
+    parts = []
+    if k1 - start > EPSILON:
+        parts.append((PART_ENCODE, start, k1))
+    if end is None:
+        parts.append((PART_COPY, k1, None))
+        return parts
+    parts.append((PART_COPY, k1, k2))
+    if end - k2 > EPSILON:
+        parts.append((PART_ENCODE, k2, end))
+    return parts
+
+
+def media_start(path):
+    """Tempo do primeiro quadro de uma parte (no tempo dela), direto do ffprobe."""
+    return float(ffmpeg.probe(path)["format"]["start_time"])
+
+
+def encode_part(job, params, start, end, path, on_progress=None):
+    """Recodifica [start, end) só do vídeo, cortando no quadro exato.
+
+    O seek só leva ao keyframe anterior (sem descartar quadros) e quem corta
+    é o filtro trim, que com -copyts enxerga os tempos originais, os mesmos
+    dos keyframes. O recuo de EPSILON no fim deixa o keyframe seguinte para
+    a cópia. A parte fica com os tempos originais.
+    """
+    offset = params["start_time"]
+    trim = {"start": max(0.0, start + offset - EPSILON)}
+    if end is not None:
+        trim["end"] = end + offset - EPSILON
+    video = ffmpeg.input(job.video_path, ss=start + EPSILON, noaccurate_seek=None).video.filter("trim", **trim)
+    output_params = {"c:v": "libx264", "crf": BOUNDARY_CRF, "preset": BOUNDARY_PRESET,
+                     "profile:v": params["profile"], "x264-params": params["x264_params"],
+                     "avoid_negative_ts": "disabled"}
+    if job.threads:
+        output_params["threads"] = job.threads
+    out = video.output(path, **output_params).global_args("-copyts")
+    run_ffmpeg(out, job, None if end is None else end - start, on_progress)
+
+
+def copy_part(job, start, end, work_dir, on_progress=None):
+    """Copia [start, end) sem recodificar (start e end são keyframes).
+
+    O seek de alguns contêineres (ex.: MKV) cai um GOP antes; o que vem
+    antes de `start` é descartado (copypriorss). O -t do stream copy corta
+    pelo DTS e levaria quadros do GOP seguinte: o segment muxer corta
+    exatamente no keyframe `end` e só o primeiro segmento é usado.
+    Devolve o caminho da parte (tempos a partir do seek).
+    """
+    input_params = {"ss": max(0.0, start - EPSILON)}
+    output_params = {"c": "copy", "bsf:v": "h264_mp4toannexb", "avoid_negative_ts": "disabled",
+                     "copypriorss": 0}
+    if end is None:
+        path = os.path.join(work_dir, "copy.mkv")
+    else:
+        input_params["t"] = end - start + 1.0 # o suficiente para o muxer ver o keyframe `end`
+        output_params.update(f="segment", segment_times=f"{end - start:.6f}")
+        path = os.path.join(work_dir, "copy_%d.mkv")
+    out = ffmpeg.input(job.video_path, **input_params).video.output(path, **output_params)
+    run_ffmpeg(out, job, None if end is None else end - start, on_progress)
+    return path if end is None else os.path.join(work_dir, "copy_0.mkv")
+
+
+def concat_parts(job, parts, work_dir, output_path, start, end):
+    """Junta as partes (concat demuxer) e copia o áudio do mesmo trecho da entrada.
+
+    `parts` são (caminho, primeiro quadro no tempo da parte, duração); com
+    eles na lista do concat, cada quadro cai exatamente onde estava no
+    trecho. `start` e `end` delimitam o áudio.
+    """
+    list_path = os.path.join(work_dir, "concat.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path, inpoint, duration in parts:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\ninpoint {inpoint:.6f}\n")
+            if duration is not None:
+                f.write(f"duration {duration:.6f}\n")
+
+    in_video = ffmpeg.input(list_path, f="concat", safe=0).video
+    audio_params = {"ss": start}
+    if end is not None:
+        audio_params["t"] = end - start
+    in_audio = ffmpeg.input(job.video_path, **audio_params)["a?"]
+    output = output_path or pipe_url(job.save_path, 1) or job.save_path
+    out = ffmpeg.output(in_video, in_audio, output,
+                        **{"c:v": "copy", "c:a": "copy", **TRIM_AUDIO_PARAMS,
+                           **container_params(job.save_path)})
+    run_ffmpeg(out, job)
+
+
+def _part_progress(on_progress, offset, base, length, total):
+    """Converte o progresso de uma parte no do trecho inteiro.
+
+    Com -copyts o out_time vem no tempo da entrada: `base` é o início da
+    parte nesse tempo e `offset`, onde ela começa no trecho. `length` (None
+    = até o fim) limita a parte, que pode ler um pouco além dela.
+    """
+    if on_progress is None:
+        return None
+
+    def update(progress):
+        out_time = max(0.0, progress.out_time - base)
+        if length is not None:
+            out_time = min(out_time, length)
+        on_progress(dataclasses.replace(progress, out_time=offset + out_time, duration=total, done=False))
+    return update
+
+
+def run_smart_trim(job, output_path=None, on_progress=None):
+    """Corta o trecho de `job` em `output_path` (None = o destino do trabalho, ex.: pipe).
+
+    Levanta as mesmas exceções de run_ffmpeg.
+    """
+    params = source_params(job.video_path)
+    if params is None:
+        raise ValueError("Entrada incompatível com o smart render")
+    duration = get_probe().probe(job.video_path).duration
+    start, end = trim_span(job, duration)
+    total = clip_duration(job, duration)
+    plan = plan_parts(get_probe().keyframes(job.video_path), start, end)
+    copied = sum((part_end if part_end is not None else start + total) - part_start
+                 for kind, part_start, part_end in plan if kind == PART_COPY)
+    print(f"Smart render de {os.path.basename(job.video_path)}: "
+          f"{copied:.1f}s copiados, {total - copied:.1f}s recodificados")
+
+    # Partes ao lado da saída (mesmo disco); saída em pipe usa a pasta temporária
+    folder = None if is_pipe(job.save_path, 1) else os.path.dirname(os.path.abspath(job.save_path))
+    with tempfile.TemporaryDirectory(prefix=".trim_", dir=folder) as work_dir:
+        offset = params["start_time"]
+        parts = []
+        first_frame = None # o áudio acompanha o primeiro quadro de vídeo, não o início pedido
+        for index, (kind, part_start, part_end) in enumerate(plan):
+            length = None if part_end is None else part_end - part_start
+            if kind == PART_COPY:
+                progress = _part_progress(on_progress, part_start - start, 0.0, length, total)
+                path = copy_part(job, part_start, part_end, work_dir, progress)
+                inpoint = media_start(path)
+                frame = part_start # a cópia começa no próprio keyframe
+            else:
+                # -copyts: o progresso e a parte ficam no tempo original da entrada
+                progress = _part_progress(on_progress, part_start - start, part_start + offset, length, total)
+                path = os.path.join(work_dir, f"encode_{index}.mkv")
+                encode_part(job, params, part_start, part_end, path, progress)
+                inpoint = media_start(path)
+                frame = inpoint - offset # primeiro quadro em/após o início pedido
+            if first_frame is None:
+                first_frame = frame
+            parts.append((path, inpoint, None if part_end is None else part_end - frame))
+        concat_parts(job, parts, work_dir, output_path, first_frame, end)
+
+    if on_progress is not None:
+        size = os.path.getsize(output_path or job.save_path) if not is_pipe(job.save_path, 1) else 0
+        on_progress(Progress(job, out_time=total, duration=total, done=True, total_size=size))
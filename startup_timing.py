@@ -0,0 +1,44 @@
+# startup_timing.py
+"""Relatório de tempo de inicialização (launcher + app).
+
+Ative com `python run.py --timing` (ou a variável COMPRESSOR_STARTUP_TIMING).
+O launcher grava nela o instante em que começou, para o app medir o total.
+Só usa a biblioteca padrão: o run.py roda antes da venv existir.
+"""
+import os
+import time
+
+ENV_VAR = "COMPRESSOR_STARTUP_TIMING"
+
+
+def startup_timing_enabled():
+    return bool(os.environ.get(ENV_VAR))
+
+
+def launch_origin():
+    """Instante (time.time) em que o launcher começou, se ele informou."""
+    try:
+        return float(os.environ.get(ENV_VAR, ""))
+    except ValueError:
+        return None
+
+
+class StartupTimer:
+    """Marca fases da inicialização e mostra quanto cada uma levou."""
+
+    def __init__(self, origin=None):
+        self.origin = origin or time.time()
+        self.marks = []
+        self._last = self.origin
+
+    def mark(self, name):
+        now = time.time()
+        self.marks.append((name, now - self._last))
+        self._last = now
+
+    def report(self, title):
+        lines = [f"Tempo de inicialização ({title}):"]
+        for name, seconds in self.marks:
+            lines.append(f"  {name:<24} {seconds * 1000:>8.1f} ms")
+        lines.append(f"  {'total':<24} {(self._last - self.origin) * 1000:>8.1f} ms")
+        return "\n".join(lines)
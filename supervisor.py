@@ -0,0 +1,333 @@
+# supervisor.py
+"""Supervisão dos processos ffmpeg em um único event loop (asyncio).
+
+Antes, cada encode prendia threads só para ler os pipes do ffmpeg e
+guardava o stderr inteiro na memória. Agora um loop asyncio, numa thread
+própria, lê o stderr e o `-progress` de todos os ffmpeg em andamento:
+
+- o log vai para um buffer circular de linhas (memória fixa, mesmo em
+  encodes longos ou com log muito verboso); numa falha, as últimas linhas
+  são as que aparecem no erro;
+- cada bloco do `-progress` é entregue a quem acompanha o encode, que só
+  pega o mais recente (nada se acumula se ele demorar);
+- um watchdog mata o ffmpeg que passar do tempo limite do trabalho ou que
+  ficar `stall_timeout` segundos sem avançar (pausado não conta).
+
+A orquestração de cada trabalho (probe, amostras, renomear a saída)
+continua nas threads do CompressionEngine. `TkBridge` leva os resultados
+dessas threads ao loop do Tk com `after`.
+"""
+import collections
+import sys
+import threading
+import time
+
+from governor import signal_kill
+from lazy_import import lazy_import
+
+# O asyncio só é carregado quando o primeiro ffmpeg sobe (abre a GUI mais rápido)
+asyncio = lazy_import("asyncio")
+
+# Linhas de log guardadas por processo e quantas aparecem numa falha
+STDERR_LINES = 200
+TAIL_LINES = 30
+PROGRESS_LINES = 64
+# Linhas maiores são cortadas (um log sem quebra de linha não cresce sem limite)
+MAX_LINE_BYTES = 4096
+WATCHDOG_INTERVAL = 1.0 # segundos
+# Sem avançar o out_time por este tempo, o ffmpeg é considerado travado
+DEFAULT_STALL_TIMEOUT = 300.0
+
+
+class RingBuffer:
+    """Últimas `maxlen` linhas (bytes) de um stream."""
+
+    def __init__(self, maxlen):
+        self.lines = collections.deque(maxlen=maxlen)
+        self.total = 0 # linhas recebidas, incluindo as descartadas
+
+    def append(self, line):
+        self.lines.append(line[:MAX_LINE_BYTES])
+        self.total += 1
+
+    def tail(self, count=None):
+        lines = list(self.lines)
+        if count is not None:
+            lines = lines[-count:]
+        if self.total > len(lines):
+            lines.insert(0, f"[... {self.total - len(lines)} linha(s) anteriores omitidas]\n".encode())
+        return b"".join(lines)
+
+
+class _LineProtocol:
+    """Protocolo (asyncio) de leitura que quebra o que chega de um pipe em linhas."""
+
+    def __init__(self, on_line, closed):
+        self.on_line = on_line
+        self.closed = closed
+        self.buffer = bytearray()
+
+    def connection_made(self, transport):
+        pass
+
+    def eof_received(self):
+        pass
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                break
+            self.on_line(bytes(self.buffer[:end + 1]))
+            del self.buffer[:end + 1]
+        if len(self.buffer) > MAX_LINE_BYTES:
+            self.on_line(bytes(self.buffer))
+            self.buffer.clear()
+
+    def connection_lost(self, exc):
+        if self.buffer:
+            self.on_line(bytes(self.buffer))
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+def _is_progress(line):
+    """Linha do -progress ('chave=valor'); o resto do stderr é log."""
+    key, sep, _ = line.strip().partition(b"=")
+    return bool(sep) and key.replace(b"_", b"").isalnum() and key.islower()
+
+
+class Supervision:
+    """Estado de um ffmpeg supervisionado.
+
+    `finished` (concurrent.futures.Future) termina quando os pipes fecham.
+    `reason` diz por que o watchdog matou o processo (None = não matou).
+
+    O supervisor nunca recolhe o processo (poll/wait): quem o espera é a
+    thread do trabalho, com `telemetry.wait_with_usage`, que mede o uso de
+    recursos. O fim do ffmpeg é visto pelo fechamento dos pipes.
+    """
+
+    def __init__(self, process, control=None, stall_timeout=None, on_progress_line=None,
+                 progress_on_stderr=False):
+        self.process = process
+        self.control = control
+        self.stall_timeout = stall_timeout
+        self.on_progress_line = on_progress_line
+        self.progress_on_stderr = progress_on_stderr
+        self.stderr = RingBuffer(STDERR_LINES)
+        self.progress = RingBuffer(PROGRESS_LINES)
+        self.reason = None
+        self.finished = None
+        self.closed = False # todos os pipes chegaram ao fim
+        self._out_time = None
+        self._last_advance = time.monotonic()
+
+    def tail(self, count=TAIL_LINES):
+        """Últimas linhas do log do ffmpeg (bytes)."""
+        return self.stderr.tail(count)
+
+    def wait(self):
+        """Espera os pipes fecharem (o processo terminou ou fechou a saída)."""
+        self.finished.result()
+
+    def stderr_line(self, line):
+        if self.progress_on_stderr and _is_progress(line):
+            self.progress_line(line)
+        else:
+            self.stderr.append(line)
+
+    def progress_line(self, line):
+        self.progress.append(line)
+        if line.startswith(b"out_time_us=") and line != self._out_time:
+            self._out_time = line
+            self._last_advance = time.monotonic()
+        if self.on_progress_line is not None:
+            self.on_progress_line(line)
+
+    def check(self, now):
+        """Mata o processo se o trabalho passou do prazo ou travou."""
+        # returncode só é lido: já recolhido por quem espera = não matar (o pid pode ter sido reusado)
+        if self.reason is not None or self.closed or self.process.returncode is not None:
+            return
+        if self.control is not None and self.control.paused:
+            self._last_advance = now # suspenso de propósito: não é travamento
+            return
+        if self.control is not None and self.control.expired(now):
+            self.stop("tempo limite do trabalho esgotado")
+        elif self.stall_timeout and now - self._last_advance > self.stall_timeout:
+            self.stop(f"ffmpeg sem progresso há {self.stall_timeout:.0f}s")
+
+    def stop(self, reason):
+        """Mata o processo pelo pid (sem Popen.kill, que faz poll e poderia recolhê-lo)."""
+        if self.closed or self.process.returncode is not None:
+            return
+        self.reason = reason
+        signal_kill(self.process)
+
+
+class FFmpegSupervisor:
+    """Um event loop (numa thread daemon) que acompanha todos os ffmpeg."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                thread = threading.Thread(target=self._run_loop, args=(ready,),
+                                          name="ffmpeg-supervisor", daemon=True)
+                thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run_loop(self, ready):
+        if sys.platform == "win32":
+            # O Proactor só lê pipes overlapped; os do Popen são lidos em threads
+            self._loop = asyncio.SelectorEventLoop()
+        else:
+            self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        self._loop.run_forever()
+
+    def watch(self, process, control=None, stall_timeout=None, on_progress_line=None):
+        """Passa a supervisionar um processo de `governor.spawn`.
+
+        O `-progress` é lido do stdout, se ele for um pipe, ou separado do
+        log no stderr. `on_progress_line(line)` roda na thread do loop.
+        """
+        supervision = Supervision(process, control, stall_timeout, on_progress_line,
+                                  progress_on_stderr=process.stdout is None)
+        loop = self._ensure_loop()
+        supervision.finished = asyncio.run_coroutine_threadsafe(self._supervise(supervision), loop)
+        return supervision
+
+    async def _supervise(self, supervision):
+        process = supervision.process
+        pipes = [(process.stderr, supervision.stderr_line)]
+        if process.stdout is not None:
+            pipes.append((process.stdout, supervision.progress_line))
+
+        watchdog = asyncio.ensure_future(self._watchdog(supervision))
+        try:
+            await asyncio.gather(*(self._read(pipe, on_line) for pipe, on_line in pipes))
+        finally:
+            supervision.closed = True
+            watchdog.cancel()
+
+    async def _read(self, pipe, on_line):
+        loop = asyncio.get_event_loop()
+        closed = loop.create_future()
+        if sys.platform == "win32":
+            threading.Thread(target=self._read_in_thread, args=(loop, pipe, on_line, closed),
+                             daemon=True).start()
+        else:
+            await loop.connect_read_pipe(lambda: _LineProtocol(on_line, closed), pipe)
+        await closed
+
+    @staticmethod
+    def _read_in_thread(loop, pipe, on_line, closed):
+        for line in iter(lambda: pipe.readline(MAX_LINE_BYTES), b""):
+            loop.call_soon_threadsafe(on_line, line)
+        loop.call_soon_threadsafe(closed.set_result, None)
+
+    async def _watchdog(self, supervision):
+        while True:
+            await asyncio.sleep(WATCHDOG_INTERVAL)
+            supervision.check(time.monotonic())
+
+
+class ProgressMailbox:
+    """Entrega blocos do `-progress` do loop para a thread que acompanha o encode.
+
+    Só o bloco mais recente fica guardado: se quem lê atrasar, os
+    intermediários são descartados em vez de acumular.
+    """
+
+    def __init__(self, parse):
+        self._parse = parse # linha -> snapshot pronto, ou None no meio de um bloco
+        self._cond = threading.Condition()
+        self._latest = None
+        self._closed = False
+
+    def feed(self, line):
+        snapshot = self._parse(line)
+        if snapshot is not None:
+            with self._cond:
+                self._latest = snapshot
+                self._cond.notify()
+
+    def close(self, _future=None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while self._latest is None and not self._closed:
+                    self._cond.wait()
+                latest, self._latest = self._latest, None
+                closed = self._closed
+            if latest is not None:
+                yield latest
+            elif closed:
+                return
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    """Supervisor compartilhado pelo processo (o loop só sobe no primeiro uso)."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None:
+            _supervisor = FFmpegSupervisor()
+        return _supervisor
+
+
+class TkBridge:
+    """Leva callbacks das threads de trabalho para o loop do Tk.
+
+    As threads só enfileiram; o loop do Tk esvazia a fila a cada
+    `interval_ms` com `after`, então só ele toca nos widgets. Em
+    `post_latest`, chamadas com a mesma chave se substituem (progresso:
+    vale o mais recente).
+    """
+
+    def __init__(self, widget, interval_ms=100):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._calls = collections.deque()
+        self._latest = {}
+        widget.after(interval_ms, self._drain)
+
+    def post(self, callback, *args):
+        with self._lock:
+            self._calls.append((callback, args))
+
+    def post_latest(self, key, callback, *args):
+        with self._lock:
+            self._latest[key] = (callback, args)
+
+    def _drain(self):
+        with self._lock:
+            # Progresso antes dos resultados: o último progresso de um trabalho não sobrescreve o fim dele
+            calls = list(self._latest.values()) + list(self._calls)
+            self._latest.clear()
+            self._calls.clear()
+        try:
+            for callback, args in calls:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"Erro ao atualizar a interface: {e}")
+        finally:
+            self.widget.after(self.interval_ms, self._drain)
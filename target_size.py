@@ -0,0 +1,217 @@
+# target_size.py
+"""Busca do CRF que faz a saída caber em um tamanho alvo.
+
+Em vez de repetir encodes inteiros, codifica alguns trechos curtos espalhados
+pela entrada, extrapola o tamanho do arquivo todo e procura o CRF: o
+tamanho cai mais ou menos pela metade a cada 6 pontos de CRF, então cada
+medição estima onde está o alvo e poucas bastam (MAX_SEARCH_STEPS). Só
+depois disso o encode completo roda, uma única vez. Com corte, as amostras
+e o orçamento são só do trecho.
+
+Em entradas curtas as amostras custariam tanto quanto o próprio encode:
+elas são puladas e quem chamou usa bitrate médio com teto (VBV).
+"""
+import math
+import dataclasses
+import os
+import tempfile
+
+from governor import run_quiet
+from lazy_import import lazy_import
+from media_probe import get_probe
+from preset_planner import DEFAULT_PRESET
+
+ffmpeg = lazy_import("ffmpeg")
+
+MIN_CRF = 18
+MAX_CRF = 51
+# Primeira medição da busca e quanto o tamanho cai por ponto de CRF (metade a cada 6)
+SEED_CRF = 28
+DEFAULT_SLOPE = math.log(2) / 6
+# Medições de CRF (fora a do CRF máximo, quando nenhuma coube)
+MAX_SEARCH_STEPS = 5
+
+SAMPLE_COUNT = 5
+SAMPLE_SECONDS = 4.0
+
+# Até este múltiplo de SAMPLE_COUNT * SAMPLE_SECONDS, amostrar não compensa
+SKIP_SAMPLES_FACTOR = 3
+
+# A previsão por amostras erra um pouco; mira abaixo do alvo
+SAFETY_MARGIN = 0.95
+# Overhead do contêiner mp4 (índices, cabeçalhos) sobre o tamanho dos streams
+CONTAINER_OVERHEAD = 0.01
+# Bitrate de áudio assumido quando o probe não informa
+FALLBACK_AUDIO_BITRATE = 128_000
+
+
+def audio_bytes(info):
+    """Bytes que o áudio copiado (c:a copy) vai ocupar na saída."""
+    audio_bit_rate = info.audio_bit_rate
+    if audio_bit_rate is None and info.audio_codec is None:
+        return 0
+    if audio_bit_rate is None and info.bit_rate and info.video_bit_rate:
+        audio_bit_rate = max(0, info.bit_rate - info.video_bit_rate)
+    return int((audio_bit_rate or FALLBACK_AUDIO_BITRATE) * info.duration / 8)
+
+
+def video_budget(info, target_mb):
+    """Bytes disponíveis para o vídeo, descontando áudio, contêiner e margem."""
+    total = target_mb * 1024 * 1024 * SAFETY_MARGIN
+    return int(total * (1 - CONTAINER_OVERHEAD)) - audio_bytes(info)
+
+
+def sample_windows(duration, count=SAMPLE_COUNT, seconds=SAMPLE_SECONDS):
+    """(início, duração) de trechos espalhados; entrada curta = arquivo inteiro."""
+    if duration <= count * seconds * 2:
+        return [(0.0, duration)]
+    return [(duration * (i + 0.5) / count - seconds / 2, seconds) for i in range(count)]
+
+
+class SizePredictor:
+    """Prevê o tamanho do vídeo inteiro para um CRF a partir das amostras."""
+
+    def __init__(self, video_path, duration, work_dir, preset=DEFAULT_PRESET, threads=None,
+                 priority=None, control=None, decimate=False, tune=None, start=0.0):
+        self.video_path = video_path
+        self.duration = duration
+        self.work_dir = work_dir
+        self.preset = preset
+        self.threads = threads
+        self.priority = priority
+        self.control = control # governor.JobControl do trabalho (cancelar/pausar)
+        # Ajustes de gravação de tela (content_analysis): as amostras usam os mesmos
+        self.decimate = decimate
+        self.tune = tune
+        # `start` desloca as amostras para dentro do trecho (duration = duração do trecho)
+        self.windows = [(start + offset, seconds) for offset, seconds in sample_windows(duration)]
+        self._cache = {}
+
+    def encode_sample(self, crf, index, start, seconds):
+        path = os.path.join(self.work_dir, f"sample_{crf}_{index}.mkv")
+        output_params = {"crf": crf, "preset": self.preset, "an": None}
+        if self.threads:
+            output_params["threads"] = self.threads
+        if self.tune:
+            output_params["tune"] = self.tune
+        video = ffmpeg.input(self.video_path, ss=start, t=seconds).video
+        if self.decimate:
+            video = video.filter("mpdecimate")
+            output_params["fps_mode"] = "vfr"
+        out = video.output(path, **output_params)
+        run_quiet(out, self.priority, self.control)
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+
+    def predict(self, crf):
+        """Bytes de vídeo previstos para o arquivo inteiro nesse CRF."""
+        if crf not in self._cache:
+            sampled_bytes = sum(self.encode_sample(crf, i, start, seconds)
+                                for i, (start, seconds) in enumerate(self.windows))
+            sampled_seconds = sum(seconds for _, seconds in self.windows)
+            self._cache[crf] = int(sampled_bytes / sampled_seconds * self.duration)
+        return self._cache[crf]
+
+
+def should_sample(duration):
+    """Amostrar só compensa em entradas bem mais longas que as amostras."""
+    return duration > SKIP_SAMPLES_FACTOR * SAMPLE_COUNT * SAMPLE_SECONDS
+
+
+def estimate_crf(sizes, budget):
+    """CRF em que o tamanho previsto deve encostar no orçamento.
+
+    `sizes` ({crf: bytes}) já medidos; o log do tamanho é tratado como
+    linear no CRF, com a inclinação das duas medições mais próximas do
+    orçamento (ou DEFAULT_SLOPE, com uma só). Arredonda para cima: melhor
+    caber do que passar.
+    """
+    logs = {crf: math.log(max(size, 1) / budget) for crf, size in sizes.items()}
+    nearest = sorted(logs, key=lambda crf: abs(logs[crf]))[:2]
+    slope = DEFAULT_SLOPE
+    if len(nearest) == 2:
+        low, high = sorted(nearest)
+        measured = (logs[low] - logs[high]) / (high - low)
+        if measured > 0:
+            slope = measured
+    crf = nearest[0]
+    estimate = crf + logs[crf] / slope
+    return max(MIN_CRF, min(MAX_CRF, math.ceil(estimate - 1e-9)))
+
+
+def next_crf(sizes, budget):
+    """Próximo CRF a medir, ou None se a busca já tem a resposta.
+
+    Nunca repete uma medição: acima do menor CRF que já cabe não há o que
+    ganhar, e logo abaixo de um que não coube não há o que medir.
+    """
+    crf = estimate_crf(sizes, budget)
+    fitting = [c for c in sizes if sizes[c] <= budget]
+    too_big = [c for c in sizes if sizes[c] > budget]
+    if fitting and crf >= min(fitting):
+        crf = min(fitting) - 1
+    if too_big and crf <= max(too_big):
+        crf = max(too_big) + 1
+    if crf < MIN_CRF or crf > MAX_CRF or crf in sizes:
+        return None
+    return crf
+
+
+def search_crf(predict, budget, steps=MAX_SEARCH_STEPS):
+    """Menor CRF cuja previsão (`predict(crf)` -> bytes) cabe no orçamento.
+
+    Mede no máximo `steps` CRFs, mais o CRF máximo (e uma estimativa com
+    ele de limite) se nenhum couber. Devolve (crf, bytes previstos); crf
+    None se nem o CRF máximo couber.
+    """
+    sizes = {}
+    crf = SEED_CRF
+    for _ in range(steps):
+        sizes[crf] = predict(crf)
+        crf = next_crf(sizes, budget)
+        if crf is None:
+            break
+
+    if not any(size <= budget for size in sizes.values()):
+        sizes[MAX_CRF] = predict(MAX_CRF)
+        if sizes[MAX_CRF] > budget:
+            return None, sizes[MAX_CRF]
+        crf = next_crf(sizes, budget)
+        if crf is not None:
+            sizes[crf] = predict(crf)
+
+    best = min(crf for crf in sizes if sizes[crf] <= budget)
+    return best, sizes[best]
+
+
+def find_crf_for_size(video_path, target_mb, preset=DEFAULT_PRESET, threads=None, priority=None, control=None,
+                      decimate=False, tune=None, start=0.0, duration=None):
+    """Menor CRF (melhor qualidade) cuja previsão cabe no alvo.
+
+    `start` e `duration` limitam a busca a um trecho (padrão: a entrada
+    inteira, ou do `start` até o fim).
+
+    Devolve (crf, bytes_de_vídeo_previstos, orçamento). Se nem o CRF máximo
+    couber, o crf volta como None e quem chamou decide o plano B; numa
+    entrada curta demais para amostrar, crf e previsão voltam None.
+    """
+    info = get_probe().probe(video_path)
+    if duration is None and info.duration:
+        duration = max(0.0, info.duration - start)
+    if not duration:
+        raise ValueError("Duração desconhecida: não dá para prever o tamanho.")
+    info = dataclasses.replace(info, duration=duration) # o áudio copiado também é só o do trecho
+
+    budget = video_budget(info, target_mb)
+    if budget <= 0:
+        raise ValueError(f"{target_mb} MB não comporta nem o áudio da entrada.")
+
+    if not should_sample(duration):
+        return None, None, budget
+
+    with tempfile.TemporaryDirectory(prefix="target_size_") as work_dir:
+        predictor = SizePredictor(video_path, duration, work_dir, preset, threads,
+                                  priority, control, decimate, tune, start)
+        crf, predicted = search_crf(predictor.predict, budget)
+        return crf, predicted, budget
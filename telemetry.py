@@ -0,0 +1,320 @@
+# telemetry.py
+"""Telemetria por trabalho: tempo, CPU, memória, E/S e velocidade dos ffmpeg.
+
+Cada processo ffmpeg de um trabalho é recolhido com `os.wait4`, que devolve
+o uso de recursos só daquele filho (tempo de CPU de usuário e de sistema,
+pico de memória residente e blocos lidos/escritos em disco). O JobControl
+do trabalho soma esses números, incluindo as amostras do Tamanho Alvo e os
+segmentos do modo em pedaços. No fim, o motor grava um registro por
+trabalho:
+
+- em um log JSONL com rotação (uma linha por trabalho), ao lado dos caches;
+- opcionalmente, em um arquivo .prom para o textfile collector do
+  node_exporter (contadores acumulados desde que o processo começou).
+
+No Windows não há `wait4`: CPU, memória e disco ficam em branco (None).
+"""
+import dataclasses
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import socket
+import sys
+import threading
+import time
+
+from media_probe import default_cache_dir
+
+DEFAULT_LOG_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_BACKUPS = 5
+
+# Janela mínima para medir fps/velocidade instantâneos entre duas atualizações
+RATE_WINDOW = 2.0
+
+# ru_maxrss vem em KB no Linux e em bytes no macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+# ru_inblock/ru_oublock contam blocos de 512 bytes
+_BLOCK_SIZE = 512
+
+
+def default_log_path():
+    return os.path.join(default_cache_dir(), "telemetry", "jobs.jsonl")
+
+
+@dataclasses.dataclass
+class ProcessUsage:
+    """Recursos gastos por um ou mais processos ffmpeg (None = não medido)."""
+    cpu_user: float = None
+    cpu_system: float = None
+    peak_rss: int = None    # bytes, do maior processo
+    disk_read: int = None   # bytes lidos do disco (leituras do cache de páginas não contam)
+    disk_write: int = None  # bytes escritos
+    processes: int = 0
+
+    def add(self, other):
+        """Soma outro processo (o pico de memória é o maior entre eles)."""
+        def total(a, b):
+            return b if a is None else a if b is None else a + b
+        self.cpu_user = total(self.cpu_user, other.cpu_user)
+        self.cpu_system = total(self.cpu_system, other.cpu_system)
+        self.peak_rss = max(self.peak_rss or 0, other.peak_rss or 0) or None
+        self.disk_read = total(self.disk_read, other.disk_read)
+        self.disk_write = total(self.disk_write, other.disk_write)
+        self.processes += other.processes
+
+
+def wait_with_usage(process):
+    """process.wait() que também devolve o ProcessUsage do processo."""
+    if not hasattr(os, "wait4") or process.returncode is not None:
+        process.wait()
+        return ProcessUsage(processes=1)
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Só quem espera recolhe o processo; se outro o recolheu, o código de saída se perdeu
+        print(f"ffmpeg (pid {process.pid}) recolhido fora de wait_with_usage: uso de recursos não medido")
+        if process.returncode is None:
+            raise ChildProcessError(f"Código de saída do ffmpeg (pid {process.pid}) desconhecido")
+        return ProcessUsage(processes=1)
+    # Mesmo código que o Popen daria (negativo = morto por sinal)
+    process.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+    return ProcessUsage(
+        cpu_user=rusage.ru_utime,
+        cpu_system=rusage.ru_stime,
+        peak_rss=rusage.ru_maxrss * _RSS_UNIT,
+        disk_read=rusage.ru_inblock * _BLOCK_SIZE,
+        disk_write=rusage.ru_oublock * _BLOCK_SIZE,
+        processes=1,
+    )
+
+
+class JobUsage:
+    """Acumula os processos de um trabalho: uso de recursos e linhas de comando."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.usage = ProcessUsage()
+        self.commands = []
+
+    def add_command(self, args):
+        with self._lock:
+            self.commands.append(list(args))
+
+    def add_usage(self, usage):
+        with self._lock:
+            self.usage.add(usage)
+
+
+class RateStats:
+    """fps e velocidade de um trabalho a partir das atualizações de Progress.
+
+    Média = total / tempo desde a primeira atualização (as amostras do Tamanho
+    Alvo e o probe não contam); mínimo = pior janela de RATE_WINDOW segundos.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.out_time = 0.0
+        self.min_fps = None
+        self.min_speed = None
+        self.first = None
+        self.last = None
+        self._window = None
+
+    def observe(self, progress):
+        now = time.monotonic()
+        self.frames = max(self.frames, progress.frame)
+        self.out_time = max(self.out_time, progress.out_time)
+        if self._window is None:
+            self.first = now
+            self._window = (now, self.frames, self.out_time)
+        self.last = now
+        began, frames, out_time = self._window
+        elapsed = now - began
+        if elapsed >= RATE_WINDOW and not progress.done:
+            fps = (self.frames - frames) / elapsed
+            speed = (self.out_time - out_time) / elapsed
+            self.min_fps = fps if self.min_fps is None else min(self.min_fps, fps)
+            self.min_speed = speed if self.min_speed is None else min(self.min_speed, speed)
+            self._window = (now, self.frames, self.out_time)
+
+    def summary(self, seconds):
+        """`seconds` (tempo do trabalho) vale quando o encode foi curto demais para medir."""
+        if self.first is not None and self.last - self.first >= RATE_WINDOW:
+            seconds = self.last - self.first
+        return {
+            "frames": self.frames,
+            "fps_avg": round(self.frames / seconds, 2) if seconds > 0 and self.frames else None,
+            "fps_min": None if self.min_fps is None else round(self.min_fps, 2),
+            "speed_avg": round(self.out_time / seconds, 3) if seconds > 0 and self.out_time else None,
+            "speed_min": None if self.min_speed is None else round(self.min_speed, 3),
+        }
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if os.path.isfile(path) else None
+    except (OSError, TypeError):
+        return None
+
+
+def _job_params(job):
+    """Campos do trabalho pedido (sem o JobControl), prontos para JSON."""
+    return {f.name: getattr(job, f.name) for f in dataclasses.fields(job) if f.name != "control"}
+
+
+def _json_default(value):
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return str(value)
+
+
+def build_record(job, status, seconds, rates, error=None):
+    """Registro de telemetria de um trabalho concluído (um dict pronto para JSON)."""
+    job_usage = job.control.usage
+    usage = job_usage.usage
+    return {
+        "timestamp": datetime.datetime.now().astimezone().isoformat(timespec="seconds"),
+        "host": socket.gethostname(),
+        "input": job.video_path,
+        "output": job.save_path,
+        "status": status,
+        "error": error,
+        "wall_seconds": round(seconds, 3),
+        "cpu_user_seconds": usage.cpu_user,
+        "cpu_system_seconds": usage.cpu_system,
+        "peak_rss_bytes": usage.peak_rss,
+        "disk_read_bytes": usage.disk_read,
+        "disk_write_bytes": usage.disk_write,
+        "processes": usage.processes,
+        **rates.summary(seconds),
+        "input_size": _file_size(job.video_path),
+        "output_size": _file_size(job.save_path),
+        "params": _job_params(job),
+        "commands": job_usage.commands,
+    }
+
+
+class PrometheusTextfile:
+    """Métricas acumuladas para o textfile collector do node_exporter.
+
+    O arquivo é reescrito inteiro (nome temporário + rename) a cada trabalho,
+    como o collector pede. Os contadores recomeçam quando o processo reinicia.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self.totals = {key: 0.0 for key in (
+            "wall_seconds", "cpu_user_seconds", "cpu_system_seconds", "disk_read_bytes",
+            "disk_write_bytes", "input_size", "output_size", "frames",
+        )}
+        self.last = {}
+
+    def update(self, record):
+        with self._lock:
+            self.jobs[record["status"]] = self.jobs.get(record["status"], 0) + 1
+            for key in self.totals:
+                self.totals[key] += record.get(key) or 0
+            self.last = record
+            self._write()
+
+    def _write(self):
+        t = self.totals
+        lines = [
+            "# HELP video_compressor_jobs_total Trabalhos concluídos, por status.",
+            "# TYPE video_compressor_jobs_total counter",
+            *(f'video_compressor_jobs_total{{status="{status}"}} {count}'
+              for status, count in sorted(self.jobs.items())),
+            "# HELP video_compressor_job_seconds_total Tempo de parede somado dos trabalhos.",
+            "# TYPE video_compressor_job_seconds_total counter",
+            f"video_compressor_job_seconds_total {t['wall_seconds']:.3f}",
+            "# HELP video_compressor_cpu_seconds_total Tempo de CPU dos ffmpeg.",
+            "# TYPE video_compressor_cpu_seconds_total counter",
+            f'video_compressor_cpu_seconds_total{{mode="user"}} {t["cpu_user_seconds"]:.3f}',
+            f'video_compressor_cpu_seconds_total{{mode="system"}} {t["cpu_system_seconds"]:.3f}',
+            "# HELP video_compressor_disk_bytes_total Bytes lidos/escritos em disco pelos ffmpeg.",
+            "# TYPE video_compressor_disk_bytes_total counter",
+            f'video_compressor_disk_bytes_total{{direction="read"}} {t["disk_read_bytes"]:.0f}',
+            f'video_compressor_disk_bytes_total{{direction="write"}} {t["disk_write_bytes"]:.0f}',
+            "# HELP video_compressor_file_bytes_total Tamanho somado das entradas e saídas.",
+            "# TYPE video_compressor_file_bytes_total counter",
+            f'video_compressor_file_bytes_total{{file="input"}} {t["input_size"]:.0f}',
+            f'video_compressor_file_bytes_total{{file="output"}} {t["output_size"]:.0f}',
+            "# HELP video_compressor_frames_total Quadros codificados.",
+            "# TYPE video_compressor_frames_total counter",
+            f"video_compressor_frames_total {t['frames']:.0f}",
+        ]
+        last = self.last
+        gauges = (
+            ("last_job_fps", "fps do último trabalho.", {"stat": "avg"}, last.get("fps_avg")),
+            ("last_job_fps", None, {"stat": "min"}, last.get("fps_min")),
+            ("last_job_speed", "Velocidade (x tempo real) do último trabalho.", {"stat": "avg"}, last.get("speed_avg")),
+            ("last_job_speed", None, {"stat": "min"}, last.get("speed_min")),
+            ("last_job_peak_rss_bytes", "Pico de memória do maior ffmpeg do último trabalho.", {}, last.get("peak_rss_bytes")),
+            ("last_job_timestamp_seconds", "Quando o último trabalho terminou.", {}, time.time()),
+        )
+        for name, help_text, labels, value in gauges:
+            if help_text:
+                lines += [f"# HELP video_compressor_{name} {help_text}",
+                          f"# TYPE video_compressor_{name} gauge"]
+            if value is not None:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"video_compressor_{name}{{{label_text}}} {value}" if label_text
+                             else f"video_compressor_{name} {value}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
+
+
+class Telemetry:
+    """Destinos dos registros: log JSONL com rotação e, se pedido, textfile do Prometheus."""
+
+    def __init__(self, log_path=None, textfile=None, max_bytes=DEFAULT_LOG_BYTES,
+                 backups=DEFAULT_LOG_BACKUPS):
+        self.log_path = log_path or default_log_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+        self._logger = logging.getLogger(f"video_compressor.telemetry.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        handler = logging.handlers.RotatingFileHandler(
+            self.log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(handler)
+        self.textfile = PrometheusTextfile(textfile) if textfile else None
+
+    def record(self, job, status, seconds, rates, error=None):
+        """Grava o registro de um trabalho. Erros de gravação só são logados."""
+        try:
+            record = build_record(job, status, seconds, rates, error)
+            self._logger.info(json.dumps(record, ensure_ascii=False, default=_json_default))
+            if self.textfile is not None:
+                self.textfile.update(record)
+            return record
+        except Exception as e:
+            print(f"Erro ao gravar a telemetria: {e}")
+            return None
+
+    def close(self):
+        for handler in list(self._logger.handlers):
+            handler.close()
+            self._logger.removeHandler(handler)
+
+
+_default_telemetry = None
+_default_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Instância compartilhada (log no local padrão, sem textfile)."""
+    global _default_telemetry
+    with _default_telemetry_lock:
+        if _default_telemetry is None:
+            _default_telemetry = Telemetry()
+        return _default_telemetry
@@ -0,0 +1,40 @@
+# tests/conftest.py
+"""Configuração comum dos testes: módulos da raiz no path e clipes sintéticos."""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+                                     reason="ffmpeg/ffprobe não encontrados no PATH")
+
+
+def make_clip(path, seconds=6, fps=24, gop=24, start=0.0, audio=True):
+    """Gera um clipe H.264 (testsrc2) com um keyframe a cada `gop` quadros.
+
+    `start` desloca os tempos (start_time diferente de zero, como em MPEG-TS).
+    """
+    args = ["ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size=320x180:rate={fps}:duration={seconds}"]
+    if audio:
+        args += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}", "-c:a", "aac"]
+    args += ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+             "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0"]
+    if start:
+        args += ["-output_ts_offset", str(start)]
+    subprocess.run(args + [path], check=True)
+    return path
+
+
+@pytest.fixture
+def isolated_cache(tmp_path, monkeypatch):
+    """Caches (probe, saídas, telemetria) numa pasta temporária do teste."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "cache"))
+    import media_probe
+    monkeypatch.setattr(media_probe, "_default_probe", None) # o singleton abre o banco da nova pasta
+    return tmp_path / "cache"
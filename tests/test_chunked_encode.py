@@ -0,0 +1,47 @@
+# tests/test_chunked_encode.py
+import subprocess
+
+import pytest
+
+from chunked_encode import frame_count, run_chunked_job, split_video, verify_output
+from compressor_engine import CompressionJob
+from conftest import make_clip, requires_ffmpeg
+from media_probe import probe_keyframes
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("start", [0.0, 1.5])
+def test_split_cuts_exactly_at_the_planned_keyframes(tmp_path, start):
+    # Com áudio, o vídeo começa um pouco depois do start_time (atraso do AAC)
+    source = make_clip(str(tmp_path / "clip.mkv"), seconds=6, fps=24, gop=24, start=start)
+    keyframes = probe_keyframes(source)
+    job = CompressionJob(source, str(tmp_path / "out.mp4"), "CRF", 23)
+    parts = split_video(job, [keyframes[2], keyframes[4]], str(tmp_path), keyframes[0])
+    assert [frame_count(path) for path in parts] == [48, 48, 48]
+
+
+@requires_ffmpeg
+def test_verify_output_rejects_a_repeated_gop(tmp_path):
+    # Um GOP de 0,25s repetido na emenda: a duração fica dentro da tolerância
+    source = make_clip(str(tmp_path / "clip.mkv"), seconds=6, fps=24, gop=6, audio=False)
+    keyframes = probe_keyframes(source)
+    job = CompressionJob(source, str(tmp_path / "out.mp4"), "CRF", 23)
+    first, second = split_video(job, [keyframes[1]], str(tmp_path), keyframes[0])
+    list_path = tmp_path / "concat.txt"
+    list_path.write_text("".join(f"file '{path}'\n" for path in (first, first, second)))
+    joined = str(tmp_path / "joined.mkv")
+    subprocess.run(["ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", str(list_path),
+                    "-c", "copy", joined], check=True)
+
+    verify_output(joined, 6.0) # só a duração: passa
+    with pytest.raises(RuntimeError, match="quadros"):
+        verify_output(joined, 6.0, frame_count(source))
+
+
+@requires_ffmpeg
+def test_chunked_output_keeps_every_frame(tmp_path, isolated_cache):
+    source = make_clip(str(tmp_path / "clip.mkv"), seconds=24, fps=24, gop=48, start=1.5)
+    job = CompressionJob(source, str(tmp_path / "out.mp4"), "CRF", 30, preset="ultrafast")
+    result = run_chunked_job(job, segment_count=2)
+    assert result.success, result.error
+    assert frame_count(job.save_path) == frame_count(source) == 24 * 24
@@ -0,0 +1,24 @@
+# tests/test_compressor_engine.py
+import pytest
+
+import compressor_engine
+from compressor_engine import CompressionJob, run_job
+
+
+@pytest.mark.parametrize("paused", [False, True])
+def test_paused_encodes_do_not_feed_the_speed_measurements(tmp_path, monkeypatch, paused):
+    recorded = []
+    monkeypatch.setattr(compressor_engine, "record_throughput",
+                        lambda job, seconds: recorded.append(seconds))
+
+    def fake_encode(job, encode_job, output_path, on_progress=None):
+        if paused:
+            job.control.pause()
+            job.control.resume()
+        with open(output_path, "wb") as f:
+            f.write(b"video")
+
+    monkeypatch.setattr(compressor_engine, "encode_once", fake_encode)
+    job = CompressionJob(str(tmp_path / "in.mp4"), str(tmp_path / "out.mp4"), "CRF", 26)
+    assert run_job(job, encode_job=job).success
+    assert len(recorded) == (0 if paused else 1)
@@ -0,0 +1,166 @@
+# tests/test_encode_farm.py
+import threading
+import time
+import urllib.error
+
+import pytest
+
+import encode_farm
+from compressor_engine import CompressionJob, JobResult
+from encode_farm import MAX_ATTEMPTS, FarmClient, FarmCoordinator, FarmWorker, serve
+
+
+def fake_encode(job, on_progress=None):
+    """Runner sem ffmpeg: a "saída" é a entrada em maiúsculas."""
+    with open(job.video_path, "rb") as src, open(job.save_path, "wb") as dst:
+        dst.write(src.read().upper())
+    return JobResult(job, True)
+
+
+class BrokenUploadClient(FarmClient):
+    def upload(self, task_id, lease, path):
+        raise OSError("rede caiu")
+
+
+@pytest.fixture
+def farm(tmp_path, isolated_cache, monkeypatch):
+    """Coordenador em 127.0.0.1 (porta livre) com timeouts curtos; devolve (coordenador, url)."""
+    monkeypatch.setattr(encode_farm, "HEARTBEAT_INTERVAL", 0.2)
+    monkeypatch.setattr(encode_farm, "LEASE_POLL", 0.1)
+    monkeypatch.setattr(encode_farm, "POLL_INTERVAL", 0.1)
+    coordinator = FarmCoordinator(worker_timeout=1.0, input_roots=[str(tmp_path)])
+    server = serve(coordinator, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    workers = []
+    yield coordinator, f"http://127.0.0.1:{server.server_address[1]}", workers
+    for worker in workers:
+        worker.stop()
+    server.shutdown()
+    server.server_close()
+    coordinator.shutdown()
+
+
+def start_workers(url, workers, count=2, client_class=FarmClient):
+    for i in range(count):
+        worker = FarmWorker(client_class(url), capacity=1, name=f"w{i}", runner=fake_encode)
+        threading.Thread(target=worker.run, daemon=True).start()
+        workers.append(worker)
+
+
+def submit(tmp_path, url, name):
+    source = tmp_path / f"{name}.mp4"
+    source.write_bytes(f"video {name}".encode())
+    job = CompressionJob(str(source), str(tmp_path / f"{name}_out.mp4"), "CRF", 26)
+    return job, FarmClient(url).submit(job)
+
+
+def wait_status(url, job_id, timeout=20.0):
+    client = FarmClient(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.job_status(job_id)
+        if status["status"] != encode_farm.STATUS_RUNNING:
+            return status
+        time.sleep(0.05)
+    raise AssertionError("o trabalho não terminou")
+
+
+def wait_task(coordinator, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with coordinator._lock:
+            if coordinator._pending:
+                return
+        time.sleep(0.02)
+    raise AssertionError("nenhuma tarefa na fila")
+
+
+def test_workers_lease_and_deliver_jobs(tmp_path, farm):
+    coordinator, url, workers = farm
+    start_workers(url, workers)
+    jobs = [submit(tmp_path, url, f"clip{i}") for i in range(4)]
+    for job, job_id in jobs:
+        assert wait_status(url, job_id)["status"] == "ok"
+        with open(job.video_path, "rb") as src, open(job.save_path, "rb") as out:
+            assert out.read() == src.read().upper()
+    assert len(coordinator.status()["workers"]) == 2
+
+
+def test_silent_worker_loses_its_task(tmp_path, farm):
+    coordinator, url, workers = farm
+    job, job_id = submit(tmp_path, url, "clip")
+    wait_task(coordinator)
+
+    # Um worker que pega a tarefa e some (sem heartbeats)
+    client = FarmClient(url)
+    silent = client.register("calado", 1, False)
+    task = client.lease(silent)
+    assert task["kind"] == encode_farm.TASK_JOB
+
+    start_workers(url, workers)
+    assert wait_status(url, job_id)["status"] == "ok"
+    with open(job.save_path, "rb") as f:
+        assert f.read() == b"VIDEO CLIP"
+
+    # O envio atrasado do worker calado é recusado e não toca a saída
+    late = tmp_path / "late.mp4"
+    late.write_bytes(b"lixo")
+    with pytest.raises(urllib.error.HTTPError) as error:
+        client.upload(task["id"], task["lease"], str(late))
+    assert error.value.code == 409
+    with open(job.save_path, "rb") as f:
+        assert f.read() == b"VIDEO CLIP"
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")] # nada de temporários
+
+
+def test_upload_finished_after_the_lease_moved_is_discarded(tmp_path, farm):
+    coordinator, url, workers = farm
+    job, job_id = submit(tmp_path, url, "clip")
+    wait_task(coordinator)
+    client = FarmClient(url)
+    task = client.lease(client.register("lento", 1, False))
+    upload = tmp_path / ".upload.part.mp4"
+    upload.write_bytes(b"atrasado")
+
+    # O worker some no meio do envio: a tarefa volta para a fila antes do fim
+    with coordinator._lock:
+        leased = coordinator._tasks[task["id"]]
+        lease_path = leased.lease_path
+        coordinator._requeue(leased, "teste")
+    with pytest.raises(encode_farm.StaleLease):
+        coordinator.accept_output(task["id"], task["lease"], str(upload))
+    assert not (tmp_path / lease_path).exists()
+    coordinator.cancel_job(job_id)
+
+
+def test_task_fails_after_max_attempts(tmp_path, farm):
+    coordinator, url, workers = farm
+    start_workers(url, workers, client_class=BrokenUploadClient)
+    job, job_id = submit(tmp_path, url, "clip")
+    status = wait_status(url, job_id)
+    assert status["status"] == "falhou"
+    assert f"{MAX_ATTEMPTS} tentativas" in status["error"]
+    assert not (tmp_path / "clip_out.mp4").exists()
+
+
+def test_worker_backs_off_on_server_errors(monkeypatch):
+    calls = []
+
+    class FlakyClient(FarmClient):
+        def register(self, name, capacity, shared):
+            return "w"
+
+        def heartbeat(self, worker_id, progress):
+            return {"cancel": []}
+
+        def lease(self, worker_id):
+            calls.append(worker_id)
+            code = 500 if len(calls) < 3 else 403
+            raise urllib.error.HTTPError(self.url, code, "erro", {}, None)
+
+    monkeypatch.setattr(encode_farm, "LEASE_POLL", 0.01)
+    worker = FarmWorker(FlakyClient("http://127.0.0.1:9"), capacity=1, runner=fake_encode)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        worker.run() # 500 espera e tenta de novo; 403 encerra
+    assert error.value.code == 403 and len(calls) == 3
+    worker.stop()
@@ -0,0 +1,39 @@
+# tests/test_media_probe.py
+import pytest
+
+from conftest import make_clip, requires_ffmpeg
+from media_probe import MediaProbe, probe_keyframes
+
+
+@requires_ffmpeg
+@pytest.mark.parametrize("start", [0.0, 1.5])
+def test_keyframes_are_relative_to_start_time(tmp_path, start):
+    # MKV com start_time diferente de zero (como MPEG-TS ou MP4 com edit list)
+    path = make_clip(str(tmp_path / "clip.mkv"), seconds=6, fps=24, gop=24, start=start, audio=False)
+    keyframes = probe_keyframes(path)
+    assert keyframes == pytest.approx([0.0, 1.0, 2.0, 3.0, 4.0, 5.0], abs=0.002)
+
+
+@requires_ffmpeg
+def test_cached_keyframes_from_older_versions_are_rebuilt(tmp_path):
+    path = make_clip(str(tmp_path / "clip.mkv"), seconds=3, fps=24, gop=24, start=1.5, audio=False)
+    probe = MediaProbe(str(tmp_path / "probe.sqlite3"))
+    stat = probe._stat(path)
+    probe._save(path, stat, "keyframes", [1.5, 2.5, 3.5]) # formato antigo, com o deslocamento
+    assert probe.keyframes(path) == pytest.approx([0.0, 1.0, 2.0], abs=0.002)
+    assert probe.keyframes(path) == pytest.approx([0.0, 1.0, 2.0], abs=0.002) # agora do cache
+
+
+def test_keyframes_request_the_format_start_time(monkeypatch):
+    # Algumas versões do ffprobe só devolvem as seções pedidas em -show_entries
+    import media_probe
+
+    def fake_probe(path, **kwargs):
+        info = {"packets": [{"pts_time": "1.500000", "flags": "K__"}, {"pts_time": "1.541667", "flags": "___"},
+                            {"pts_time": "2.500000", "flags": "K__"}]}
+        if "format=start_time" in kwargs.get("show_entries", ""):
+            info["format"] = {"start_time": "1.500000"}
+        return info
+
+    monkeypatch.setattr(media_probe.ffmpeg, "probe", fake_probe)
+    assert probe_keyframes("clip.ts") == pytest.approx([0.0, 1.0])
@@ -0,0 +1,53 @@
+# tests/test_output_cache.py
+import os
+
+from chunked_encode import encode_segment, frame_count, run_chunked_job
+from compressor_engine import CompressionJob
+from conftest import make_clip, requires_ffmpeg
+from output_cache import OutputCache
+
+
+def test_store_copies_instead_of_linking(tmp_path, isolated_cache):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"entrada")
+    output = tmp_path / "out.mp4"
+    output.write_bytes(b"saida")
+    cache = OutputCache(str(tmp_path / "outputs"))
+    cache.store("k", str(output))
+
+    entry = tmp_path / "outputs" / "k.mp4"
+    assert not os.path.samefile(entry, output)
+    with open(output, "r+b") as f: # edição no lugar da saída do usuário
+        f.write(b"XX")
+    assert entry.read_bytes() == b"saida"
+
+
+@requires_ffmpeg
+def test_cache_stores_the_file_a_chunked_resume_wrote(tmp_path, isolated_cache):
+    source = make_clip(str(tmp_path / "clip.mkv"), seconds=24, fps=24, gop=48)
+    cache = OutputCache(str(tmp_path / "outputs"))
+    # min_speed sem preset: o cache resolve o preset e roda uma cópia do trabalho
+    first = CompressionJob(source, str(tmp_path / "out.mp4"), "CRF", 30, min_speed=0.01)
+
+    def failing_encode(segment_job, source_path, target_path, on_progress=None):
+        if source_path.endswith("source_0001.mkv"):
+            raise RuntimeError("queda simulada")
+        encode_segment(segment_job, source_path, target_path, on_progress)
+
+    result = cache.run(first, lambda job, report: run_chunked_job(job, report, segment_count=2,
+                                                                   encode=failing_encode))
+    assert not result.success
+
+    # A nova tentativa pede outro nome; a retomada volta para o da primeira
+    second = CompressionJob(source, str(tmp_path / "out (1).mp4"), "CRF", 30, min_speed=0.01)
+    result = cache.run(second, lambda job, report: run_chunked_job(job, report, segment_count=2))
+    assert result.success, result.error
+    assert result.job is second and second.save_path == first.save_path
+    assert frame_count(second.save_path) == 24 * 24
+
+    # O cache guardou essa saída: um terceiro pedido a reaproveita
+    third = CompressionJob(source, str(tmp_path / "again.mp4"), "CRF", 30, min_speed=0.01)
+    result = cache.run(third, lambda job, report: run_chunked_job(job, report, segment_count=2))
+    assert result.reused
+    with open(third.save_path, "rb") as a, open(first.save_path, "rb") as b:
+        assert a.read() == b.read()
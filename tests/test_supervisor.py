@@ -0,0 +1,45 @@
+# tests/test_supervisor.py
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+from supervisor import Supervision
+
+posix_only = pytest.mark.skipif(sys.platform == "win32", reason="usa os.waitpid")
+
+
+@posix_only
+@pytest.mark.parametrize("suspended", [False, True])
+def test_stop_kills_without_reaping(monkeypatch, suspended):
+    process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    if suspended:
+        os.kill(process.pid, signal.SIGSTOP) # pausado: precisa do SIGCONT para morrer
+    supervision = Supervision(process)
+
+    def no_popen_calls(*args, **kwargs):
+        raise AssertionError("o supervisor não pode chamar poll/wait/kill do Popen")
+    for name in ("poll", "wait", "kill", "terminate", "send_signal"):
+        monkeypatch.setattr(process, name, no_popen_calls)
+    supervision.stop("teste")
+    monkeypatch.undo()
+
+    # Quem recolhe é a thread do trabalho, não o supervisor
+    assert process.returncode is None
+    pid, status = os.waitpid(process.pid, 0)
+    assert pid == process.pid
+    assert os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGKILL
+    assert supervision.reason == "teste"
+
+
+@posix_only
+def test_stop_leaves_a_reaped_process_alone(monkeypatch):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    kills = []
+    monkeypatch.setattr(os, "kill", lambda *args: kills.append(args))
+    supervision = Supervision(process)
+    supervision.stop("teste")
+    assert kills == [] and supervision.reason is None
@@ -0,0 +1,54 @@
+# tests/test_target_size.py
+import math
+import os
+
+import pytest
+
+from compressor_engine import CompressionJob, run_job
+from conftest import make_clip, requires_ffmpeg
+from target_size import MAX_CRF, MAX_SEARCH_STEPS, MIN_CRF, search_crf
+
+
+def x264_like_sizes(bytes_at_18, halving_crfs):
+    """Tamanho previsto por CRF, caindo pela metade a cada `halving_crfs` pontos."""
+    return {crf: bytes_at_18 * 0.5 ** ((crf - MIN_CRF) / halving_crfs) for crf in range(MIN_CRF, MAX_CRF + 1)}
+
+
+@pytest.mark.parametrize("halving_crfs", [4.5, 6.0, 8.0])
+@pytest.mark.parametrize("target_crf", [18.4, 24.7, 33.2, 45.9])
+def test_search_finds_the_lowest_fitting_crf_in_few_steps(halving_crfs, target_crf):
+    sizes = x264_like_sizes(5e7, halving_crfs)
+    budget = 5e7 * 0.5 ** ((target_crf - MIN_CRF) / halving_crfs)
+    measured = []
+    crf, predicted = search_crf(lambda c: measured.append(c) or sizes[c], budget)
+
+    expected = min(c for c in sizes if sizes[c] <= budget)
+    assert crf == expected
+    assert predicted == sizes[crf] <= budget
+    assert len(measured) <= MAX_SEARCH_STEPS + 2
+    assert len(set(measured)) == len(measured)
+
+
+def test_search_gives_up_when_not_even_max_crf_fits():
+    sizes = x264_like_sizes(5e7, 6.0)
+    crf, predicted = search_crf(lambda c: sizes[c], sizes[MAX_CRF] / 2)
+    assert crf is None
+    assert predicted == sizes[MAX_CRF]
+
+
+def test_search_never_returns_a_crf_over_budget():
+    # Medições com ruído (não monotônicas): a resposta é sempre uma medição que coube
+    sizes = {crf: 1e7 * math.exp(-0.11 * (crf - MIN_CRF)) * (1.08 if crf % 2 else 0.94)
+             for crf in range(MIN_CRF, MAX_CRF + 1)}
+    for budget in (5e5, 1e6, 3e6):
+        crf, predicted = search_crf(lambda c: sizes[c], budget)
+        assert predicted == sizes[crf] <= budget
+
+
+@requires_ffmpeg
+def test_target_size_output_never_exceeds_the_target(tmp_path, isolated_cache):
+    source = make_clip(str(tmp_path / "clip.mp4"), seconds=20, fps=24, gop=48)
+    job = CompressionJob(source, str(tmp_path / "out.mp4"), "Tamanho", 0.25, preset="ultrafast")
+    result = run_job(job)
+    assert result.success, result.error
+    assert os.path.getsize(job.save_path) <= 0.25 * 1024 * 1024
@@ -0,0 +1,106 @@
+# tests/test_watch_folder.py
+import os
+import sqlite3
+
+import pytest
+
+import watch_folder
+from compressor_engine import JobResult
+from watch_folder import MAX_FAILED_ATTEMPTS, RETRY_DELAY, PollingWatcher, ProcessedLog, WatchDaemon
+
+
+class FakeEngine:
+    """Motor que "comprime" na hora, copiando a entrada para a saída."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.jobs = []
+
+    def submit(self, job, callback):
+        self.jobs.append(job)
+        if self.fail:
+            callback(JobResult(job, False, error="falha simulada"))
+            return
+        with open(job.video_path, "rb") as src, open(job.save_path, "wb") as dst:
+            dst.write(src.read())
+        callback(JobResult(job, True))
+
+
+def make_daemon(tmp_path, folder, output_folder, engine):
+    log = ProcessedLog(str(tmp_path / "state.sqlite"))
+    return WatchDaemon([str(folder)], str(output_folder), "CRF", 26, engine,
+                       PollingWatcher([str(folder)]), log, settle=0)
+
+
+def settle(daemon):
+    daemon.observe(watch_folder.scan_folders(daemon.folders))
+    daemon.tracker.ready() # primeira leitura de tamanho/mtime
+    for path, st in daemon.tracker.ready():
+        daemon.submit(path, st)
+
+
+@pytest.mark.parametrize("output_inside", [False, True])
+def test_output_folder_inside_the_watched_folder(tmp_path, output_inside):
+    folder = tmp_path / "captures"
+    folder.mkdir()
+    output_folder = folder / "compressed" if output_inside else folder
+    output_folder.mkdir(exist_ok=True)
+    (folder / "clip.mp4").write_bytes(b"video")
+    engine = FakeEngine()
+    daemon = make_daemon(tmp_path, folder, output_folder, engine)
+
+    settle(daemon)
+    assert [os.path.basename(job.video_path) for job in engine.jobs] == ["clip.mp4"]
+    assert os.path.dirname(engine.jobs[0].save_path) == str(output_folder)
+
+    # A saída aparece na pasta vigiada, mas é do próprio daemon
+    settle(daemon)
+    assert len(engine.jobs) == 1
+    daemon.log.close()
+
+
+def test_failures_are_retried_later_and_then_given_up(tmp_path, monkeypatch):
+    folder = tmp_path / "captures"
+    folder.mkdir()
+    (folder / "broken.mp4").write_bytes(b"video")
+    engine = FakeEngine(fail=True)
+    daemon = make_daemon(tmp_path, folder, tmp_path, engine)
+    now = [1000.0]
+    monkeypatch.setattr(watch_folder.time, "time", lambda: now[0])
+
+    for attempt in range(1, MAX_FAILED_ATTEMPTS + 1):
+        settle(daemon)
+        assert len(engine.jobs) == attempt
+        settle(daemon) # antes do intervalo: não tenta de novo
+        assert len(engine.jobs) == attempt
+        now[0] += RETRY_DELAY * 2 ** (attempt - 1)
+
+    now[0] += 10 * RETRY_DELAY
+    settle(daemon) # desistiu
+    assert len(engine.jobs) == MAX_FAILED_ATTEMPTS
+
+    # Um arquivo novo com o mesmo nome recomeça a contagem
+    (folder / "broken.mp4").write_bytes(b"outro video")
+    settle(daemon)
+    assert len(engine.jobs) == MAX_FAILED_ATTEMPTS + 1
+    daemon.log.close()
+
+
+def test_old_state_database_is_upgraded(tmp_path):
+    db = str(tmp_path / "state.sqlite")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE processed (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                 "mtime_ns INTEGER NOT NULL, status TEXT NOT NULL, output TEXT, finished_at REAL NOT NULL)")
+    source = tmp_path / "old.mp4"
+    source.write_bytes(b"video")
+    st = os.stat(source)
+    conn.execute("INSERT INTO processed VALUES (?, ?, ?, 'falhou', NULL, 0)",
+                 (str(source), st.st_size, st.st_mtime_ns))
+    conn.commit()
+    conn.close()
+
+    log = ProcessedLog(db)
+    assert not log.is_done(str(source), st) # falha antiga volta a ser tentada
+    assert log.record_failure(str(source), st) == 1
+    assert log.is_done(str(source), st)
+    log.close()
@@ -0,0 +1,518 @@
+# watch_folder.py
+"""Modo daemon: comprime sozinho os vídeos que chegam em pastas vigiadas.
+
+    python watch_folder.py /mnt/capturas -o /mnt/comprimidos --mode CRF --value 26 -j 2
+
+As pastas são vigiadas com inotify (Linux) ou, sem ele, varridas a cada
+poucos segundos (`--poll`, necessário em compartilhamentos de rede, onde o
+inotify não vê gravações feitas por outras máquinas). Um arquivo só entra na
+fila depois de ficar `--settle` segundos sem mudar de tamanho nem de mtime,
+então cópias em andamento não são pegas pela metade e rajadas de eventos do
+mesmo arquivo viram um único trabalho. O que já foi processado fica gravado
+em SQLite (caminho + tamanho + mtime): reiniciar o daemon não recodifica nada,
+e um arquivo substituído por outro com o mesmo nome é processado de novo. Uma
+falha não encerra o arquivo: ele volta a ser tentado depois de um intervalo
+que dobra a cada falha, até `MAX_FAILED_ATTEMPTS` tentativas.
+
+A pasta de saída pode ser a própria pasta vigiada: as saídas do daemon (as
+registradas e as em andamento) são reconhecidas pelo caminho e ignoradas.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+from compressor_engine import (
+    COMPRESSION_MODES, DEFAULT_VALUES, VIDEO_EXTENSIONS,
+    CompressionEngine, CompressionJob, build_output_path, default_output_folder,
+)
+from governor import PRIORITIES, PRIORITY_NORMAL, ResourceGovernor
+from media_probe import default_cache_dir
+from supervisor import DEFAULT_STALL_TIMEOUT
+from telemetry import Telemetry
+
+DEFAULT_SETTLE_SECONDS = 10.0
+DEFAULT_POLL_INTERVAL = 5.0
+# Mesmo com inotify, uma varredura de vez em quando pega eventos perdidos
+RESCAN_INTERVAL = 300.0
+# Falhas voltam a ser tentadas depois de RETRY_DELAY, 2x, 4x...; depois da
+# última tentativa o arquivo só volta se for substituído (novo tamanho/mtime)
+MAX_FAILED_ATTEMPTS = 3
+RETRY_DELAY = 600.0
+STATUS_OK = "ok"
+STATUS_FAILED = "falhou"
+
+# Constantes do <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, len
+
+
+def default_state_path():
+    return os.path.join(default_cache_dir(), "watch_folder.sqlite")
+
+
+def is_candidate(path, excluded_dirs=()):
+    """Vídeo visível fora das pastas excluídas (ex.: a pasta de saída)."""
+    name = os.path.basename(path)
+    if name.startswith(".") or not name.lower().endswith(VIDEO_EXTENSIONS):
+        return False
+    real = os.path.realpath(path)
+    return not any(real.startswith(folder + os.sep) for folder in excluded_dirs)
+
+
+def overlaps(folder, folders):
+    """`folder` é uma das `folders` ou contém alguma delas."""
+    return any(other == folder or other.startswith(folder + os.sep) for other in folders)
+
+
+def scan_folders(folders, recursive=False):
+    """Todos os arquivos das pastas (a filtragem fica com quem chama)."""
+    for folder in folders:
+        if recursive:
+            for root, dirs, names in os.walk(folder):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                for name in names:
+                    yield os.path.join(root, name)
+        else:
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            yield entry.path
+            except OSError as e:
+                print(f"Erro ao ler a pasta {folder}: {e}")
+
+
+class PollingWatcher:
+    """Varre as pastas a cada `interval` segundos (funciona em qualquer SO e em rede)."""
+
+    def __init__(self, folders, recursive=False, interval=DEFAULT_POLL_INTERVAL):
+        self.folders = folders
+        self.recursive = recursive
+        self.interval = interval
+        self.overflowed = False # só o inotify perde eventos
+        self._next_scan = 0.0
+
+    def wait(self, timeout):
+        """Caminhos que podem ter mudado, esperando no máximo `timeout` segundos."""
+        now = time.monotonic()
+        if now < self._next_scan:
+            time.sleep(min(timeout, self._next_scan - now))
+            return []
+        self._next_scan = now + self.interval
+        return list(scan_folders(self.folders, self.recursive))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Eventos do kernel via inotify (Linux), sem dependências externas."""
+
+    def __init__(self, folders, recursive=False):
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falhou")
+        self._dirs = {} # wd -> pasta
+        self.overflowed = False
+        for folder in folders:
+            if recursive:
+                self._add_tree(folder)
+            else:
+                self._add(folder)
+
+    def _add(self, folder):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falhou para {folder}")
+        self._dirs[wd] = folder
+
+    def _add_tree(self, folder):
+        self._add(folder)
+        for root, dirs, _ in os.walk(folder):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in dirs:
+                self._add(os.path.join(root, name))
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True # eventos perdidos: quem chama faz uma varredura
+                continue
+            if wd not in self._dirs or not name:
+                continue
+            path = os.path.join(self._dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if self.recursive and not os.path.basename(path).startswith("."):
+                    self._add_tree(path)
+                    paths.extend(scan_folders([path], recursive=True))
+            else:
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(folders, recursive=False, poll=False, interval=DEFAULT_POLL_INTERVAL):
+    """inotify quando disponível; varredura periódica como plano B."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folders, recursive)
+        except (OSError, AttributeError) as e:
+            print(f"inotify indisponível ({e}); vigiando por varredura.")
+    return PollingWatcher(folders, recursive, interval)
+
+
+class StabilityTracker:
+    """Espera cada arquivo parar de crescer antes de liberá-lo (debounce).
+
+    Eventos repetidos do mesmo arquivo só renovam a observação; o arquivo é
+    liberado quando tamanho e mtime ficam `settle` segundos sem mudar e ele
+    pode ser aberto para leitura (no Windows, quem ainda grava o trava).
+    """
+
+    def __init__(self, settle=DEFAULT_SETTLE_SECONDS):
+        self.settle = settle
+        self._pending = {} # caminho -> (tamanho, mtime_ns, desde quando está igual)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, path):
+        return path in self._pending
+
+    def observe(self, path):
+        if path not in self._pending:
+            self._pending[path] = (None, None, time.monotonic())
+
+    def ready(self):
+        """Arquivos estáveis: lista de (caminho, os.stat_result)."""
+        now = time.monotonic()
+        stable = []
+        for path, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path] # apagado ou movido antes de estabilizar
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (st.st_size, st.st_mtime_ns, now)
+            elif st.st_size > 0 and now - since >= self.settle and self._readable(path):
+                del self._pending[path]
+                stable.append((path, st))
+        return stable
+
+    @staticmethod
+    def _readable(path):
+        try:
+            with open(path, "rb"):
+                return True
+        except OSError:
+            return False
+
+
+class ProcessedLog:
+    """Registro persistente (SQLite) dos arquivos já processados e das falhas."""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_state_path()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS processed (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                output TEXT,
+                finished_at REAL NOT NULL
+            )"""
+        )
+        # Bancos antigos não têm as colunas de nova tentativa (falhas antigas voltam a ser tentadas)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(processed)")}
+        if "attempts" not in columns:
+            self._conn.execute("ALTER TABLE processed ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        if "retry_after" not in columns:
+            self._conn.execute("ALTER TABLE processed ADD COLUMN retry_after REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS processed_output ON processed (output)")
+        self._conn.commit()
+
+    def _row(self, path, st):
+        """(status, tentativas, retry_after) deste arquivo, ou None se ele mudou."""
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, status, attempts, retry_after FROM processed WHERE path = ?",
+            (os.path.abspath(path),),
+        ).fetchone()
+        if row is None or (row[0], row[1]) != (st.st_size, st.st_mtime_ns):
+            return None
+        return row[2], row[3], row[4]
+
+    def is_done(self, path, st):
+        """True se não há nada a fazer com este arquivo (mesmo tamanho e mtime)
+        agora: já foi processado, ou falhou e ainda não é hora de tentar de novo."""
+        with self._lock:
+            row = self._row(path, st)
+        if row is None:
+            return False
+        status, attempts, retry_after = row
+        if status != STATUS_FAILED:
+            return True
+        return attempts >= MAX_FAILED_ATTEMPTS or time.time() < (retry_after or 0)
+
+    def is_output(self, path):
+        """True se `path` é a saída de um trabalho registrado."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM processed WHERE output = ? LIMIT 1", (os.path.abspath(path),)
+            ).fetchone()
+        return row is not None
+
+    def record(self, path, st, status, output=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed (path, size, mtime_ns, status, output, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, status,
+                 output and os.path.abspath(output), time.time()),
+            )
+            self._conn.commit()
+
+    def record_failure(self, path, st):
+        """Registra mais uma falha e agenda a próxima tentativa. Devolve o
+        número de tentativas (a contagem recomeça se o arquivo mudou)."""
+        with self._lock:
+            row = self._row(path, st)
+            attempts = row[1] + 1 if row is not None and row[0] == STATUS_FAILED else 1
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO processed "
+                "(path, size, mtime_ns, status, output, finished_at, attempts, retry_after) "
+                "VALUES (?, ?, ?, ?, NULL, ?, ?, ?)",
+                (os.path.abspath(path), st.st_size, st.st_mtime_ns, STATUS_FAILED, now,
+                 attempts, now + RETRY_DELAY * 2 ** (attempts - 1)),
+            )
+            self._conn.commit()
+        return attempts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class WatchDaemon:
+    """Liga vigia, detecção de estabilidade, registro e motor de compressão."""
+
+    def __init__(self, folders, output_folder, mode, value, engine, watcher, log,
+                 settle=DEFAULT_SETTLE_SECONDS, recursive=False, content_aware=False):
+        self.folders = [os.path.abspath(f) for f in folders]
+        self.output_folder = output_folder
+        self.mode = mode
+        self.value = value
+        self.engine = engine
+        self.watcher = watcher
+        self.log = log
+        self.recursive = recursive
+        self.content_aware = content_aware
+        self.tracker = StabilityTracker(settle)
+        # Pasta de saída dentro de uma pasta vigiada: a subpasta inteira fica de fora.
+        # Se ela é a pasta vigiada (ou a contém), excluí-la pularia tudo: aí só as
+        # saídas do próprio daemon são ignoradas (is_own_output)
+        output_real = os.path.realpath(output_folder)
+        if overlaps(output_real, [os.path.realpath(f) for f in self.folders]):
+            self.excluded_dirs = []
+        else:
+            self.excluded_dirs = [output_real]
+        self._in_flight = {} # entrada -> saída dos trabalhos em andamento
+        self._lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def is_own_output(self, path):
+        with self._lock:
+            if path in self._in_flight.values():
+                return True
+        return self.log.is_output(path)
+
+    def observe(self, paths):
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in self.tracker or not is_candidate(path, self.excluded_dirs):
+                continue
+            with self._lock:
+                if path in self._in_flight:
+                    continue
+            if self.is_own_output(path):
+                continue
+            try:
+                if self.log.is_done(path, os.stat(path)):
+                    continue
+            except OSError:
+                continue
+            self.tracker.observe(path)
+
+    def submit(self, path, st):
+        if self.log.is_done(path, st) or self.is_own_output(path):
+            return
+        job = CompressionJob(path, os.path.abspath(build_output_path(path, self.output_folder)),
+                             self.mode, self.value, content_aware=self.content_aware)
+        with self._lock:
+            self._in_flight[path] = job.save_path
+        print(f"[FILA]   {os.path.basename(path)}")
+        self.engine.submit(job, callback=lambda result: self.on_finished(result, st))
+
+    def on_finished(self, result, st):
+        path = result.job.video_path
+        name = os.path.basename(path)
+        if result.cancelled:
+            print(f"[CANCELADO] {name}") # não registra: roda de novo na próxima vez
+        elif result.success:
+            self.log.record(path, st, STATUS_OK, result.job.save_path)
+            print(f"[OK]     {name} -> {result.job.save_path}")
+        else:
+            # A falha fica registrada com a contagem de tentativas: um arquivo quebrado
+            # não repete em loop, e uma falha passageira é tentada de novo mais tarde
+            attempts = self.log.record_failure(path, st)
+            if attempts < MAX_FAILED_ATTEMPTS:
+                print(f"[FALHOU] {name} (tentativa {attempts}/{MAX_FAILED_ATTEMPTS}): {result.error}")
+            else:
+                print(f"[FALHOU] {name} (desistindo após {attempts} tentativas): {result.error}")
+        with self._lock:
+            self._in_flight.pop(path, None)
+
+    def run(self):
+        """Laço principal, até `stop_event` ser sinalizado."""
+        print(f"Vigiando {', '.join(self.folders)} -> {self.output_folder}")
+        # Arquivos que chegaram com o daemon parado
+        self.observe(scan_folders(self.folders, self.recursive))
+        next_rescan = time.monotonic() + RESCAN_INTERVAL
+
+        while not self.stop_event.is_set():
+            # Com arquivos em observação, acorda a cada segundo para reavaliar
+            timeout = 1.0 if len(self.tracker) else 5.0
+            self.observe(self.watcher.wait(timeout))
+
+            if time.monotonic() >= next_rescan or self.watcher.overflowed:
+                self.watcher.overflowed = False
+                self.observe(scan_folders(self.folders, self.recursive))
+                next_rescan = time.monotonic() + RESCAN_INTERVAL
+
+            for path, st in self.tracker.ready():
+                self.submit(path, st)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Comprime automaticamente os vídeos que chegam em pastas vigiadas.")
+    parser.add_argument("folders", nargs="+", help="Pastas a vigiar.")
+    parser.add_argument("-o", "--output-folder", default=None,
+                        help="Pasta de saída (padrão: pasta 'Vídeos' do usuário).")
+    parser.add_argument("--mode", choices=COMPRESSION_MODES, default="CRF", help="Método de compressão.")
+    parser.add_argument("--value", type=int, default=None,
+                        help="Nível: CRF (18-30), bitrate em kbits/s, índice de resolução (0-2) ou tamanho alvo em MB.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Encodes simultâneos; o resto espera na fila (padrão: 1).")
+    parser.add_argument("--priority", choices=PRIORITIES, default=PRIORITY_NORMAL,
+                        help="Prioridade de CPU/disco dos ffmpeg.")
+    parser.add_argument("--content-aware", action="store_true",
+                        help="Gravações de tela perdem os quadros repetidos (saída VFR) e usam o tune do x264.")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Tempo limite de cada trabalho, em segundos (sem contar fila e pausa).")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help="Mata um ffmpeg que ficar este tanto de segundos sem avançar (0 desliga).")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Vigia também as subpastas.")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Segundos sem mudar de tamanho para considerar o arquivo completo.")
+    parser.add_argument("--poll", action="store_true",
+                        help="Varre as pastas em vez de usar inotify (use em compartilhamentos de rede).")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Intervalo entre varreduras com --poll, em segundos.")
+    parser.add_argument("--state", default=None,
+                        help="Banco SQLite com o registro do que já foi processado.")
+    parser.add_argument("--telemetry-log", default=None,
+                        help="Log JSONL (com rotação) da telemetria de cada trabalho "
+                             "(padrão: jobs.jsonl na pasta de cache).")
+    parser.add_argument("--prometheus-textfile", default=None,
+                        help="Arquivo .prom para o textfile collector do node_exporter.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    output_folder = args.output_folder or default_output_folder()
+    if not os.path.isdir(output_folder):
+        print(f"ERRO: Pasta de saída inválida: {output_folder}")
+        return 2
+    missing = [f for f in args.folders if not os.path.isdir(f)]
+    if missing:
+        print(f"ERRO: Pasta não encontrada: {', '.join(missing)}")
+        return 2
+
+    value = args.value if args.value is not None else DEFAULT_VALUES[args.mode]
+    try:
+        CompressionJob("", "", args.mode, value) # valida modo/valor antes de começar a vigiar
+    except ValueError as e:
+        print(f"ERRO: {e}")
+        return 2
+
+    governor = ResourceGovernor(max_concurrent=args.jobs, priority=args.priority)
+    telemetry = (Telemetry(args.telemetry_log, args.prometheus_textfile)
+                 if args.telemetry_log or args.prometheus_textfile else None)
+    engine = CompressionEngine(max_workers=args.jobs, governor=governor, telemetry=telemetry,
+                               timeout=args.timeout, stall_timeout=args.stall_timeout)
+    watcher = create_watcher(args.folders, args.recursive, args.poll, args.interval)
+    log = ProcessedLog(args.state)
+    daemon = WatchDaemon(args.folders, output_folder, args.mode, value, engine, watcher, log,
+                         settle=args.settle, recursive=args.recursive, content_aware=args.content_aware)
+
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Encodes interrompidos não são registrados e voltam na próxima execução
+        # (um segundo Ctrl+C não interrompe a limpeza)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        print("Encerrando...")
+        engine.cancel_all()
+        engine.shutdown()
+        watcher.close()
+        log.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())